@@ -0,0 +1,186 @@
+import os
+import time
+import random
+import bisect
+import hashlib
+import itertools
+import threading
+from collections import deque
+
+import metrics
+import timing
+from db import get_db
+
+# Statuses that say "this LinkedIn account is being throttled / is unusable right now".
+_ACCOUNT_TROUBLE_STATUSES = (401, 403, 429)
+# ...plus None (no response at all), the only failures counted against an account.
+_ACCOUNT_FAILURE_STATUSES = (None, *_ACCOUNT_TROUBLE_STATUSES)
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.md5(s.encode("utf-8")).digest()[:8], "big")
+
+
+class AccountPool:
+    """
+    Pool of Unipile read accounts (LinkedIn accounts used only for reads: posts,
+    profile lookups). Comments always go through the designated commenting account
+    (UNIPILE_ACCOUNT_ID), never through this pool.
+
+    - Targets map to accounts by consistent hashing, so the same person is always read
+      through the same account and adding an account only moves ~1/N of targets.
+    - Each account has its own pacing budget (`per_minute` reads, jittered), replacing
+      the old global sleep between profiles; with one fetching thread per account
+      (daily_commenter.refresh_post_pool_for_all_targets), N accounts => ~N x the read rate.
+      The budget lives in Postgres (read_account_budget), so every process reading
+      through an account (--refresh-worker, the daemon, a run) shares it; a process
+      reserves `reserve` slots per round trip and spends them locally.
+    - Health: a 401/403/429, or `max_failures` consecutive connection errors, benches an
+      account for `cooldown_s` (for every process: the bench is stored with the budget);
+      its targets fall through to the next healthy account on the ring. Other statuses (a 404 for a deleted profile, Unipile 5xx) say nothing
+      about the account and aren't counted.
+    """
+
+    def __init__(self, account_ids: list[str], per_minute: float = 40, cooldown_s: float = 600,
+                 max_failures: int = 3, replicas: int = 64, reserve: int = 5):
+        ids = [a for a in dict.fromkeys(a.strip() for a in account_ids) if a]
+        if not ids:
+            raise ValueError("AccountPool needs at least one account id")
+        self.account_ids = ids
+        self.interval_s = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.cooldown_s = cooldown_s
+        self.max_failures = max_failures
+        self.reserve = max(1, reserve)
+
+        self._lock = threading.Lock()
+        self._ring = sorted((_hash(f"{a}#{i}"), a) for a in ids for i in range(replicas))
+        self._ring_keys = [h for h, _ in self._ring]
+        self._failures = {a: 0 for a in ids}
+        self._benched_until = {a: 0.0 for a in ids}
+        self._slots = {a: deque() for a in ids}  # reserved read times (time.monotonic())
+        for a in ids:
+            metrics.READ_ACCOUNT_HEALTHY.labels(a).set(1)
+
+    def healthy(self, account_id: str) -> bool:
+        ok = self._benched_until[account_id] <= time.monotonic()
+        metrics.READ_ACCOUNT_HEALTHY.labels(account_id).set(1 if ok else 0)
+        return ok
+
+    def for_key(self, key: str) -> str:
+        """Account responsible for `key` (e.g. a person_identifier); skips benched accounts."""
+        start = bisect.bisect(self._ring_keys, _hash(str(key))) % len(self._ring)
+        seen = set()
+        for i in range(len(self._ring)):
+            acct = self._ring[(start + i) % len(self._ring)][1]
+            if acct in seen:
+                continue
+            if self.healthy(acct):
+                return acct
+            seen.add(acct)
+            if len(seen) == len(self.account_ids):
+                break
+        # everyone is benched: use the one that recovers first
+        return min(self.account_ids, key=lambda a: self._benched_until[a])
+
+    def acquire(self, account_id: str) -> None:
+        """
+        Blocks until `account_id` may make its next read: its next slot, from the ones
+        this pool reserved, or from a new reservation. With PACING_SCALE=0 pacing is off
+        and no slot is taken.
+        """
+        scale = float(os.getenv("PACING_SCALE", "1"))
+        if scale == 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            slots = self._slots[account_id]
+            # slots this thread fell more than a step behind on are gone: using them
+            # now would make reads back to back
+            while slots and slots[0] < now - self.interval_s * scale:
+                slots.popleft()
+            at = slots.popleft() if slots else None
+        if at is None:
+            at = self._reserve(account_id, scale)
+        # the reservation is already scaled: don't let timing.sleep scale it again
+        timing.pause(at - time.monotonic())
+
+    def _reserve(self, account_id: str, scale: float) -> float:
+        """
+        Takes the next `reserve` slots of the account's budget in one statement (the row
+        lock orders concurrent takers, whichever process they're in), keeps all but the
+        first for later acquire()s, and returns the first. Slots left over when the pool
+        is dropped just delay the account's next reads by at most `reserve` steps.
+        """
+        steps = [self.interval_s * scale * random.uniform(0.6, 1.4) for _ in range(self.reserve)]
+        with get_db() as (conn, cur):
+            cur.execute(
+                """
+                INSERT INTO read_account_budget AS b (account_id, next_at)
+                VALUES (%(account_id)s, clock_timestamp() + make_interval(secs => %(span)s))
+                ON CONFLICT (account_id) DO UPDATE SET
+                    next_at = GREATEST(clock_timestamp(), b.next_at, COALESCE(b.benched_until, '-infinity'))
+                              + make_interval(secs => %(span)s)
+                RETURNING EXTRACT(EPOCH FROM b.next_at - clock_timestamp())::float8 - %(span)s AS wait_s,
+                          EXTRACT(EPOCH FROM b.benched_until - clock_timestamp())::float8 AS benched_s
+                """,
+                {"account_id": account_id, "span": sum(steps)},
+            )
+            row = cur.fetchone()
+            conn.commit()
+        now = time.monotonic()
+        first, *rest = itertools.accumulate(steps[:-1], initial=now + max(row["wait_s"], 0.0))
+        with self._lock:
+            if row["benched_s"] and row["benched_s"] > 0:
+                # benched by another process: route the next targets around it here too
+                self._benched_until[account_id] = max(self._benched_until[account_id], now + row["benched_s"])
+            self._slots[account_id].extend(rest)
+        return first
+
+    def report_success(self, account_id: str) -> None:
+        with self._lock:
+            self._failures[account_id] = 0
+
+    def report_failure(self, account_id: str, status: int | None = None) -> None:
+        if status not in _ACCOUNT_FAILURE_STATUSES:
+            # Per-target errors (404 on a deleted profile) say nothing about the account,
+            # and a failing Unipile (5xx) is the circuit breaker's call.
+            return
+        with self._lock:
+            self._failures[account_id] += 1
+            benched = status in _ACCOUNT_TROUBLE_STATUSES or self._failures[account_id] >= self.max_failures
+            if benched:
+                self._benched_until[account_id] = time.monotonic() + self.cooldown_s
+                self._failures[account_id] = 0
+                # the bench pushes the account's budget past it (see _reserve)
+                self._slots[account_id].clear()
+        if not benched:
+            return
+        metrics.READ_ACCOUNT_HEALTHY.labels(account_id).set(0)
+        print(f"[accounts] benched {account_id} for {self.cooldown_s:.0f}s (status={status})")
+        with get_db() as (conn, cur):
+            cur.execute(
+                """
+                INSERT INTO read_account_budget AS b (account_id, next_at, benched_until)
+                VALUES (%(account_id)s, '-infinity', clock_timestamp() + make_interval(secs => %(cooldown_s)s))
+                ON CONFLICT (account_id) DO UPDATE SET
+                    benched_until = GREATEST(b.benched_until, EXCLUDED.benched_until)
+                """,
+                {"account_id": account_id, "cooldown_s": self.cooldown_s},
+            )
+            conn.commit()
+
+
+def read_pool_from_env(default_account_id: str) -> AccountPool:
+    """
+    UNIPILE_READ_ACCOUNT_IDS   comma-separated read accounts (default: the commenting account)
+    UNIPILE_READ_PER_MINUTE    read budget per account (default 40 ~= the old 0.8-2.0s jitter)
+    UNIPILE_ACCOUNT_COOLDOWN_S how long a throttled account is benched (default 600)
+    UNIPILE_READ_RESERVE       read slots reserved per DB round trip (default 5)
+    """
+    ids = (os.getenv("UNIPILE_READ_ACCOUNT_IDS") or default_account_id).split(",")
+    return AccountPool(
+        ids,
+        per_minute=float(os.getenv("UNIPILE_READ_PER_MINUTE", "40")),
+        cooldown_s=float(os.getenv("UNIPILE_ACCOUNT_COOLDOWN_S", "600")),
+        reserve=int(os.getenv("UNIPILE_READ_RESERVE", "5")),
+    )
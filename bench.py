@@ -0,0 +1,230 @@
+"""
+End-to-end benchmarks against stub_server (no real Unipile/Slack/Anthropic traffic).
+
+    DATABASE_URL=postgresql://.../scratch python bench.py daily --leads 500
+    DATABASE_URL=postgresql://.../scratch python bench.py clicks --n 200 --concurrency 20
+
+Both modes start stub_server (and for `clicks`, slack_server) as local uvicorn
+subprocesses unless --stub-url is given, then print a JSON report. Use a scratch
+database: the benchmarks write targets, post_pool, pending_reviews and comments.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from timing import percentiles
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_uvicorn(app: str, port: int, env: dict, ready_path: str) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE,
+        env=env,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}{ready_path}", timeout=1)
+            return proc
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{app} did not start on port {port}")
+
+
+def _stub_env(stub_url: str, args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "UNIPILE_DSN": stub_url,
+        "UNIPILE_ACCOUNT_ID": "bench-account",
+        "UNIPILE_API_KEY": "bench-key",
+        "SLACK_API_URL": f"{stub_url}/api",
+        "SLACK_BOT_TOKEN": "xoxb-bench",
+        "SLACK_USER_ID": "UBENCH",
+        "ANTHROPIC_BASE_URL": stub_url,
+        "ANTHROPIC_API_KEY": "sk-bench",
+        "SALESNAV_URL": "https://www.linkedin.com/sales/search/people?query=bench",
+        "PACING_SCALE": str(args.pacing_scale),
+        "STUB_LEADS": str(getattr(args, "leads", 500)),
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_ERROR_RATE": str(args.error_rate),
+        "STUB_429_RATE": str(args.rate_429),
+    })
+    return env
+
+
+def _stub_stats(stub_url: str) -> dict:
+    return requests.get(f"{stub_url}/_stub/stats", timeout=5).json()
+
+
+def bench_daily(args, stub_url: str, env: dict) -> dict:
+    env = dict(env)
+    env["MAX_PEOPLE"] = str(args.leads)
+    env["MAX_COMMENTS_PER_DAY"] = str(args.max_per_day)
+
+    requests.post(f"{stub_url}/_stub/reset", timeout=5)
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "daily_commenter.py", "--full-sync"], cwd=HERE, env=env, check=True)
+    wall = time.perf_counter() - t0
+    stats = _stub_stats(stub_url)
+
+    from db import get_db
+
+    with get_db() as (conn, cur):
+        cur.execute("SELECT report FROM run_reports ORDER BY id DESC LIMIT 1")
+        row = cur.fetchone()
+
+    fetched = stats.get("unipile.posts", 0)
+    return {
+        "mode": "daily",
+        "wall_s": round(wall, 3),
+        "targets_fetched": fetched,
+        "targets_per_s": round(fetched / wall, 2) if wall else None,
+        "stub_requests": stats,
+        "run_report": row["report"] if row else None,
+    }
+
+
+def _seed_pending(n: int) -> list[str]:
+    from db import get_db
+
+    run_tag = uuid.uuid4().hex[:8]
+    social_ids = [f"urn:li:activity:bench-{run_tag}-{i}" for i in range(n)]
+    with get_db() as (conn, cur):
+        for sid in social_ids:
+            cur.execute(
+                """
+                INSERT INTO pending_reviews
+                  (social_id, profile_name, generated_comment, status, created_at, slack_channel, slack_ts)
+                VALUES (%s, %s, %s, 'pending', %s, %s, %s)
+                """,
+                (sid, "Bench Author", "bench comment", datetime.now(timezone.utc), "DBENCH", f"{time.time():.6f}"),
+            )
+        conn.commit()
+    return social_ids
+
+
+def _pending_left(social_ids: list[str]) -> int:
+    from db import get_db
+
+    with get_db() as (conn, cur):
+        cur.execute("SELECT COUNT(*) AS n FROM pending_reviews WHERE social_id = ANY(%s)", (social_ids,))
+        return cur.fetchone()["n"]
+
+
+def bench_clicks(args, stub_url: str, env: dict) -> dict:
+    social_ids = _seed_pending(args.n)
+
+    port = _free_port()
+    server = _start_uvicorn("slack_server:app", port, env, "/metrics")
+    try:
+        url = f"http://127.0.0.1:{port}/slack/actions"
+        requests.post(f"{stub_url}/_stub/reset", timeout=5)
+
+        def click(sid):
+            payload = {
+                "type": "block_actions",
+                "actions": [{"action_id": "approve_comment", "value": sid, "action_ts": f"{time.time():.6f}"}],
+                "channel": {"id": "DBENCH"},
+                "message": {"ts": "1.0"},
+            }
+            t0 = time.perf_counter()
+            r = requests.post(url, data={"payload": json.dumps(payload)}, timeout=30)
+            return time.perf_counter() - t0, r.status_code
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(click, social_ids))
+        burst_s = time.perf_counter() - t0
+
+        # Workers keep going after the ACK; wait until every click has been processed.
+        deadline = time.time() + args.timeout
+        left = _pending_left(social_ids)
+        while left and time.time() < deadline:
+            time.sleep(0.2)
+            left = _pending_left(social_ids)
+        done_s = time.perf_counter() - t0
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    acks = [dt for dt, _ in results]
+    processed = args.n - left
+    return {
+        "mode": "clicks",
+        "clicks": args.n,
+        "concurrency": args.concurrency,
+        "non_200_acks": sum(1 for _, status in results if status != 200),
+        "ack_latency": percentiles(acks),
+        "acks_over_3s": sum(1 for dt in acks if dt > 3),
+        "burst_s": round(burst_s, 3),
+        "acks_per_s": round(args.n / burst_s, 2) if burst_s else None,
+        "processed": processed,
+        "unprocessed": left,
+        "completion_s": round(done_s, 3),
+        "comments_per_s": round(processed / done_s, 2) if done_s else None,
+        "stub_requests": _stub_stats(stub_url),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks against the local stub server")
+    parser.add_argument("mode", choices=("daily", "clicks"))
+    parser.add_argument("--stub-url", help="use an already running stub_server instead of starting one")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--pacing-scale", type=float, default=0.0, help="PACING_SCALE for the app (0 = no pacing sleeps)")
+    parser.add_argument("--leads", type=int, default=500, help="daily: size of the stub Sales Nav list")
+    parser.add_argument("--max-per-day", type=int, default=20, help="daily: MAX_COMMENTS_PER_DAY")
+    parser.add_argument("--n", type=int, default=100, help="clicks: number of approve clicks")
+    parser.add_argument("--concurrency", type=int, default=20, help="clicks: concurrent senders")
+    parser.add_argument("--timeout", type=float, default=300, help="clicks: max seconds to wait for workers")
+    args = parser.parse_args(argv)
+
+    import migrate
+
+    migrate.migrate()
+
+    stub = None
+    stub_url = args.stub_url
+    env = None
+    if not stub_url:
+        port = _free_port()
+        stub_url = f"http://127.0.0.1:{port}"
+        env = _stub_env(stub_url, args)
+        stub = _start_uvicorn("stub_server:app", port, env, "/_stub/stats")
+    env = env or _stub_env(stub_url, args)
+
+    try:
+        if args.mode == "daily":
+            report = bench_daily(args, stub_url, env)
+        else:
+            report = bench_clicks(args, stub_url, env)
+    finally:
+        if stub:
+            stub.terminate()
+            stub.wait(10)
+
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
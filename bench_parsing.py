@@ -0,0 +1,96 @@
+"""
+Parse-throughput microbenchmarks for parsing.py over the recorded Unipile payloads
+in fixtures/.
+
+    python bench_parsing.py                               # print items/s per parser
+    python bench_parsing.py --save bench_baseline.json    # record a baseline
+    python bench_parsing.py --baseline bench_baseline.json --tolerance 0.2
+
+With --baseline, exits 1 if any parser got slower than the baseline by more than
+--tolerance (fraction). Baselines are machine-specific: record them on the machine
+that runs the comparison.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import parsing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _fixture(name: str):
+    with open(os.path.join(HERE, "fixtures", name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _cases() -> dict:
+    search = _fixture("unipile_search_page.json")
+    posts = _fixture("unipile_posts_page.json")
+    leads = parsing.items_from_response(search)
+    post_items = parsing.items_from_response(posts)
+    now = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    cutoff = now - timedelta(days=30)
+
+    # name -> (function running one pass, items per pass)
+    return {
+        "items_from_response": (lambda: (parsing.items_from_response(search), parsing.items_from_response(posts)), 2),
+        "parse_lead": (lambda: [parsing.parse_lead(it) for it in leads], len(leads)),
+        "extract_salesnav_lead_id": (lambda: [parsing.extract_salesnav_lead_id(it) for it in leads], len(leads)),
+        "parse_post": (lambda: [parsing.parse_post(p, cutoff, now) for p in post_items], len(post_items)),
+        "parse_unipile_datetime": (lambda: [parsing.parse_unipile_datetime(p, now) for p in post_items], len(post_items)),
+        "get_social_id+get_post_text": (
+            lambda: [(parsing.get_social_id(p), parsing.get_post_text(p)) for p in post_items],
+            len(post_items),
+        ),
+    }
+
+
+def run(repeat: int = 5, min_time: float = 0.2) -> dict:
+    results = {}
+    for name, (fn, n_items) in _cases().items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        while number * n_items < 1000:
+            number *= 2
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = round(n_items / best, 1)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Unipile parse throughput benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--baseline", help="compare against a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    results = run(repeat=args.repeat)
+    for name, per_s in results.items():
+        print(f"{name:32s} {per_s:>14,.0f} items/s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[bench] saved baseline to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = []
+        for name, base in baseline.items():
+            cur = results.get(name)
+            if cur is not None and cur < base * (1 - args.tolerance):
+                regressions.append(f"{name}: {cur:,.0f}/s vs baseline {base:,.0f}/s")
+        if regressions:
+            print("[bench] REGRESSION:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("[bench] no regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import metrics
+import timing
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling a dependency whose breaker is open. retry_in == 0 means
+    another caller's half-open probe is in flight: wait_until_ready(), then retry.
+    """
+
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"{service} circuit open (retry in {retry_in:.0f}s)")
+        self.service = service
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-dependency breaker (one each for "unipile", "slack", "anthropic").
+
+    - closed: calls go through. `failures` consecutive failures (exceptions, 5xx, or a
+      call slower than `slow_s`) trip it open.
+    - open: calls fail immediately with CircuitOpenError for `open_s`.
+    - half_open: one probe call at a time is let through; success closes the breaker,
+      failure reopens it for another `open_s`.
+
+    Only the probe decides a half-open breaker: a call that went out before the breaker
+    tripped and finishes late (other threads share the breaker) doesn't close an open
+    breaker by succeeding, nor extend it by failing.
+
+    4xx responses (incl. 429, which benches a read account instead) aren't failures:
+    the dependency answered.
+    """
+
+    def __init__(self, service: str, failures: int = 5, slow_s: float = 20, open_s: float = 60):
+        self.service = service
+        self.failures = failures
+        self.slow_s = slow_s
+        self.open_s = open_s
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive = 0
+        self._open_until = 0.0
+        self._probing = False
+        metrics.CIRCUIT_STATE.labels(service).set(0)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _set_state(self, state: str, reason: str = "") -> None:
+        # caller holds the lock
+        if state == self._state:
+            return
+        self._state = state
+        metrics.CIRCUIT_STATE.labels(self.service).set(_STATE_VALUES[state])
+        metrics.CIRCUIT_TRANSITIONS.labels(self.service, state).inc()
+        print(f"[breaker] {self.service} -> {state}" + (f" ({reason})" if reason else ""))
+
+    def retry_in(self) -> float:
+        return max(self._open_until - time.monotonic(), 0.0)
+
+    def before_call(self, function: str = "") -> bool:
+        """
+        Raises CircuitOpenError if the call must not go out; returns whether the call
+        is the half-open probe (pass that on to record()).
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() < self._open_until:
+                    metrics.CIRCUIT_REJECTED.labels(self.service, function).inc()
+                    raise CircuitOpenError(self.service, self.retry_in())
+                self._set_state(HALF_OPEN, "probing")
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    metrics.CIRCUIT_REJECTED.labels(self.service, function).inc()
+                    raise CircuitOpenError(self.service, 0)
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok: bool, seconds: float, reason: str = "", probe: bool = False) -> None:
+        if ok and seconds > self.slow_s:
+            ok = False
+            reason = f"slow call {seconds:.1f}s"
+        with self._lock:
+            if probe:
+                self._probing = False
+            elif self._state != CLOSED:
+                # started before the breaker tripped; the probe decides
+                return
+            if ok:
+                self._consecutive = 0
+                self._set_state(CLOSED, "probe succeeded" if probe else "")
+                return
+            self._consecutive += 1
+            if probe or self._consecutive >= self.failures:
+                self._open_until = time.monotonic() + self.open_s
+                self._consecutive = 0
+                self._set_state(OPEN, reason or "failures")
+
+    def cancel_probe(self, probe: bool) -> None:
+        """The probe was interrupted (KeyboardInterrupt, ...) without an outcome: let the next call probe."""
+        if probe:
+            with self._lock:
+                self._probing = False
+
+    def _blocked(self) -> bool:
+        if self._state == OPEN:
+            return self.retry_in() > 0
+        return self._state == HALF_OPEN and self._probing
+
+    def wait_until_ready(self, max_wait: float) -> None:
+        """
+        Pauses the caller while the breaker is open (until a probe is allowed) and while
+        another caller's half-open probe is in flight (until it succeeds or fails).
+        Raises CircuitOpenError if that's more than `max_wait` seconds away.
+        """
+        if not self._blocked():
+            return
+        wait = self.retry_in()
+        if wait > max_wait:
+            raise CircuitOpenError(self.service, wait)
+        if self._state == OPEN:
+            print(f"[breaker] {self.service} open; pausing {wait:.0f}s before probing")
+        deadline = time.monotonic() + max_wait
+        t0 = time.monotonic()
+        try:
+            while self._blocked():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise CircuitOpenError(self.service, self.retry_in())
+                time.sleep(min(self.retry_in() or 0.2, left, 1.0))
+        finally:
+            timing.record_sleep(time.monotonic() - t0)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.getenv("CIRCUIT_BREAKER", "1") != "0"
+
+
+def get(service: str) -> CircuitBreaker:
+    """
+    CIRCUIT_FAILURES  consecutive failures that trip a breaker (default 5)
+    CIRCUIT_SLOW_S    calls slower than this count as failures (default 20)
+    CIRCUIT_OPEN_S    how long a tripped breaker stays open before probing (default 60)
+    CIRCUIT_BREAKER=0 disables breakers entirely
+    """
+    b = _breakers.get(service)
+    if b is None:
+        with _breakers_lock:
+            b = _breakers.get(service)
+            if b is None:
+                b = CircuitBreaker(
+                    service,
+                    failures=int(os.getenv("CIRCUIT_FAILURES", "5")),
+                    slow_s=float(os.getenv("CIRCUIT_SLOW_S", "20")),
+                    open_s=float(os.getenv("CIRCUIT_OPEN_S", "60")),
+                )
+                _breakers[service] = b
+    return b
+
+
+def pause_while_open(service: str, max_wait: float | None = None) -> None:
+    """
+    For batch stages: waits out an open breaker, or another thread's half-open probe
+    (CIRCUIT_MAX_PAUSE_S, default 300), and raises CircuitOpenError if the dependency
+    stays down longer, so the stage stops and the run can be resumed later.
+    """
+    if not enabled():
+        return
+    if max_wait is None:
+        max_wait = float(os.getenv("CIRCUIT_MAX_PAUSE_S", "300"))
+    get(service).wait_until_ready(max_wait)
+
+
+@contextmanager
+def guard(service: str, function: str = ""):
+    """
+    Breaker around a non-HTTP call (e.g. the Anthropic SDK). Exceptions are failures,
+    except API errors carrying a 4xx status_code.
+    """
+    if not enabled():
+        yield
+        return
+    b = get(service)
+    probe = b.before_call(function)
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        status = getattr(e, "status_code", None)
+        b.record(status is not None and status < 500, time.perf_counter() - t0, type(e).__name__, probe=probe)
+        raise
+    except BaseException:
+        b.cancel_probe(probe)
+        raise
+    b.record(True, time.perf_counter() - t0, probe=probe)
@@ -0,0 +1,449 @@
+"""
+"Approve all remaining" / "Skip all remaining" on a review message (slack_server).
+
+Both claim every pending review in the reviewer's DM channel in one transaction, so
+single clicks arriving meanwhile find nothing left to act on. Single clicks claim
+their one review the same way (claim_review / skip_review), so a review is only ever
+posted or skipped by whoever claimed it. Approvals are posted one at a time, paced
+like a person (BULK_POST_MIN_S..BULK_POST_MAX_S apart, default 15..40s). A recorder
+thread runs alongside the poster: it writes finished items to comments/handled_posts
+in batches and updates each Slack message as its item completes, so posting never
+waits on the DB or Slack. A post that fails goes back to pending with its message
+(and buttons) untouched.
+
+A claim sets status 'posting' and claimed_at. The bulk poster renews its claims while
+it works through them; one older than REVIEW_CLAIM_TIMEOUT_S (default 900) was
+abandoned by a process that died mid-post, and the review can be claimed again.
+Right after a post, the review is marked posted (posted_at): it can't be claimed,
+skipped or expired again from then on, even once its claim times out. Recording it is
+retried (RECORD_RETRIES, default 5); a posted review that never got recorded (its
+poster died or gave up) is recorded by record_orphaned_posts() (the expiry sweep) once
+its claim times out.
+"""
+import contextvars
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+import breaker
+import timing
+import tracing
+from db import get_db
+from slack_notify import update_message
+from unipile import comment_on_post
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+# A review may be claimed (or expired) unless it was posted, or someone is posting it
+# under a live claim.
+CLAIMABLE = """(
+    posted_at IS NULL AND (
+        status IS DISTINCT FROM 'posting'
+        OR claimed_at IS NULL
+        OR claimed_at < NOW() - make_interval(secs => %(claim_timeout_s)s)
+    )
+)"""
+
+_CLAIMED_COLUMNS = "social_id, generated_comment, campaign_id, slack_channel, slack_ts, created_at, claimed_at"
+
+
+def _utc_now():
+    return datetime.now(timezone.utc)
+
+
+def claim_timeout_s() -> float:
+    return float(os.getenv("REVIEW_CLAIM_TIMEOUT_S", "900"))
+
+
+def retrying(what: str, fn, attempts: int | None = None):
+    """Calls fn(), retrying with backoff (1, 2, 4... s); re-raises the last failure."""
+    attempts = int(os.getenv("RECORD_RETRIES", "5")) if attempts is None else attempts
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= attempts:
+                raise
+            print(tracing.log_tag("record"), f"{what} failed (attempt {attempt}/{attempts}), retrying:", repr(e))
+            time.sleep(min(2 ** (attempt - 1), 30))
+
+
+def _update(slack_token: str, channel: str, ts: str, text: str) -> None:
+    """update_message that can't fail the caller: the DB already has the outcome."""
+    try:
+        update_message(slack_token, channel, ts, text)
+    except Exception as e:
+        print("[slack] chat.update failed:", repr(e))
+
+
+def claim_pending(channel: str) -> list[dict]:
+    """Marks all of the channel's claimable reviews as 'posting'; returns them, oldest first."""
+    with get_db() as (conn, cur):
+        cur.execute(
+            f"""
+            UPDATE pending_reviews pr
+            SET status = 'posting', claimed_at = NOW()
+            WHERE pr.social_id IN (
+                SELECT social_id FROM pending_reviews
+                WHERE slack_channel = %(channel)s AND {CLAIMABLE}
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING {", ".join(f"pr.{c}" for c in _CLAIMED_COLUMNS.split(", "))}
+            """,
+            {"channel": channel, "claim_timeout_s": claim_timeout_s()},
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    rows.sort(key=lambda r: r["created_at"] or _EPOCH)
+    return rows
+
+
+def renew_claims(rows: list[dict]) -> set[str]:
+    """
+    Extends the claims on `rows` (their claimed_at is updated in place); returns the
+    social_ids still ours. A claim that timed out and was taken by someone else isn't.
+    """
+    if not rows:
+        return set()
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            UPDATE pending_reviews pr
+            SET claimed_at = NOW()
+            FROM unnest(%s::text[], %s::timestamptz[]) AS c(social_id, claimed_at)
+            WHERE pr.social_id = c.social_id AND pr.status = 'posting' AND pr.claimed_at = c.claimed_at
+            RETURNING pr.social_id, pr.claimed_at
+            """,
+            ([r["social_id"] for r in rows], [r["claimed_at"] for r in rows]),
+        )
+        renewed = {r["social_id"]: r["claimed_at"] for r in cur.fetchall()}
+        conn.commit()
+    for row in rows:
+        if row["social_id"] in renewed:
+            row["claimed_at"] = renewed[row["social_id"]]
+    return set(renewed)
+
+
+def claim_review(social_id: str) -> dict | None:
+    """Claims one review for a single click; None if it's handled or being posted already."""
+    with get_db() as (conn, cur):
+        cur.execute(
+            f"""
+            UPDATE pending_reviews
+            SET status = 'posting', claimed_at = NOW()
+            WHERE social_id = %(social_id)s AND {CLAIMABLE}
+            RETURNING {_CLAIMED_COLUMNS}
+            """,
+            {"social_id": social_id, "claim_timeout_s": claim_timeout_s()},
+        )
+        row = cur.fetchone()
+        conn.commit()
+    return row
+
+
+def review_exists(social_id: str) -> bool:
+    """Whether the review is still in pending_reviews (e.g. someone else is posting it)."""
+    with get_db() as (conn, cur):
+        cur.execute("SELECT 1 FROM pending_reviews WHERE social_id = %s", (social_id,))
+        return cur.fetchone() is not None
+
+
+def mark_posted(row: dict, comment_text: str) -> bool:
+    """
+    Persists that the claimed `row` was posted (with the text as posted), before it's
+    recorded; see the module docstring. Returns False if that failed even after retries.
+    """
+    def mark():
+        with get_db() as (conn, cur):
+            cur.execute(
+                "UPDATE pending_reviews SET posted_at = NOW(), generated_comment = %s WHERE social_id = %s",
+                (comment_text, row["social_id"]),
+            )
+            conn.commit()
+
+    try:
+        retrying(f"marking {row['social_id']} posted", mark)
+        return True
+    except Exception as e:
+        print(tracing.log_tag("record"), f"{row['social_id']} posted but NOT marked posted:", repr(e))
+        return False
+
+
+def record_orphaned_posts(slack_token: str | None) -> int:
+    """
+    Records reviews marked posted whose poster never recorded them, once their claim
+    timed out (comments, handled_posts, Slack message); returns how many.
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            WITH done AS (
+                DELETE FROM pending_reviews
+                WHERE social_id IN (
+                    SELECT social_id FROM pending_reviews
+                    WHERE posted_at IS NOT NULL
+                      AND (claimed_at IS NULL OR claimed_at < NOW() - make_interval(secs => %(claim_timeout_s)s))
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING social_id, generated_comment, posted_at, campaign_id, slack_channel, slack_ts
+            ), recorded AS (
+                INSERT INTO comments(social_id, comment_text, commented_at, campaign_id)
+                SELECT social_id, COALESCE(generated_comment, ''), posted_at, campaign_id FROM done
+                ON CONFLICT (social_id) DO UPDATE
+                SET comment_text = EXCLUDED.comment_text,
+                    commented_at = EXCLUDED.commented_at,
+                    campaign_id = COALESCE(EXCLUDED.campaign_id, comments.campaign_id)
+            ), handled AS (
+                INSERT INTO handled_posts(social_id, status)
+                SELECT social_id, 'posted' FROM done
+                ON CONFLICT (social_id) DO UPDATE SET status=EXCLUDED.status, handled_at=NOW()
+            )
+            SELECT social_id, slack_channel, slack_ts FROM done
+            """,
+            {"claim_timeout_s": claim_timeout_s()},
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    for row in rows:
+        if slack_token and row["slack_ts"]:
+            _update(slack_token, row["slack_channel"], row["slack_ts"], "✅ Posted. (removed from queue)")
+    if rows:
+        print(tracing.log_tag("record"), f"recorded {len(rows)} posted reviews their poster left unrecorded")
+    return len(rows)
+
+
+def release_review(row: dict) -> None:
+    """Puts a claimed review back to pending (its post failed), unless the claim was lost."""
+    with get_db() as (conn, cur):
+        cur.execute(
+            "UPDATE pending_reviews SET status = 'pending', claimed_at = NULL "
+            "WHERE social_id = %s AND status = 'posting' AND claimed_at = %s",
+            (row["social_id"], row["claimed_at"]),
+        )
+        conn.commit()
+
+
+def _skip(where: str, params: dict) -> list[dict]:
+    params = dict(params, claim_timeout_s=claim_timeout_s())
+    with get_db() as (conn, cur):
+        cur.execute(
+            f"""
+            WITH skipped AS (
+                DELETE FROM pending_reviews
+                WHERE social_id IN (
+                    SELECT social_id FROM pending_reviews
+                    WHERE {where} AND {CLAIMABLE}
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING social_id, slack_channel, slack_ts
+            ),
+            handled AS (
+                INSERT INTO handled_posts(social_id, status)
+                SELECT social_id, 'skipped' FROM skipped
+                ON CONFLICT (social_id) DO UPDATE SET status=EXCLUDED.status, handled_at=NOW()
+            )
+            SELECT * FROM skipped
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    return rows
+
+
+def skip_review(social_id: str) -> dict | None:
+    """Skips one review for a single click; None if it's handled or being posted already."""
+    rows = _skip("social_id = %(social_id)s", {"social_id": social_id})
+    return rows[0] if rows else None
+
+
+def skip_all(channel: str, slack_token: str) -> int:
+    """Skips all of the channel's claimable reviews in one statement; returns how many."""
+    rows = _skip("slack_channel = %(channel)s", {"channel": channel})
+    for row in rows:
+        if row["slack_ts"]:
+            _update(slack_token, row["slack_channel"], row["slack_ts"], "⏭️ Skipped (all remaining). (removed from queue)")
+    print(tracing.log_tag("skip_all"), f"skipped {len(rows)} reviews in {channel}")
+    return len(rows)
+
+
+class _Recorder(threading.Thread):
+    """
+    Records posted/failed items in batches (whatever has queued up) and updates Slack.
+    If recording fails even after retries, it stops recording (`error` is set) and
+    collects the posted items it couldn't record in `unrecorded`.
+    """
+
+    def __init__(self, slack_token: str):
+        super().__init__(name="bulk-recorder", daemon=True)
+        self.slack_token = slack_token
+        self.posted = 0
+        self.failed = 0
+        self.error: Exception | None = None
+        self.unrecorded: list[str] = []
+        self._queue: queue.Queue = queue.Queue()
+        # the caller's trace: recording spans and log lines belong to the bulk action
+        self._context = contextvars.copy_context()
+
+    def put(self, row: dict, posted: bool) -> None:
+        self._queue.put((row, posted, _utc_now()))
+
+    def stop(self) -> None:
+        """Returns once everything put so far is recorded (or given up on)."""
+        self._queue.put(None)
+        self.join()
+
+    def run(self) -> None:
+        self._context.run(self._run)
+
+    def _run(self) -> None:
+        while True:
+            batch, done = [], False
+            item = self._queue.get()
+            while item is not None:
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                done = True
+            if batch and self.error is None:
+                try:
+                    retrying("recording approve_all results", lambda: self._record(batch))
+                except Exception as e:
+                    self.error = e
+                    print(tracing.log_tag("approve_all"), "recording failed, giving up:", repr(e))
+                    print(traceback.format_exc())
+            if batch and self.error is not None:
+                self.unrecorded += [row["social_id"] for row, ok, _ in batch if ok]
+            if done:
+                return
+
+    def _record(self, batch: list[tuple[dict, bool, datetime]]) -> None:
+        posted = [(row, at) for row, ok, at in batch if ok]
+        failed = [row for row, ok, _ in batch if not ok]
+        with get_db() as (conn, cur):
+            if posted:
+                cur.execute(
+                    """
+                    INSERT INTO comments(social_id, comment_text, commented_at, campaign_id)
+                    SELECT * FROM unnest(%s::text[], %s::text[], %s::timestamptz[], %s::int[])
+                    ON CONFLICT (social_id) DO UPDATE
+                    SET comment_text = EXCLUDED.comment_text,
+                        commented_at = EXCLUDED.commented_at,
+                        campaign_id = COALESCE(EXCLUDED.campaign_id, comments.campaign_id)
+                    """,
+                    (
+                        [r["social_id"] for r, _ in posted],
+                        [r["generated_comment"] or "" for r, _ in posted],
+                        [at for _, at in posted],
+                        [r["campaign_id"] for r, _ in posted],
+                    ),
+                )
+                cur.execute(
+                    """
+                    INSERT INTO handled_posts(social_id, status)
+                    SELECT u, 'posted' FROM unnest(%s::text[]) AS u
+                    ON CONFLICT (social_id) DO UPDATE SET status=EXCLUDED.status, handled_at=NOW()
+                    """,
+                    ([r["social_id"] for r, _ in posted],),
+                )
+                cur.execute(
+                    "DELETE FROM pending_reviews WHERE social_id = ANY(%s)",
+                    ([r["social_id"] for r, _ in posted],),
+                )
+            if failed:
+                # only our own claims: one that timed out may belong to someone else now
+                cur.execute(
+                    """
+                    UPDATE pending_reviews pr
+                    SET status = 'pending', claimed_at = NULL
+                    FROM unnest(%s::text[], %s::timestamptz[]) AS c(social_id, claimed_at)
+                    WHERE pr.social_id = c.social_id AND pr.status = 'posting' AND pr.claimed_at = c.claimed_at
+                    """,
+                    ([r["social_id"] for r in failed], [r["claimed_at"] for r in failed]),
+                )
+            conn.commit()
+        self.posted += len(posted)
+        self.failed += len(failed)
+        for row, _ in posted:
+            if row["slack_ts"]:
+                _update(self.slack_token, row["slack_channel"], row["slack_ts"], "✅ Posted (approve all). (removed from queue)")
+
+
+def approve_all(channel: str, slack_token: str) -> tuple[int, int]:
+    """Posts all of the channel's pending reviews; returns (posted, failed)."""
+    rows = claim_pending(channel)
+    if not rows:
+        print(tracing.log_tag("approve_all"), f"nothing pending in {channel}")
+        return 0, 0
+    print(tracing.log_tag("approve_all"), f"posting {len(rows)} reviews from {channel}")
+    min_s = float(os.getenv("BULK_POST_MIN_S", "15"))
+    max_s = float(os.getenv("BULK_POST_MAX_S", "40"))
+    renew_every_s = claim_timeout_s() / 3
+    renewed_at = time.monotonic()
+    lost: set[str] = set()
+
+    recorder = _Recorder(slack_token)
+    recorder.start()
+    attempted = 0
+    try:
+        for row in rows:
+            if recorder.error is not None:
+                break
+            if attempted:
+                timing.sleep(random.uniform(min_s, max_s))
+            if time.monotonic() - renewed_at >= renew_every_s:
+                remaining = rows[attempted:]
+                lost |= {r["social_id"] for r in remaining} - renew_claims(remaining)
+                renewed_at = time.monotonic()
+            attempted += 1
+            social_id = row["social_id"]
+            if social_id in lost:
+                print(tracing.log_tag("approve_all"), f"claim on {social_id} timed out and was taken over; not posting it")
+                continue
+            comment_text = row["generated_comment"] or ""
+            try:
+                if os.getenv("DRY_RUN") == "1":
+                    print(f"[DRY_RUN] Would comment on {social_id}: {comment_text[:200]}")
+                else:
+                    comment_on_post(
+                        os.environ["UNIPILE_DSN"],
+                        os.environ["UNIPILE_ACCOUNT_ID"],
+                        os.environ["UNIPILE_API_KEY"],
+                        social_id,
+                        comment_text,
+                        debug=True,
+                    )
+            except breaker.CircuitOpenError as e:
+                print(tracing.log_tag("approve_all"), f"stopping, Unipile unavailable: {e}")
+                attempted -= 1
+                break
+            except Exception as e:
+                print(tracing.log_tag("approve_all"), f"failed to post {social_id}: {repr(e)}")
+                recorder.put(row, False)
+                continue
+            marked = mark_posted(row, comment_text)
+            recorder.put(row, True)
+            if not marked:
+                # the DB is failing: what we post from here on couldn't be kept from
+                # being posted again
+                print(tracing.log_tag("approve_all"), "stopping, can't mark posts as posted")
+                break
+    finally:
+        # whatever wasn't attempted (circuit open, crash) goes back to pending
+        for row in rows[attempted:]:
+            recorder.put(row, False)
+        recorder.stop()
+    if recorder.error is not None:
+        # marked posted, these are recorded once their claims time out (record_orphaned_posts);
+        # any that couldn't be marked either need recording by hand
+        print(tracing.log_tag("approve_all"), f"{channel}: posted but NOT recorded: {recorder.unrecorded}")
+        raise recorder.error
+    print(tracing.log_tag("approve_all"), f"{channel}: {recorder.posted} posted, {recorder.failed} failed")
+    return recorder.posted, recorder.failed
@@ -0,0 +1,80 @@
+import os
+from pathlib import Path
+
+from db import get_db
+
+DEFAULT_PROMPT_FILE = "prompt.md"
+
+_prompt_cache: dict[str, str] = {}
+
+
+def load_prompt(prompt_file: str | None) -> str:
+    path = prompt_file or DEFAULT_PROMPT_FILE
+    text = _prompt_cache.get(path)
+    if text is None:
+        text = Path(path).read_text()
+        _prompt_cache[path] = text
+    return text
+
+
+def ensure_default_campaign() -> None:
+    """
+    Keeps the single-list env setup working: if SALESNAV_URL/SLACK_USER_ID are set,
+    they're upserted as the campaign named 'default'.
+    """
+    salesnav_url = os.getenv("SALESNAV_URL")
+    slack_user_id = os.getenv("SLACK_USER_ID")
+    if not salesnav_url or not slack_user_id:
+        return
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            INSERT INTO campaigns(name, salesnav_url, slack_user_id, prompt_file, max_per_day)
+            VALUES ('default', %s, %s, %s, %s)
+            ON CONFLICT (name) DO UPDATE SET
+                salesnav_url=EXCLUDED.salesnav_url,
+                slack_user_id=EXCLUDED.slack_user_id,
+                prompt_file=EXCLUDED.prompt_file,
+                max_per_day=EXCLUDED.max_per_day
+            """,
+            (
+                salesnav_url,
+                slack_user_id,
+                os.getenv("PROMPT_FILE", DEFAULT_PROMPT_FILE),
+                int(os.getenv("MAX_COMMENTS_PER_DAY", "20")),
+            ),
+        )
+        conn.commit()
+
+
+def active_campaigns() -> list[dict]:
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            SELECT id, name, salesnav_url, slack_user_id, prompt_file, max_per_day
+            FROM campaigns
+            WHERE active
+            ORDER BY id
+            """
+        )
+        return cur.fetchall()
+
+
+def remaining_today(campaign: dict) -> int:
+    """
+    Rolling daily cap: max_per_day minus the campaign's reviews delivered in the last
+    24h, whether they were approved, skipped, expired or are still waiting (skipping
+    every card doesn't earn more), and minus older reviews still waiting in Slack.
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM review_deliveries
+                    WHERE campaign_id = %(id)s AND delivered_at >= NOW() - INTERVAL '24 hours')
+                 + (SELECT COUNT(*) FROM pending_reviews
+                    WHERE campaign_id = %(id)s AND created_at < NOW() - INTERVAL '24 hours') AS used
+            """,
+            {"id": campaign["id"]},
+        )
+        used = cur.fetchone()["used"]
+    return max(campaign["max_per_day"] - used, 0)
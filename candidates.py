@@ -0,0 +1,345 @@
+import os
+import threading
+
+import breaker
+import prefilter
+import tracing
+from db import get_db
+from scoring import score_eligible_posts
+from claude import generate_comment
+from campaigns import load_prompt
+
+# Buffered comments older than this are dropped (the post has moved on).
+BUFFER_MAX_AGE_HOURS = float(os.getenv("CANDIDATE_BUFFER_MAX_AGE_HOURS", "48"))
+
+
+def buffer_size(campaign: dict) -> int:
+    """CANDIDATE_BUFFER_SIZE per campaign (default: the campaign's daily cap)."""
+    return int(os.getenv("CANDIDATE_BUFFER_SIZE") or campaign["max_per_day"])
+
+
+def buffer_shortfall(campaign: dict, size: int | None = None) -> int:
+    """How many candidates `campaign`'s buffer is short of `size` (default buffer_size())."""
+    size = buffer_size(campaign) if size is None else size
+    with get_db() as (conn, cur):
+        cur.execute("SELECT COUNT(*) AS n FROM candidate_buffer WHERE campaign_id=%s", (campaign["id"],))
+        return max(size - cur.fetchone()["n"], 0)
+
+
+# Not commented, pending review, handled (skipped/posted) or buffered (nor by someone
+# who has a post buffered); with %(campaign_id)s, by someone on that campaign's list.
+_ELIGIBLE = """
+    NOT EXISTS (SELECT 1 FROM comments c WHERE c.social_id = p.social_id)
+    AND NOT EXISTS (SELECT 1 FROM pending_reviews pr WHERE pr.social_id = p.social_id)
+    AND NOT EXISTS (SELECT 1 FROM handled_posts h WHERE h.social_id = p.social_id)
+    AND NOT EXISTS (
+      SELECT 1 FROM candidate_buffer cb
+      WHERE cb.social_id = p.social_id OR cb.person_identifier = p.person_identifier
+    )
+    AND (%(campaign_id)s::int IS NULL OR EXISTS (
+      SELECT 1
+      FROM campaign_targets ct
+      JOIN targets t ON t.profile_url = ct.profile_url
+      WHERE ct.campaign_id = %(campaign_id)s
+        AND ct.removed_at IS NULL
+        AND t.person_identifier = p.person_identifier
+    ))
+"""
+
+# How many of the best scores the fast path checks per pick.
+PICK_SCAN_FACTOR = int(os.getenv("PICK_SCAN_FACTOR", "20"))
+
+
+def pick_eligible_posts(limit: int, campaign_id: int | None = None) -> list[dict]:
+    """
+    Top-`limit` posts by relevance score (post_scores, see scoring.py) that are not already:
+      - commented
+      - pending review
+      - handled (skipped/posted)
+      - already buffered with a generated comment (nor by someone who has one buffered)
+    Prefer 1 per person (distinct person_identifier, their best-scoring post) so it
+    spreads across the list. With `campaign_id`, only posts by people currently on that
+    campaign's list.
+
+    The best limit * PICK_SCAN_FACTOR scores are read off idx_post_scores_score and only
+    those are checked. If that doesn't yield `limit` posts (e.g. a campaign with few of
+    the top authors), the whole pool is searched, with unscored posts ranking last in
+    random order.
+    """
+    params = {"campaign_id": campaign_id, "limit": limit, "scan": max(limit * PICK_SCAN_FACTOR, 100)}
+    with get_db() as (conn, cur):
+        cur.execute(
+            f"""
+            WITH top AS (
+                SELECT social_id, score FROM post_scores
+                ORDER BY score DESC
+                LIMIT %(scan)s
+            ),
+            one_per_person AS (
+                SELECT DISTINCT ON (p.person_identifier)
+                    p.social_id, p.person_identifier, p.profile_url, p.profile_name, p.post_created_at, top.score
+                FROM top
+                JOIN post_pool p ON p.social_id = top.social_id
+                WHERE {_ELIGIBLE}
+                ORDER BY p.person_identifier, top.score DESC, p.post_created_at DESC NULLS LAST
+            ),
+            picked AS (
+                SELECT * FROM one_per_person ORDER BY score DESC LIMIT %(limit)s
+            )
+            SELECT picked.social_id, picked.person_identifier, picked.profile_url, picked.profile_name,
+                   pt.post_text, picked.post_created_at, picked.score
+            FROM picked
+            LEFT JOIN post_texts pt ON pt.social_id = picked.social_id
+            ORDER BY picked.score DESC
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+        if len(rows) >= limit:
+            return rows
+
+        cur.execute(
+            f"""
+            WITH eligible AS (
+                SELECT p.*, s.score
+                FROM post_pool p
+                LEFT JOIN post_scores s ON s.social_id = p.social_id
+                WHERE {_ELIGIBLE}
+            ),
+            one_per_person AS (
+                SELECT DISTINCT ON (person_identifier)
+                    social_id, person_identifier, profile_url, profile_name, post_created_at, score
+                FROM eligible
+                ORDER BY person_identifier, score DESC NULLS LAST, post_created_at DESC NULLS LAST, last_seen_at DESC
+            ),
+            picked AS (
+                SELECT *, RANDOM() AS tiebreak
+                FROM one_per_person
+                ORDER BY score DESC NULLS LAST, tiebreak
+                LIMIT %(limit)s
+            )
+            SELECT picked.social_id, picked.person_identifier, picked.profile_url, picked.profile_name,
+                   pt.post_text, picked.post_created_at, picked.score
+            FROM picked
+            LEFT JOIN post_texts pt ON pt.social_id = picked.social_id
+            ORDER BY picked.score DESC NULLS LAST, picked.tiebreak
+            """,
+            params,
+        )
+        return cur.fetchall()
+
+
+def invalidate_buffer(lookback_days: int = 30) -> int:
+    """
+    Drops buffered candidates that became ineligible: commented, pending, handled,
+    gone from post_pool or past the lookback, author no longer on the campaign's list,
+    campaign deactivated, or the comment is older than CANDIDATE_BUFFER_MAX_AGE_HOURS.
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            DELETE FROM candidate_buffer cb
+            WHERE EXISTS (SELECT 1 FROM comments c WHERE c.social_id = cb.social_id)
+               OR EXISTS (SELECT 1 FROM pending_reviews pr WHERE pr.social_id = cb.social_id)
+               OR EXISTS (SELECT 1 FROM handled_posts h WHERE h.social_id = cb.social_id)
+               OR NOT EXISTS (
+                    SELECT 1 FROM post_pool p
+                    WHERE p.social_id = cb.social_id
+                      AND (p.post_created_at IS NULL OR p.post_created_at >= NOW() - make_interval(days => %s))
+               )
+               OR NOT EXISTS (
+                    SELECT 1
+                    FROM campaign_targets ct
+                    JOIN targets t ON t.profile_url = ct.profile_url
+                    WHERE ct.campaign_id = cb.campaign_id
+                      AND ct.removed_at IS NULL
+                      AND t.person_identifier = cb.person_identifier
+               )
+               OR NOT EXISTS (SELECT 1 FROM campaigns c WHERE c.id = cb.campaign_id AND c.active)
+               OR cb.buffered_at < NOW() - make_interval(secs => %s)
+            """,
+            (lookback_days, BUFFER_MAX_AGE_HOURS * 3600),
+        )
+        dropped = cur.rowcount
+        conn.commit()
+    if dropped:
+        print(f"[BUFFER] invalidated {dropped} buffered candidates")
+    return dropped
+
+
+def refill_buffer(campaign: dict, anthropic_key: str, size: int | None = None) -> int:
+    """
+    Tops `campaign`'s buffer up to `size` (default buffer_size()) with freshly
+    generated comments; picks the pre-filter expects to be skipped never reach the LLM.
+    Returns how many were generated.
+    """
+    campaign_id = campaign["id"]
+    need = buffer_shortfall(campaign, size)
+    if need <= 0:
+        return 0
+
+    prompt = load_prompt(campaign.get("prompt_file"))
+    generated = 0
+    with get_db() as (conn, cur):
+        # The pre-filter may drop some picks (they're marked handled, so the next
+        # round picks others); a few rounds is enough to fill the gap.
+        for _ in range(5):
+            picks = pick_eligible_posts(limit=need, campaign_id=campaign_id)
+            if not picks:
+                break
+            keep = prefilter.filter_picks(picks)
+            for row in keep:
+                social_id = row["social_id"]
+                name = row.get("profile_name") or "name"
+                post_text = row.get("post_text") or ""
+                try:
+                    comment = generate_comment(anthropic_key, name, post_text, prompt=prompt)
+                except breaker.CircuitOpenError:
+                    raise
+                except Exception as e:
+                    print(f"[WARN] comment generation failed for {name} ({social_id}): {repr(e)}")
+                    continue
+                cur.execute(
+                    """
+                    INSERT INTO candidate_buffer
+                      (social_id, campaign_id, person_identifier, profile_name, generated_comment)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (social_id) DO NOTHING
+                    """,
+                    (social_id, campaign_id, row.get("person_identifier"), name, comment),
+                )
+                conn.commit()
+                generated += 1
+                need -= 1
+            if need <= 0 or len(keep) == len(picks):
+                break
+    return generated
+
+
+def take_candidates(campaign_id: int, limit: int) -> list[dict]:
+    """Claims (removes) up to `limit` buffered candidates for delivery, oldest first."""
+    if limit <= 0:
+        return []
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            WITH taken AS (
+                DELETE FROM candidate_buffer
+                WHERE social_id IN (
+                    SELECT social_id FROM candidate_buffer
+                    WHERE campaign_id = %s
+                    ORDER BY buffered_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING social_id, person_identifier, profile_name, generated_comment, buffered_at
+            )
+            SELECT taken.*, pt.post_text
+            FROM taken
+            LEFT JOIN post_texts pt ON pt.social_id = taken.social_id
+            """,
+            (campaign_id, limit),
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    rows.sort(key=lambda r: r["buffered_at"])
+    return rows
+
+
+class BufferRefiller(threading.Thread):
+    """
+    Refills every campaign's buffer in the background while posts are being ingested.
+    The ingest loop calls notify() after each batch of posts; notifications coalesce,
+    so a slow Claude call never holds up ingestion. A pass only runs for campaigns whose
+    buffer is short, and first scores the posts ingested since the last one, so the
+    buffer takes the best posts seen so far. `on_refill()` is called after a pass
+    that generated something (daemon mode delivers from there).
+    """
+
+    def __init__(self, campaigns: list[dict], anthropic_key: str, on_refill=None):
+        super().__init__(name="buffer-refiller", daemon=True)
+        self.campaigns = campaigns
+        self.anthropic_key = anthropic_key
+        self.on_refill = on_refill
+        self.generated = 0
+        self._trace_parent = tracing.current()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> int:
+        """Stops after the current refill; returns how many comments were generated."""
+        self._stopping.set()
+        self._wake.set()
+        self.join()
+        return self.generated
+
+    def run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopping.is_set():
+                return
+            with tracing.span("buffer.refill_pass", parent=self._trace_parent):
+                if not self._refill_pass():
+                    return
+
+    def _refill_pass(self) -> bool:
+        """One rescore + refill of the campaigns whose buffer is short; False if stopped midway."""
+        try:
+            short = [c for c in self.campaigns if buffer_shortfall(c) > 0]
+        except Exception as e:
+            print(f"[BUFFER] buffer check failed: {repr(e)}")
+            return True
+        if not short:
+            return True
+        try:
+            score_eligible_posts()
+        except Exception as e:
+            print(f"[BUFFER] scoring failed: {repr(e)}")
+        before = self.generated
+        for campaign in short:
+            if self._stopping.is_set():
+                return False
+            try:
+                self.generated += refill_buffer(campaign, self.anthropic_key)
+            except breaker.CircuitOpenError as e:
+                print(f"[BUFFER] refill paused: {e}")
+                break
+            except Exception as e:
+                print(f"[BUFFER] refill failed for {campaign['name']}: {repr(e)}")
+        if self.on_refill and self.generated > before:
+            self.on_refill()
+        return True
+
+
+def return_candidates(campaign_id: int, rows: list[dict]) -> int:
+    """Puts taken candidates that weren't delivered back into the buffer (same buffered_at)."""
+    if not rows:
+        return 0
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            INSERT INTO candidate_buffer
+              (social_id, campaign_id, person_identifier, profile_name, generated_comment, buffered_at)
+            SELECT u.social_id, %s, u.person_identifier, u.profile_name, u.generated_comment, u.buffered_at
+            FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], %s::timestamptz[])
+                AS u(social_id, person_identifier, profile_name, generated_comment, buffered_at)
+            ON CONFLICT (social_id) DO NOTHING
+            """,
+            (
+                campaign_id,
+                [r["social_id"] for r in rows],
+                [r.get("person_identifier") for r in rows],
+                [r.get("profile_name") for r in rows],
+                [r["generated_comment"] for r in rows],
+                [r["buffered_at"] for r in rows],
+            ),
+        )
+        returned = cur.rowcount
+        conn.commit()
+    if returned:
+        print(f"[BUFFER] returned {returned} undelivered candidates to the buffer")
+    return returned
@@ -0,0 +1,74 @@
+"""
+Import-time budget for the web path: Slack must get its ack within 3s of the first
+click after a cold start, so importing slack_server has to stay cheap.
+
+    python check_import_time.py                  # default budget
+    python check_import_time.py --budget-ms 300 --repeat 5
+
+Imports slack_server in fresh interpreters (without DATABASE_URL, which must not be
+read at import) and exits 1 if the best-of-N import time exceeds the budget or if a
+module that's supposed to load lazily got imported.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Loaded by slack_server._warmup() / the handlers, never at import.
+LAZY_MODULES = ("db", "psycopg", "requests", "http_client", "unipile", "slack_modal", "bulk_actions", "anthropic", "numpy", "ijson")
+
+_PROBE = (
+    "import sys, slack_server\n"
+    "print(','.join(m for m in %r if m in sys.modules))\n" % (LAZY_MODULES,)
+)
+
+
+def measure() -> tuple[float, list[str]]:
+    env = {k: v for k, v in os.environ.items() if k != "DATABASE_URL"}
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=HERE,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = None
+    for line in out.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "slack_server":
+            cumulative_us = int(parts[1].strip())
+    if cumulative_us is None:
+        raise RuntimeError("no importtime line for slack_server:\n" + out.stderr[-2000:])
+    loaded = [m for m in out.stdout.strip().split(",") if m]
+    return cumulative_us / 1000.0, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="slack_server import-time budget")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "400")))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.repeat)]
+    best_ms = min(ms for ms, _ in runs)
+    loaded = runs[-1][1]
+    print(f"[import] slack_server: {best_ms:.0f} ms (best of {args.repeat}, budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if best_ms > args.budget_ms:
+        print(f"[import] OVER BUDGET by {best_ms - args.budget_ms:.0f} ms")
+        failed = True
+    if loaded:
+        print(f"[import] modules that should load lazily were imported: {', '.join(loaded)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("[import] ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,107 @@
 from anthropic import Anthropic
 from pathlib import Path
 import os
+import re
+import threading
+import time
+
+import breaker
+import metrics
+import timing
 
 PROMPT = Path("prompt.md").read_text()
 
-def generate_comment(api_key, author, post_text):
+# Local checks for the prompt.md output rules (cascade mode): a draft from the fast
+# model that breaks one of these goes to the larger model instead.
+BANNED_PHRASES = (
+    "great post",
+    "love this",
+    "thanks for sharing",
+    "great insights",
+    "well said",
+    "couldn't agree more",
+)
+_BULLET_RE = re.compile(r"^\s*(?:[-*•·]|\d+[.)])\s+", re.M)
+_FORMATTING_RE = re.compile(r"\*\*|__|^#+\s|```", re.M)
+_PREAMBLE_RE = re.compile(r"^\s*(?:here(?:'s| is)|comment:|sure[,!])", re.I)
+_SENTENCE_RE = re.compile(r"[.!?]+(?:\s|$)")
+
+
+def check_comment(text: str) -> list[str]:
+    """Names of the rules `text` breaks (empty list = acceptable)."""
+    if not text.strip():
+        return ["empty"]
+    failed = []
+    lowered = text.lower()
+    if len(text) > int(os.getenv("COMMENT_MAX_CHARS", "400")) or len(_SENTENCE_RE.findall(text)) > 3:
+        failed.append("too_long")
+    if any(p in lowered for p in BANNED_PHRASES):
+        failed.append("banned_phrase")
+    if _BULLET_RE.search(text) or _FORMATTING_RE.search(text) or "\n\n" in text.strip():
+        failed.append("formatting")
+    if _PREAMBLE_RE.match(text):
+        failed.append("preamble")
+    return failed
+
+
+_stats_lock = threading.Lock()
+_tier_latencies: dict[str, list[float]] = {}
+_escalations: dict[str, int] = {}
+_cascade_calls = 0
+
+
+def _record_tier(tier: str, seconds: float) -> None:
+    metrics.LLM_TIER_LATENCY.labels(tier).observe(seconds)
+    with _stats_lock:
+        _tier_latencies.setdefault(tier, []).append(seconds)
+
+
+def cascade_summary(reset: bool = False) -> dict | None:
+    """
+    Per-tier latency percentiles and the escalation rate since the last reset (None if
+    no comment was generated). Runs report and reset it, so each run gets its own.
+    """
+    global _cascade_calls
+    with _stats_lock:
+        if not _tier_latencies:
+            return None
+        escalated = sum(_escalations.values())
+        summary = {
+            "comments": _cascade_calls,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / _cascade_calls, 4) if _cascade_calls else None,
+            "escalation_reasons": dict(_escalations),
+            "tiers": {tier: timing.percentiles(xs) for tier, xs in _tier_latencies.items()},
+        }
+        if reset:
+            _tier_latencies.clear()
+            _escalations.clear()
+            _cascade_calls = 0
+    return summary
+
+
+def _create(client, model: str, message: str, tier: str) -> str:
+    t0 = time.perf_counter()
+    with breaker.guard("anthropic", "generate_comment"), metrics.track("anthropic", "generate_comment"):
+        resp = client.messages.create(
+            model=model,
+            max_tokens=200,
+            temperature=0.7,
+            messages=[{"role": "user", "content": message}]
+        )
+    _record_tier(tier, time.perf_counter() - t0)
+    return resp.content[0].text.strip()
+
+
+def generate_comment(api_key, author, post_text, prompt=None):
+    """
+    `prompt` overrides prompt.md (campaigns can bring their own prompt file).
+
+    With MODEL_CASCADE=1 the fast model (ANTHROPIC_FAST_MODEL) writes a draft first;
+    only a draft that fails check_comment() (or a failed call) escalates to
+    ANTHROPIC_MODEL.
+    """
+    global _cascade_calls
     client = Anthropic(api_key=api_key)
 
     message = f"""
@@ -16,14 +113,31 @@ def generate_comment(api_key, author, post_text):
     \"\"\"
 
     ---
-    {PROMPT}
+    {prompt or PROMPT}
     """
 
-    resp = client.messages.create(
-        model=os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-5"),
-        max_tokens=200,
-        temperature=0.7,
-        messages=[{"role": "user", "content": message}]
-    )
+    model = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-5")
+    if os.getenv("MODEL_CASCADE") != "1":
+        return _create(client, model, message, "single")
 
-    return resp.content[0].text.strip()
+    with _stats_lock:
+        _cascade_calls += 1
+    try:
+        draft = _create(client, os.getenv("ANTHROPIC_FAST_MODEL", "claude-haiku-4-5"), message, "fast")
+        failed = check_comment(draft)
+    except breaker.CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"[cascade] fast model failed, escalating: {repr(e)}")
+        failed = ["error"]
+    if not failed:
+        metrics.LLM_CASCADE_RESULT.labels("fast").inc()
+        return draft
+
+    reason = failed[0]
+    metrics.LLM_ESCALATIONS.labels(reason).inc()
+    with _stats_lock:
+        _escalations[reason] = _escalations.get(reason, 0) + 1
+    comment = _create(client, model, message, "strong")
+    metrics.LLM_CASCADE_RESULT.labels("strong").inc()
+    return comment
@@ -0,0 +1,277 @@
+"""
+Daemon mode: the daily pipeline as one long-running process instead of a cron one-shot.
+
+    python daemon.py               # run until SIGTERM/SIGINT
+    python daemon.py --full-sync   # force a full Sales Nav resync on the first cycle
+
+State stays warm between cycles: the DB pool, HTTP sessions, read-account pacing,
+circuit breakers and the prompt/pre-filter caches. Each cycle is recorded in `runs`
+like a one-shot run: expire stale reviews -> deliver from the buffer -> sync + resolve
+(when due) -> refresh post_pool -> score -> deliver -> refill. During refresh, reviews
+for fresh posts go out as soon as their comments are buffered, not at the end.
+
+The cap is rolling per campaign: at most max_per_day (MAX_COMMENTS_PER_DAY for the
+'default' campaign) reviews delivered in the last 24h, however they were handled, plus
+older ones still pending (campaigns.remaining_today), however many cycles run.
+
+DAEMON_CYCLE_MINUTES  time between cycle starts (default 15)
+DAEMON_SYNC_HOURS     Sales Nav sync + resolve interval (default 24)
+TARGET_REFRESH_HOURS  how long a target's posts stay fresh (default 20): each cycle only
+                      refreshes targets past it, so a lead is polled about once a day
+                      rather than every cycle
+"""
+import argparse
+import functools
+import os
+import signal
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+
+import breaker
+import db
+import metrics
+import timing
+import tracing
+from accounts import AccountPool, read_pool_from_env
+from campaigns import active_campaigns, ensure_default_campaign, remaining_today
+from candidates import BufferRefiller, invalidate_buffer, refill_buffer
+from daily_commenter import (
+    _report_timing,
+    deliver_reviews,
+    refresh_post_pool_for_all_targets,
+    resolve_missing_identifiers,
+    sync_campaigns,
+)
+from expiry import expire_pending_reviews
+from leases import chunks_from_env, refresh_in_chunks, seed_chunks
+from profiling import profiled
+from runs import finish_run, set_stage, start_run
+from scoring import score_eligible_posts
+
+
+class Stopping(Exception):
+    """Raised inside a cycle once shutdown was requested."""
+
+
+@dataclass
+class DaemonState:
+    read_pool: AccountPool
+    force_full_sync: bool = False
+    last_sync_at: float | None = None
+    cycles: int = 0
+
+    def sync_due(self, every_s: float) -> bool:
+        return self.last_sync_at is None or time.monotonic() - self.last_sync_at >= every_s
+
+
+def deliver_all(run_id: int, campaigns: list[dict], anthropic_key: str, slack_token: str,
+                generate: bool = True, stages: bool = True) -> int:
+    """Delivers each campaign's rolling-cap remainder."""
+    sent = 0
+    for campaign in campaigns:
+        remaining = remaining_today(campaign)
+        if remaining:
+            sent += deliver_reviews(
+                run_id, campaign, remaining, anthropic_key, slack_token, generate=generate, stages=stages,
+            )
+    return sent
+
+
+class ReviewDeliverer(threading.Thread):
+    """
+    Sends buffered reviews while refresh is still running. The buffer refiller calls
+    notify() after generating comments; notifications coalesce like BufferRefiller's.
+    """
+
+    def __init__(self, run_id: int, campaigns: list[dict], anthropic_key: str, slack_token: str):
+        super().__init__(name="review-deliverer", daemon=True)
+        self.run_id = run_id
+        self.campaigns = campaigns
+        self.anthropic_key = anthropic_key
+        self.slack_token = slack_token
+        self.sent = 0
+        self._trace_parent = tracing.current()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> int:
+        """Stops after the current delivery; returns how many reviews were sent."""
+        self._stopping.set()
+        self._wake.set()
+        self.join()
+        return self.sent
+
+    def run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopping.is_set():
+                return
+            try:
+                with tracing.span("deliver.streamed", parent=self._trace_parent):
+                    self.sent += deliver_all(
+                        self.run_id, self.campaigns, self.anthropic_key, self.slack_token, generate=False, stages=False,
+                    )
+            except breaker.CircuitOpenError as e:
+                print(f"[DELIVER] paused: {e}")
+            except Exception as e:
+                print(f"[DELIVER] failed: {repr(e)}")
+
+
+def run_cycle(run: dict, state: DaemonState, stop: threading.Event) -> None:
+    run_id = run["id"]
+
+    dsn = os.environ["UNIPILE_DSN"]
+    account_id = os.environ["UNIPILE_ACCOUNT_ID"]
+    api_key = os.environ["UNIPILE_API_KEY"]
+    slack_token = os.environ["SLACK_BOT_TOKEN"]
+    anthropic_key = os.environ["ANTHROPIC_API_KEY"]
+
+    lookback_days = int(os.getenv("POST_LOOKBACK_DAYS", "30"))
+    max_people = int(os.getenv("MAX_PEOPLE", "500"))
+    limit_posts = int(os.getenv("POSTS_LIMIT", "10"))
+    debug = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+    sync_every_s = float(os.getenv("DAEMON_SYNC_HOURS", "24")) * 3600
+
+    ensure_default_campaign()
+    campaigns = active_campaigns()
+    if not campaigns:
+        print("[DAEMON] No active campaigns; idle this cycle")
+        return
+
+    expire_pending_reviews(slack_token)
+    invalidate_buffer(lookback_days)
+    early_sent = deliver_all(run_id, campaigns, anthropic_key, slack_token, generate=False)
+
+    if state.sync_due(sync_every_s):
+        timing.begin_stage("sync")
+        sync_campaigns(run_id, campaigns, state.read_pool, full_sync=state.force_full_sync)
+        set_stage(run_id, "resolve")
+        timing.begin_stage("resolve")
+        resolve_missing_identifiers(
+            dsn, account_id, api_key, max_to_resolve=max_people * len(campaigns), debug=debug,
+            read_pool=state.read_pool,
+        )
+        state.last_sync_at = time.monotonic()
+        state.force_full_sync = False
+    set_stage(run_id, "refresh")
+
+    def on_ingest():
+        if stop.is_set():
+            raise Stopping()
+        refiller.notify()
+
+    timing.begin_stage("refresh")
+    invalidate_buffer(lookback_days)
+    deliverer = ReviewDeliverer(run_id, campaigns, anthropic_key, slack_token)
+    refiller = BufferRefiller(campaigns, anthropic_key, on_refill=deliverer.notify)
+    deliverer.start()
+    refiller.start()
+    seed_chunks(run_id, chunks_from_env())
+    try:
+        upserted = refresh_in_chunks(
+            run_id,
+            functools.partial(
+                refresh_post_pool_for_all_targets,
+                dsn=dsn,
+                account_id=account_id,
+                api_key=api_key,
+                lookback_days=lookback_days,
+                limit_posts=limit_posts,
+                debug=debug,
+                run_id=run_id,
+                read_pool=state.read_pool,
+                on_ingest=on_ingest,
+            ),
+            on_wait=on_ingest,
+        )
+    finally:
+        generated = refiller.stop()
+        streamed = deliverer.stop()
+    print(f"[POOL] Upserted {upserted} posts into post_pool")
+    print(f"[BUFFER] generated {generated} comments during refresh, {streamed} reviews sent while ingesting")
+    set_stage(run_id, "deliver")
+
+    timing.begin_stage("score")
+    score_eligible_posts()
+
+    invalidate_buffer(lookback_days)
+    sent = early_sent + streamed + deliver_all(run_id, campaigns, anthropic_key, slack_token)
+    print(f"[DONE] Sent {sent} Slack review messages this cycle.")
+
+    timing.begin_stage("refill")
+    for campaign in campaigns:
+        if stop.is_set():
+            break
+        try:
+            refill_buffer(campaign, anthropic_key)
+        except breaker.CircuitOpenError as e:
+            print(f"[BUFFER] refill skipped: {e}")
+            break
+
+
+def run_forever(full_sync: bool = False) -> None:
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        print("[DAEMON] stopping after the current step (signal again to abort)")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    cycle_s = float(os.getenv("DAEMON_CYCLE_MINUTES", "15")) * 60
+    db.init_pool()
+    state = DaemonState(read_pool=read_pool_from_env(os.environ["UNIPILE_ACCOUNT_ID"]), force_full_sync=full_sync)
+    print(f"[DAEMON] started: cycle every {cycle_s / 60:g} min, {len(state.read_pool.account_ids)} read account(s)")
+    try:
+        while not stop.is_set():
+            started = time.monotonic()
+            run = start_run()
+            state.cycles += 1
+            print(f"[DAEMON] cycle {state.cycles} (run {run['id']})")
+            timer = timing.start_timer()
+            status = "done"
+            try:
+                with profiled(f"daemon-run{run['id']}"), tracing.run_span("daemon.cycle", run_id=run["id"], cycle=state.cycles):
+                    run_cycle(run, state, stop)
+            except Stopping:
+                status = "failed"
+            except breaker.CircuitOpenError as e:
+                # the dependency stays down; the next cycle tries again
+                print(f"[DAEMON] cycle stopped: {e}")
+                status = "failed"
+            except Exception as e:
+                print(f"[DAEMON] cycle crashed: {repr(e)}")
+                print(traceback.format_exc())
+                status = "failed"
+            finally:
+                _report_timing(run["id"], timer)
+                metrics.export_batch()
+            finish_run(run["id"], status)
+            stop.wait(max(cycle_s - (time.monotonic() - started), 0))
+    finally:
+        db.close_pool()
+    print("[DAEMON] stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the commenting pipeline continuously")
+    parser.add_argument(
+        "--full-sync",
+        action="store_true",
+        help="page through the whole Sales Nav lists on the first cycle",
+    )
+    args = parser.parse_args(argv)
+    run_forever(full_sync=args.full_sync)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,104 @@
 import os
 import time
 import random
-from datetime import datetime, timezone, timedelta
+import argparse
+import contextvars
+import functools
+import json
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
 
 import requests
 
-from db import get_db
+import breaker
+import metrics
+import timing
+import tracing
+from psycopg.rows import args_row
+
+from db import get_db, stream_rows
+from post_texts import store_text
 from salesnav import sync_salesnav_list
 from unipile import list_recent_posts
-from claude import generate_comment
 from slack_notify import send_for_review
 
 from resolver import resolve_profile_url_to_identifier
-
-def resolve_missing_identifiers(dsn, account_id, api_key, max_to_resolve=500, debug=False):
+from accounts import AccountPool, read_pool_from_env
+from campaigns import ensure_default_campaign, active_campaigns
+from scoring import score_eligible_posts
+from claude import cascade_summary
+from profiling import profiled, thread_profiled
+from expiry import expire_pending_reviews
+from leases import chunks_from_env, refresh_in_chunks, seed_chunks
+from candidates import (
+    BufferRefiller,
+    invalidate_buffer,
+    refill_buffer,
+    return_candidates,
+    take_candidates,
+)
+from runs import (
+    start_run,
+    latest_unfinished_run,
+    refreshing_run,
+    stage_done,
+    set_stage,
+    campaign_checkpoint,
+    save_salesnav_checkpoint,
+    mark_campaign_synced,
+    mark_target_refreshed,
+    add_delivered,
+    finish_run,
+)
+
+class TargetRecord(NamedTuple):
+    profile_url: str
+    person_identifier: str | None
+    name: str | None
+    person_key: str | None = None  # COALESCE(person_identifier, profile_url): the refresh's keyset
+
+
+# Rows per server-side cursor round trip when walking targets.
+TARGET_BATCH_SIZE = int(os.getenv("TARGET_BATCH_SIZE", "500"))
+
+
+def resolve_missing_identifiers(dsn, account_id, api_key, max_to_resolve=500, debug=False, read_pool=None):
+    """
+    Lookups are spread over `read_pool` (defaults to a pool built from env around
+    `account_id`), paced per read account.
+    """
+    read_pool = read_pool or read_pool_from_env(account_id)
     resolved = 0
-    with get_db() as (conn, cur):
-        cur.execute("""
-            SELECT profile_url
-            FROM targets
-            WHERE person_identifier IS NULL
-            LIMIT %s
-        """, (max_to_resolve,))
-        rows = cur.fetchall()
+    rows = stream_rows(
+        """
+        SELECT profile_url, person_identifier, name
+        FROM targets
+        WHERE person_identifier IS NULL
+          AND removed_at IS NULL
+        """,
+        key="profile_url",
+        row_factory=args_row(TargetRecord),
+        batch_size=TARGET_BATCH_SIZE,
+        limit=max_to_resolve,
+    )
 
     for r in rows:
-        profile_url = r["profile_url"]
+        profile_url = r.profile_url
+        breaker.pause_while_open("unipile")
+        read_account = read_pool.for_key(profile_url)
+        read_pool.acquire(read_account)
         try:
-            ident = resolve_profile_url_to_identifier(dsn, account_id, api_key, profile_url)
+            ident = resolve_profile_url_to_identifier(dsn, read_account, api_key, profile_url)
+        except breaker.CircuitOpenError:
+            raise
         except Exception as e:
+            read_pool.report_failure(read_account, getattr(getattr(e, "response", None), "status_code", None))
             if debug:
                 print("[resolve] failed:", profile_url, repr(e))
             continue
+        read_pool.report_success(read_account)
 
         if ident:
             with get_db() as (conn, cur):
@@ -44,7 +111,6 @@ def resolve_missing_identifiers(dsn, account_id, api_key, max_to_resolve=500, de
             resolved += 1
             if debug:
                 print("[resolve] ok:", profile_url, "->", ident)
-        jitter_sleep(0.8, 2.0)
 
     print(f"[RESOLVE] filled person_identifier for {resolved} targets")
     return resolved
@@ -57,24 +123,7 @@ def utc_now_iso() -> str:
     return utc_now().isoformat()
 
 def jitter_sleep(min_s: float, max_s: float) -> None:
-    time.sleep(random.uniform(min_s, max_s))
-
-def _get_post_text(p: dict) -> str:
-    return (p.get("text") or p.get("content") or p.get("caption") or "").strip()
-
-def _get_social_id(p: dict) -> str | None:
-    return p.get("social_id") or p.get("socialId") or p.get("urn") or p.get("entity_urn")
-
-def _parse_post_created_at(p: dict) -> str | None:
-    # store as timestamptz if Unipile gives an ISO date; otherwise None
-    # (don’t crash the whole run because some posts have "1d" style fields)
-    for k in ("created_at", "createdAt", "created_time", "createdTime"):
-        v = p.get(k)
-        if not v:
-            continue
-        if isinstance(v, str) and ("T" in v):
-            return v.replace("Z", "+00:00")
-    return None
+    timing.sleep(random.uniform(min_s, max_s))
 
 def refresh_post_pool_for_all_targets(
     dsn: str,
@@ -83,142 +132,517 @@ def refresh_post_pool_for_all_targets(
     lookback_days: int,
     limit_posts: int,
     debug: bool,
+    run_id: int | None = None,
+    read_pool: AccountPool | None = None,
+    on_ingest=None,
+    chunk: tuple[int, int] | None = None,
+    on_target=None,
+    min_refresh_hours: float | None = None,
 ):
     """
     For each target, fetch posts and upsert into post_pool.
     This lets you random-sample from the entire Sales Nav list later.
+
+    With `run_id`, targets already refreshed in that run are skipped and each
+    refreshed target is checkpointed (so a resumed run doesn't refetch them).
+
+    Reads are sharded over `read_pool` by person_identifier and fetched by one thread
+    per read account; pacing is per read account, so more accounts means
+    proportionally more profiles per minute.
+
+    Targets are shared by all campaigns and deduplicated by person_identifier, so a
+    lead on several campaigns' lists (even under different lead URLs) is polled once.
+
+    `on_ingest()` is called after each target's posts are committed (the candidate
+    buffer refiller hooks in here).
+
+    `chunk=(index, count)` restricts the pass to one hash slice of the targets (see
+    leases.py); `on_target()` is called right before each fetch, after any pacing or
+    breaker wait (from the fetching thread), and returning False ends the pass (the
+    chunk's lease was lost).
+
+    Only targets not refreshed in the last `min_refresh_hours` (default
+    TARGET_REFRESH_HOURS, 20) are fetched, however often passes run (daemon cycles,
+    a same-day re-run); 0 refreshes every target.
+
+    Post text goes to post_texts and is only rewritten when its hash changed.
     """
-    with get_db() as (conn, cur):
-        cur.execute("SELECT profile_url, person_identifier, name FROM targets")
-        targets = cur.fetchall()
+    read_pool = read_pool or read_pool_from_env(account_id)
+    if min_refresh_hours is None:
+        min_refresh_hours = float(os.getenv("TARGET_REFRESH_HOURS", "20"))
+    # Paged by person key: the first fetch starts as soon as the first page arrives,
+    # and memory doesn't grow with the list.
+    targets = stream_rows(
+        """
+        SELECT DISTINCT ON (COALESCE(t.person_identifier, t.profile_url))
+            t.profile_url, t.person_identifier, t.name,
+            COALESCE(t.person_identifier, t.profile_url) AS person_key
+        FROM targets t
+        WHERE t.removed_at IS NULL
+          AND (%(run_id)s::bigint IS NULL OR NOT EXISTS (
+            SELECT 1
+            FROM run_refreshed_targets r
+            JOIN targets rt ON rt.profile_url = r.profile_url
+            WHERE r.run_id = %(run_id)s
+              AND (rt.profile_url = t.profile_url OR rt.person_identifier = t.person_identifier)
+          ))
+          AND (t.last_refreshed_at IS NULL
+               OR t.last_refreshed_at < NOW() - make_interval(secs => %(min_refresh_s)s))
+          AND (%(chunk_count)s::int IS NULL
+               OR mod(hashtext(COALESCE(t.person_identifier, t.profile_url))::bigint + 2147483648, %(chunk_count)s) = %(chunk)s)
+        ORDER BY COALESCE(t.person_identifier, t.profile_url), t.profile_url
+        """,
+        {
+            "run_id": run_id,
+            "chunk": chunk[0] if chunk else None,
+            "chunk_count": chunk[1] if chunk else None,
+            "min_refresh_s": min_refresh_hours * 3600,
+        },
+        key="person_key",
+        row_factory=args_row(TargetRecord),
+        batch_size=TARGET_BATCH_SIZE,
+    )
 
+    lock = threading.Lock()
+    stop = threading.Event()
+    errors: list[BaseException] = []
     upserted = 0
-    for t in targets:
-        person_identifier = t.get("person_identifier")
-        profile_url = t.get("profile_url")
-        name = (t.get("name") or "name").strip() or "name"
 
-        if not person_identifier:
-            # if your pipeline has identifier resolution elsewhere, keep skipping here
-            if debug:
-                print(f"[pool] missing person_identifier for {name} ({profile_url})")
-            continue
+    def refresh_target(t: TargetRecord) -> None:
+        nonlocal upserted
+        person_identifier = t.person_identifier
+        profile_url = t.profile_url
+        name = (t.name or "name").strip() or "name"
+
+        # Unipile down: wait for the breaker to probe again, or stop the stage
+        breaker.pause_while_open("unipile")
 
+        # pacing per read account (important); re-picked here in case the lane's
+        # account was benched since the target was queued
+        read_account = read_pool.for_key(person_identifier)
+        read_pool.acquire(read_account)
+
+        # after the waits above (a benched account can take longer than a lease), right
+        # before the fetch: a lost lease means another worker owns this target now
+        if on_target and not on_target():
+            stop.set()
+            return
+
+        fetch_t0 = time.perf_counter()
         try:
-            posts = list_recent_posts(
-                dsn=dsn,
-                account_id=account_id,
-                api_key=api_key,
-                user_identifier=person_identifier,
-                lookback_days=lookback_days,
-                limit=limit_posts,
-                debug=debug,
-            )
+            while True:
+                try:
+                    posts = list_recent_posts(
+                        dsn=dsn,
+                        account_id=read_account,
+                        api_key=api_key,
+                        user_identifier=person_identifier,
+                        lookback_days=lookback_days,
+                        limit=limit_posts,
+                        debug=debug,
+                    )
+                    break
+                except breaker.CircuitOpenError as e:
+                    if e.retry_in > 0:
+                        raise
+                # another lane's half-open probe is in flight: wait for it, then retry
+                breaker.pause_while_open("unipile")
+        except breaker.CircuitOpenError:
+            raise
         except requests.HTTPError as e:
+            timing.record_fetch(time.perf_counter() - fetch_t0)
             status = getattr(e.response, "status_code", None)
+            read_pool.report_failure(read_account, status)
             body = getattr(e.response, "text", "") if e.response is not None else ""
             print(f"[WARN] posts fetch failed for {name} id={person_identifier} status={status} body={body[:400]}")
-            continue
+            return
         except Exception as e:
+            timing.record_fetch(time.perf_counter() - fetch_t0)
+            read_pool.report_failure(read_account)
             print(f"[WARN] posts fetch crashed for {name} id={person_identifier}: {repr(e)}")
-            continue
-
-        if not posts:
-            continue
+            return
+        timing.record_fetch(time.perf_counter() - fetch_t0)
+        read_pool.report_success(read_account)
 
         with get_db() as (conn, cur):
             for p in posts:
-                social_id = _get_social_id(p)
-                post_text = _get_post_text(p)
-                if not social_id or not post_text:
-                    continue
-
-                created_at = _parse_post_created_at(p)
-
                 cur.execute(
                     """
-                    INSERT INTO post_pool(social_id, person_identifier, profile_url, profile_name, post_text, post_created_at, last_seen_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO post_pool(social_id, person_identifier, profile_url, profile_name, post_created_at, last_seen_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
                     ON CONFLICT (social_id) DO UPDATE SET
                         person_identifier=EXCLUDED.person_identifier,
                         profile_url=EXCLUDED.profile_url,
                         profile_name=EXCLUDED.profile_name,
-                        post_text=EXCLUDED.post_text,
                         post_created_at=COALESCE(EXCLUDED.post_created_at, post_pool.post_created_at),
                         last_seen_at=EXCLUDED.last_seen_at
                     """,
-                    (social_id, person_identifier, profile_url, name, post_text, created_at, utc_now()),
+                    (p.social_id, person_identifier, profile_url, name, p.created_at, utc_now()),
                 )
-                upserted += 1
+                store_text(cur, p.social_id, p.text)
+            cur.execute(
+                "UPDATE targets SET last_refreshed_at=NOW() WHERE person_identifier=%s",
+                (person_identifier,),
+            )
+            if run_id is not None:
+                mark_target_refreshed(cur, run_id, profile_url)
             conn.commit()
+        with lock:
+            upserted += len(posts)
+        if posts and on_ingest:
+            on_ingest()
+
+    def lane(q: queue.Queue) -> None:
+        # cProfile/pyinstrument only see their own thread: the run's profile merges the
+        # lanes'; lanes overlap, so their time is reported in lane-seconds
+        with thread_profiled(), timing.lane():
+            while True:
+                t = q.get()
+                if t is None:
+                    return
+                if stop.is_set():
+                    continue  # drain, so the feeder never blocks on a stopped lane
+                try:
+                    refresh_target(t)
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+
+    # One lane (thread) per read account: fetches run concurrently, each account still
+    # paced by read_pool.acquire(), so throughput grows with the number of accounts even
+    # once a fetch takes longer than an account's interval.
+    lanes = {a: queue.Queue(maxsize=2) for a in read_pool.account_ids}
+    threads = [
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(lane, q), name=f"refresh-{a}", daemon=True,
+        )
+        for a, q in lanes.items()
+    ]
+    for th in threads:
+        th.start()
+    try:
+        for t in targets:
+            if stop.is_set():
+                break
+            if not t.person_identifier:
+                # if your pipeline has identifier resolution elsewhere, keep skipping here
+                if debug:
+                    print(f"[pool] missing person_identifier for {t.name} ({t.profile_url})")
+                continue
+            lanes[read_pool.for_key(t.person_identifier)].put(t)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for q in lanes.values():
+            q.put(None)
+        for th in threads:
+            th.join()
+    if errors:
+        raise errors[0]
+
+    return upserted
 
-        # pacing between profiles (important)
-        jitter_sleep(0.8, 2.0)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daily LinkedIn commenting run")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the last unfinished run from its checkpoints instead of starting over",
+    )
+    parser.add_argument(
+        "--full-sync",
+        action="store_true",
+        help="page through the whole Sales Nav list even if its fingerprints are unchanged",
+    )
+    parser.add_argument(
+        "--refresh-worker",
+        action="store_true",
+        help="only help refresh the post pool of the run in progress (leases chunks of its targets)",
+    )
+    parser.add_argument(
+        "--wait-s",
+        type=float,
+        default=600,
+        help="with --refresh-worker: how long to wait for a run to reach its refresh stage",
+    )
+    args = parser.parse_args(argv)
+
+    if args.refresh_worker:
+        with profiled("refresh_worker"), tracing.span("daily_commenter.refresh_worker"):
+            refresh_worker(args.wait_s)
+        return
+
+    run = latest_unfinished_run() if args.resume else None
+    if run:
+        print(f"[RUN] Resuming run {run['id']} at stage={run['stage']}")
+    else:
+        if args.resume:
+            print("[RUN] Nothing to resume; starting a new run")
+        run = start_run()
+        print(f"[RUN] Started run {run['id']}")
+
+    timer = timing.start_timer()
+    try:
+        # PROFILE=cprofile|pyinstrument dumps a profile of the whole run (profiling.py)
+        with profiled(f"daily_commenter-run{run['id']}"), tracing.run_span("daily_commenter.run", run_id=run["id"]):
+            _run(run, full_sync=args.full_sync)
+    except breaker.CircuitOpenError as e:
+        # A dependency stayed down past CIRCUIT_MAX_PAUSE_S: stop here instead of
+        # timing out target after target; checkpoints let --resume pick this up.
+        print(f"[RUN] Stopping run {run['id']}: {e}. Continue later with --resume")
+        finish_run(run["id"], "failed")
+        raise SystemExit(2)
+    except BaseException:
+        finish_run(run["id"], "failed")
+        raise
+    finally:
+        _report_timing(run["id"], timer)
+        metrics.export_batch()
+    finish_run(run["id"], "done")
+
+def refresh_worker(wait_s: float = 600) -> int:
+    """
+    Joins the refresh stage of the run in progress (waiting up to `wait_s` for one)
+    and refreshes leased chunks of its targets until none are left to lease.
+    """
+    deadline = time.monotonic() + wait_s
+    run = refreshing_run()
+    while run is None and time.monotonic() < deadline:
+        time.sleep(5)
+        run = refreshing_run()
+    if run is None:
+        print("[WORKER] No run is refreshing; nothing to do")
+        return 0
 
+    account_id = os.environ["UNIPILE_ACCOUNT_ID"]
+    print(f"[WORKER] Joining run {run['id']}")
+    upserted = refresh_in_chunks(
+        run["id"],
+        functools.partial(
+            refresh_post_pool_for_all_targets,
+            dsn=os.environ["UNIPILE_DSN"],
+            account_id=account_id,
+            api_key=os.environ["UNIPILE_API_KEY"],
+            lookback_days=int(os.getenv("POST_LOOKBACK_DAYS", "30")),
+            limit_posts=int(os.getenv("POSTS_LIMIT", "10")),
+            debug=os.getenv("DEBUG", "false").lower() in ("1", "true", "yes"),
+            run_id=run["id"],
+            read_pool=read_pool_from_env(account_id),
+        ),
+        wait_for_all=False,
+    )
+    print(f"[WORKER] Upserted {upserted} posts into post_pool for run {run['id']}")
     return upserted
 
-def pick_random_eligible_posts(limit: int) -> list[dict]:
+def _report_timing(run_id: int, timer: timing.RunTimer):
+    report = timer.report()
+    llm = cascade_summary(reset=True)
+    if llm:
+        report["llm"] = llm
+    timing.stop_timer()
+    print("[TIMING]", json.dumps(report))
+    try:
+        timing.save_report(run_id, report)
+    except Exception as e:
+        print("[TIMING] failed to persist report:", repr(e))
+
+def deliver_reviews(
+    run_id: int,
+    campaign: dict,
+    remaining: int,
+    anthropic_key: str,
+    slack_token: str,
+    generate: bool = True,
+    stages: bool = True,
+) -> int:
     """
-    Pick random posts that are not already:
-      - commented
-      - pending review
-      - handled (skipped/posted)
-    Prefer 1 per person (distinct person_identifier) so it spreads across the list.
+    Sends up to `remaining` reviews to the campaign's reviewer, taking comments from
+    the warm candidate buffer first. With `generate`, a short buffer is topped up by
+    generating comments now (campaign's prompt); without it, only buffered ones go out.
+    `stages=False` leaves the run timer's current stage alone (background delivery).
     """
-    with get_db() as (conn, cur):
-        cur.execute(
-            """
-            WITH eligible AS (
-                SELECT p.*
-                FROM post_pool p
-                WHERE NOT EXISTS (SELECT 1 FROM comments c WHERE c.social_id = p.social_id)
-                  AND NOT EXISTS (SELECT 1 FROM pending_reviews pr WHERE pr.social_id = p.social_id)
-                  AND NOT EXISTS (SELECT 1 FROM handled_posts h WHERE h.social_id = p.social_id)
-            ),
-            one_per_person AS (
-                SELECT DISTINCT ON (person_identifier)
-                    social_id, person_identifier, profile_url, profile_name, post_text, post_created_at
-                FROM eligible
-                ORDER BY person_identifier, post_created_at DESC NULLS LAST, last_seen_at DESC
-            )
-            SELECT *
-            FROM one_per_person
-            ORDER BY RANDOM()
-            LIMIT %s
-            """,
-            (limit,),
+    campaign_id = campaign["id"]
+    label = campaign["name"]
+
+    if stages:
+        timing.begin_stage("pick")
+    picks = take_candidates(campaign_id, remaining)
+    buffered = len(picks)
+    if generate and len(picks) < remaining:
+        try:
+            breaker.pause_while_open("anthropic")
+            refill_buffer(campaign, anthropic_key, size=remaining - len(picks))
+        except BaseException:
+            return_candidates(campaign_id, picks)
+            raise
+        picks += take_candidates(campaign_id, remaining - len(picks))
+    print(f"[PICK] [{label}] {len(picks)} posts for review ({buffered} from the buffer)")
+
+    if stages:
+        timing.begin_stage("deliver")
+    sent = 0
+    # picks were taken out of the buffer; any not handed to pending_reviews when this
+    # stops early (Slack circuit open, crash) go back, so their generations aren't lost
+    undelivered = list(picks)
+    try:
+        with get_db() as (conn, cur):
+            while undelivered:
+                row = undelivered[0]
+                social_id = row["social_id"]
+                name = row.get("profile_name") or "name"
+                post_text = row.get("post_text") or ""
+                comment = row["generated_comment"]
+
+                breaker.pause_while_open("slack")
+
+                # insert pending first
+                cur.execute(
+                    """
+                    INSERT INTO pending_reviews
+                      (social_id, profile_name, generated_comment, status, created_at, slack_channel, slack_ts, campaign_id)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (social_id) DO NOTHING
+                    """,
+                    (social_id, name, comment, "pending", utc_now(), None, None, campaign_id),
+                )
+                if cur.rowcount == 1:
+                    # counts toward the campaign's daily cap (campaigns.remaining_today)
+                    cur.execute(
+                        "INSERT INTO review_deliveries(social_id, campaign_id) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                        (social_id, campaign_id),
+                    )
+                conn.commit()
+                undelivered.pop(0)
+
+                # send Slack + store ts/channel for UX updates later
+                try:
+                    channel_id, message_ts = send_for_review(
+                        token=slack_token,
+                        user_id=campaign["slack_user_id"],
+                        social_id=social_id,
+                        author=name,
+                        post_text=post_text,
+                        comment=comment,
+                    )
+                except breaker.CircuitOpenError:
+                    raise
+                except Exception as e:
+                    print(f"[WARN] Slack send failed ({social_id}): {repr(e)}")
+                    continue
+
+                cur.execute(
+                    "UPDATE pending_reviews SET slack_channel=%s, slack_ts=%s WHERE social_id=%s",
+                    (channel_id, message_ts, social_id),
+                )
+                conn.commit()
+                add_delivered(run_id, campaign_id)
+
+                sent += 1
+                print(f"[OK] [{label}] Sent Slack review {sent}/{remaining} for {name} ({social_id})")
+
+                jitter_sleep(4, 10)
+    finally:
+        return_candidates(campaign_id, undelivered)
+
+    return sent
+
+def sync_campaigns(run_id: int, campaigns: list[dict], read_pool: AccountPool, full_sync: bool = False) -> None:
+    """
+    Syncs every campaign's Sales Nav list into the shared targets table, checkpointing
+    per campaign (a campaign already synced in `run_id` is skipped).
+    """
+    dsn = os.environ["UNIPILE_DSN"]
+    account_id = os.environ["UNIPILE_ACCOUNT_ID"]
+    api_key = os.environ["UNIPILE_API_KEY"]
+    max_people = int(os.getenv("MAX_PEOPLE", "500"))          # per campaign list
+    debug = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+    fingerprint_pages = int(os.getenv("SALESNAV_FINGERPRINT_PAGES", "2"))  # pages compared before skipping
+    full_sync_hours = float(os.getenv("SALESNAV_FULL_SYNC_HOURS", "168"))  # forced full resync schedule
+
+    for campaign in campaigns:
+        campaign_id = campaign["id"]
+        checkpoint = campaign_checkpoint(run_id, campaign_id)
+        if checkpoint["sync_done"]:
+            print(f"[SYNC] [{campaign['name']}] Already completed in this run; skipping")
+            continue
+        inserted = sync_salesnav_list(
+            dsn=dsn,
+            account_id=account_id,
+            api_key=api_key,
+            salesnav_url=campaign["salesnav_url"],
+            max_people=max_people,
+            page_limit=50,
+            debug=debug,
+            start_cursor=checkpoint["salesnav_cursor"],
+            start_upserted=checkpoint["salesnav_upserted"],
+            on_page=lambda cursor, n, cid=campaign_id: save_salesnav_checkpoint(run_id, cid, cursor, n),
+            fingerprint_pages=fingerprint_pages,
+            full_sync_every_hours=full_sync_hours,
+            force_full=full_sync,
+            read_pool=read_pool,
+            campaign_id=campaign_id,
         )
-        return cur.fetchall()
+        mark_campaign_synced(run_id, campaign_id)
+        print(f"[SYNC] [{campaign['name']}] Upserted {inserted} targets from Sales Nav search")
+
+def _run(run: dict, full_sync: bool = False):
+    run_id = run["id"]
 
-def main():
     dsn = os.environ["UNIPILE_DSN"]
     account_id = os.environ["UNIPILE_ACCOUNT_ID"]
     api_key = os.environ["UNIPILE_API_KEY"]
-    salesnav_url = os.environ["SALESNAV_URL"]
 
     slack_token = os.environ["SLACK_BOT_TOKEN"]
-    slack_user_id = os.environ["SLACK_USER_ID"]
 
     anthropic_key = os.environ["ANTHROPIC_API_KEY"]
 
     lookback_days = int(os.getenv("POST_LOOKBACK_DAYS", "30"))
-    max_people = int(os.getenv("MAX_PEOPLE", "500"))          # make sure we can pull all 125
-    max_per_day = int(os.getenv("MAX_COMMENTS_PER_DAY", "20"))
+    max_people = int(os.getenv("MAX_PEOPLE", "500"))          # per campaign list
     limit_posts = int(os.getenv("POSTS_LIMIT", "10"))         # per person
     debug = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
 
-    # 1) Sync ALL targets (Sales Nav)
-    inserted = sync_salesnav_list(
-        dsn=dsn,
-        account_id=account_id,
-        api_key=api_key,
-        salesnav_url=salesnav_url,
-        max_people=max_people,
-        page_limit=50,
-        debug=debug,
-    )
-    print(f"[SYNC] Upserted {inserted} targets from Sales Nav search")
-    resolve_missing_identifiers(dsn, account_id, api_key, max_to_resolve=max_people, debug=debug)
+    # Campaigns come from the `campaigns` table; SALESNAV_URL / SLACK_USER_ID /
+    # MAX_COMMENTS_PER_DAY (if set) are kept in sync as the 'default' campaign.
+    ensure_default_campaign()
+    campaigns = active_campaigns()
+    if not campaigns:
+        raise RuntimeError("No active campaigns: set SALESNAV_URL and SLACK_USER_ID or add rows to `campaigns`")
+    print(f"[CAMPAIGNS] {', '.join(c['name'] for c in campaigns)}")
+
+    # Reads (posts, profile lookups) spread over UNIPILE_READ_ACCOUNT_IDS; the Sales Nav
+    # lists themselves are paged through `account_id`, which owns them.
+    read_pool = read_pool_from_env(account_id)
+    print(f"[ACCOUNTS] {len(read_pool.account_ids)} read account(s)")
+
+    # Reviews left unanswered past PENDING_REVIEW_TTL_HOURS expire, which frees their
+    # posts' slots and takes the stale buttons out of Slack.
+    expire_pending_reviews(slack_token)
+
+    # 0) Reviews don't wait for sync + refresh: whatever the previous run left in the
+    #    warm candidate buffer goes out right away.
+    invalidate_buffer(lookback_days)
+    early_sent = 0
+    if not stage_done(run, "refresh"):
+        for campaign in campaigns:
+            checkpoint = campaign_checkpoint(run_id, campaign["id"])
+            remaining = max(campaign["max_per_day"] - checkpoint["delivered"], 0)
+            early_sent += deliver_reviews(run_id, campaign, remaining, anthropic_key, slack_token, generate=False)
+
+    # 1) Sync every campaign's Sales Nav list into the shared targets table
+    timing.begin_stage("sync")
+    if not stage_done(run, "sync"):
+        sync_campaigns(run_id, campaigns, read_pool, full_sync=full_sync)
+        set_stage(run_id, "resolve")
+    else:
+        print("[SYNC] Already completed in this run; skipping")
+
+    timing.begin_stage("resolve")
+    if not stage_done(run, "resolve"):
+        resolve_missing_identifiers(
+            dsn, account_id, api_key, max_to_resolve=max_people * len(campaigns), debug=debug, read_pool=read_pool,
+        )
+        set_stage(run_id, "refresh")
 
     with get_db() as (conn, cur):
         cur.execute("SELECT COUNT(*) AS n FROM targets")
@@ -228,73 +652,69 @@ def main():
         print(f"[DB] targets total={total} with_person_identifier={with_id}")
 
 
-    # 2) Refresh post_pool across ALL targets
-    upserted_posts = refresh_post_pool_for_all_targets(
-        dsn=dsn,
-        account_id=account_id,
-        api_key=api_key,
-        lookback_days=lookback_days,
-        limit_posts=limit_posts,
-        debug=debug,
-    )
-    print(f"[POOL] Upserted {upserted_posts} posts into post_pool")
-
-    # 3) Pick random eligible posts (spread across people)
-    picks = pick_random_eligible_posts(limit=max_per_day)
-    print(f"[PICK] Selected {len(picks)} random posts for review")
-
-    sent = 0
-    with get_db() as (conn, cur):
-        for row in picks:
-            social_id = row["social_id"]
-            name = row.get("profile_name") or "name"
-            post_text = row.get("post_text") or ""
-
-            # generate comment
-            try:
-                comment = generate_comment(anthropic_key, name, post_text)
-            except Exception as e:
-                print(f"[WARN] comment generation failed for {name} ({social_id}): {repr(e)}")
-                continue
-
-            # insert pending first
-            cur.execute(
-                """
-                INSERT INTO pending_reviews
-                  (social_id, profile_name, post_text, generated_comment, status, created_at, slack_channel, slack_ts)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (social_id) DO NOTHING
-                """,
-                (social_id, name, post_text, comment, "pending", utc_now(), None, None),
-            )
-            conn.commit()
-
-            # send Slack + store ts/channel for UX updates later
-            try:
-                channel_id, message_ts = send_for_review(
-                    token=slack_token,
-                    user_id=slack_user_id,
-                    social_id=social_id,
-                    author=name,
-                    post_text=post_text,
-                    comment=comment,
-                )
-            except Exception as e:
-                print(f"[WARN] Slack send failed ({social_id}): {repr(e)}")
-                continue
-
-            cur.execute(
-                "UPDATE pending_reviews SET slack_channel=%s, slack_ts=%s WHERE social_id=%s",
-                (channel_id, message_ts, social_id),
+    # 2) Refresh post_pool once across ALL campaigns' targets (skips targets already refreshed in this run)
+    # While posts come in, the buffer is refilled in the background, so comments are
+    # generated in parallel with ingestion instead of after it.
+    timing.begin_stage("refresh")
+    if not stage_done(run, "refresh"):
+        invalidate_buffer(lookback_days)
+        refiller = BufferRefiller(campaigns, anthropic_key)
+        refiller.start()
+        # Targets are leased out in chunks: `--refresh-worker` processes started
+        # alongside this run take chunks too (see leases.py).
+        seed_chunks(run_id, chunks_from_env())
+        try:
+            upserted_posts = refresh_in_chunks(
+                run_id,
+                functools.partial(
+                    refresh_post_pool_for_all_targets,
+                    dsn=dsn,
+                    account_id=account_id,
+                    api_key=api_key,
+                    lookback_days=lookback_days,
+                    limit_posts=limit_posts,
+                    debug=debug,
+                    run_id=run_id,
+                    read_pool=read_pool,
+                    on_ingest=refiller.notify,
+                ),
+                # other workers' posts land in the pool too; keep the refiller busy
+                on_wait=refiller.notify,
             )
-            conn.commit()
-
-            sent += 1
-            print(f"[OK] Sent Slack review {sent}/{max_per_day} for {name} ({social_id})")
-
-            jitter_sleep(4, 10)
-
-    print(f"[DONE] Sent {sent} Slack review messages.")
+        finally:
+            generated = refiller.stop()
+        print(f"[POOL] Upserted {upserted_posts} posts into post_pool")
+        print(f"[BUFFER] generated {generated} comments during refresh")
+        set_stage(run_id, "deliver")
+
+    # Rank everything eligible (recency, topic match, author history) so delivery and
+    # the buffer take the top-K instead of random posts.
+    timing.begin_stage("score")
+    scored = score_eligible_posts()
+    print(f"[SCORE] scored {scored} eligible posts")
+
+    # 3) Per campaign: send the rest of the cap from the buffer (generating any shortfall)
+    #    to the campaign's reviewer. Buffered posts belong to one campaign, so a post on
+    #    two lists is only ever sent once.
+    invalidate_buffer(lookback_days)
+    total_sent = early_sent
+    for campaign in campaigns:
+        checkpoint = campaign_checkpoint(run_id, campaign["id"])
+        remaining = max(campaign["max_per_day"] - checkpoint["delivered"], 0)
+        total_sent += deliver_reviews(run_id, campaign, remaining, anthropic_key, slack_token)
+
+    print(f"[DONE] Sent {total_sent} Slack review messages.")
+
+    # 4) Leave a full buffer behind so the next run can send immediately.
+    timing.begin_stage("refill")
+    for campaign in campaigns:
+        try:
+            generated = refill_buffer(campaign, anthropic_key)
+        except breaker.CircuitOpenError as e:
+            # today's reviews are out; the next run tops the buffer up instead
+            print(f"[BUFFER] refill skipped: {e}")
+            break
+        print(f"[BUFFER] [{campaign['name']}] generated {generated} comments for the next run")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
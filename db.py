@@ -1,48 +1,155 @@
 import os
+import sys
+import time
 from contextlib import contextmanager
 import psycopg
 from psycopg.rows import dict_row
 
-DATABASE_URL = os.environ["DATABASE_URL"]
+import metrics
+import timing
+import tracing
+
+
+def database_url() -> str:
+    # read on use, not at import: importing db must not require the environment
+    return os.environ["DATABASE_URL"]
+
+
+def _statement(query) -> str:
+    """SQL text for a trace span, whitespace-collapsed and truncated."""
+    text = query if isinstance(query, str) else repr(query)
+    return " ".join(text.split())[:300]
+
+
+class TimedCursor(psycopg.Cursor):
+    """
+    Records every statement's latency in metrics, labeled by the function that
+    called cur.execute() (e.g. refresh_post_pool_for_all_targets, _approve_worker),
+    and as a "db" span when it runs inside a trace (tracing.py).
+    """
+
+    def execute(self, query, params=None, **kwargs):
+        caller = sys._getframe(1).f_code.co_name
+        t0 = time.perf_counter()
+        try:
+            with tracing.child_span("db", caller=caller) as span:
+                if span is not None:
+                    span.set("db.statement", _statement(query))
+                return super().execute(query, params, **kwargs)
+        except Exception as e:
+            metrics.DB_ERRORS.labels(caller, type(e).__name__).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.DB_LATENCY.labels(caller).observe(elapsed)
+            timing.record_db(elapsed)
+
+    def executemany(self, query, params_seq, **kwargs):
+        caller = sys._getframe(1).f_code.co_name
+        t0 = time.perf_counter()
+        try:
+            with tracing.child_span("db", caller=caller) as span:
+                if span is not None:
+                    span.set("db.statement", _statement(query))
+                return super().executemany(query, params_seq, **kwargs)
+        except Exception as e:
+            metrics.DB_ERRORS.labels(caller, type(e).__name__).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.DB_LATENCY.labels(caller).observe(elapsed)
+            timing.record_db(elapsed)
+
+
+_pool = None
+
+
+def init_pool(min_size: int | None = None, max_size: int | None = None, timeout: float = 30):
+    """
+    Opens a connection pool (psycopg_pool) that get_db() uses from then on, with
+    `min_size` connections established up front. For long-lived processes
+    (slack_server); batch jobs keep one connection per get_db().
+
+    DB_POOL_MIN / DB_POOL_MAX size the pool (default 1 / 10).
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    from psycopg_pool import ConnectionPool
+
+    pool = ConnectionPool(
+        database_url(),
+        min_size=min_size if min_size is not None else int(os.getenv("DB_POOL_MIN", "1")),
+        max_size=max_size if max_size is not None else int(os.getenv("DB_POOL_MAX", "10")),
+        kwargs={"row_factory": dict_row, "cursor_factory": TimedCursor},
+        open=False,
+    )
+    pool.open(wait=True, timeout=timeout)
+    _pool = pool
+    return pool
+
+
+def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
 
 @contextmanager
 def get_db():
-    with psycopg.connect(DATABASE_URL, row_factory=dict_row) as conn:
+    if _pool is not None:
+        with _pool.connection() as conn:
+            with conn.cursor() as cur:
+                yield conn, cur
+        return
+    with psycopg.connect(database_url(), row_factory=dict_row, cursor_factory=TimedCursor) as conn:
         with conn.cursor() as cur:
             yield conn, cur
 
+def stream_rows(query, params: dict | None = None, *, key: str, row_factory=dict_row, batch_size: int = 500,
+                limit: int | None = None):
+    """
+    Yields the rows of `query` in pages of `batch_size`, so callers start working as
+    soon as the first page arrives and never hold the whole result in memory.
+
+    Pages are read by keyset on the text column `key` (unique; ideally indexed): `query` is wrapped as `SELECT * FROM (query) WHERE key > last ORDER BY key
+    LIMIT n`, and each page is its own short transaction. No connection or snapshot is
+    held while the caller works on the rows (an hours-long refresh would otherwise sit
+    "idle in transaction" and hold back vacuum). `params` must be a dict; rows
+    changed between pages are seen as of their page. Stops after `limit` rows.
+    """
+    caller = sys._getframe(1).f_code.co_name
+    page_sql = (
+        f"SELECT * FROM ({query}) AS page "
+        f"WHERE %(_after)s::text IS NULL OR page.{key} > %(_after)s::text "
+        f"ORDER BY page.{key} LIMIT %(_n)s"
+    )
+    after = None
+    yielded = 0
+    while limit is None or yielded < limit:
+        n = batch_size if limit is None else min(batch_size, limit - yielded)
+        t0 = time.perf_counter()
+        with get_db() as (conn, _):
+            # a plain cursor: the page's latency is recorded under the caller below
+            with psycopg.Cursor(conn, row_factory=row_factory) as cur:
+                cur.execute(page_sql, {**(params or {}), "_after": after, "_n": n})
+                rows = cur.fetchall()
+            conn.commit()
+        elapsed = time.perf_counter() - t0
+        metrics.DB_LATENCY.labels(caller).observe(elapsed)
+        timing.record_db(elapsed)
+        if not rows:
+            return
+        yield from rows
+        yielded += len(rows)
+        if len(rows) < n:
+            return
+        last = rows[-1]
+        after = last[key] if isinstance(last, dict) else getattr(last, key)
+
 def init_db():
-    with get_db() as (conn, cur):
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS targets (
-            profile_url TEXT PRIMARY KEY,
-            linkedin_urn TEXT,
-            person_identifier TEXT,
-            name TEXT,
-            public_identifier TEXT,
-            salesnav_lead_id TEXT
-        );
-        """)
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS comments (
-            social_id TEXT PRIMARY KEY,
-            comment_text TEXT,
-            commented_at TIMESTAMPTZ
-        );
-        """)
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS pending_reviews (
-            social_id TEXT PRIMARY KEY,
-            profile_name TEXT,
-            post_text TEXT,
-            generated_comment TEXT,
-            status TEXT,
-            created_at TIMESTAMPTZ,
-            slack_channel TEXT,
-            slack_ts TEXT
-        );
-        """)
-
-        conn.commit()
\ No newline at end of file
+    """Creates/upgrades the schema by applying pending migrations (see migrate.py)."""
+    import migrate
+
+    migrate.migrate()
@@ -0,0 +1,128 @@
+"""
+Expires pending reviews nobody acted on. They move to handled_posts as 'expired' (so the
+post isn't picked again and the pending anti-joins stay small) and their Slack message
+loses its buttons. The sweep first records reviews that were posted but left unrecorded
+(bulk_actions.record_orphaned_posts).
+
+    python expiry.py                 # expire reviews older than PENDING_REVIEW_TTL_HOURS
+    python expiry.py --hours 48 --dry-run
+
+PENDING_REVIEW_TTL_HOURS   age after which a pending review expires (default 72; 0 disables)
+EXPIRY_BATCH_SIZE          rows moved per transaction (default 500)
+"""
+import argparse
+import os
+
+import breaker
+import bulk_actions
+import metrics
+from db import get_db
+from slack_notify import update_message
+
+EXPIRED_TEXT = "⌛ Expired: no decision within {hours:g}h. (removed from queue)"
+
+
+def ttl_hours_from_env() -> float:
+    return float(os.getenv("PENDING_REVIEW_TTL_HOURS", "72"))
+
+
+def _expire_batch(max_age_hours: float, batch_size: int) -> list[dict]:
+    """
+    Moves one batch (oldest first) in a single transaction; returns the moved rows.
+    Reviews being posted right now (claimed, see bulk_actions) are left alone.
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            f"""
+            WITH expired AS (
+                DELETE FROM pending_reviews
+                WHERE social_id IN (
+                    SELECT social_id FROM pending_reviews
+                    WHERE created_at < NOW() - make_interval(secs => %(age_s)s)
+                      AND {bulk_actions.CLAIMABLE}
+                    ORDER BY created_at
+                    LIMIT %(limit)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING social_id, slack_channel, slack_ts
+            ), recorded AS (
+                INSERT INTO handled_posts(social_id, status)
+                SELECT social_id, 'expired' FROM expired
+                ON CONFLICT (social_id) DO NOTHING
+            )
+            SELECT social_id, slack_channel, slack_ts FROM expired
+            """,
+            {"age_s": max_age_hours * 3600, "limit": batch_size, "claim_timeout_s": bulk_actions.claim_timeout_s()},
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    return rows
+
+
+def expire_pending_reviews(
+    slack_token: str | None,
+    max_age_hours: float | None = None,
+    batch_size: int | None = None,
+) -> int:
+    """
+    Expires pending reviews older than `max_age_hours` in batches of `batch_size` and
+    updates their Slack messages via chat.update (skipped without a token). Slack
+    failures don't undo the expiry: the buttons then answer "Already handled".
+    Returns the number of reviews expired.
+    """
+    max_age_hours = ttl_hours_from_env() if max_age_hours is None else max_age_hours
+    batch_size = batch_size or int(os.getenv("EXPIRY_BATCH_SIZE", "500"))
+    bulk_actions.record_orphaned_posts(slack_token)
+    if max_age_hours <= 0:
+        return 0
+
+    text = EXPIRED_TEXT.format(hours=max_age_hours)
+    expired = updated = 0
+    while True:
+        rows = _expire_batch(max_age_hours, batch_size)
+        expired += len(rows)
+        metrics.PENDING_EXPIRED.inc(len(rows))
+        for row in rows:
+            if not (slack_token and row["slack_channel"] and row["slack_ts"]):
+                continue
+            try:
+                updated += update_message(slack_token, row["slack_channel"], row["slack_ts"], text)
+            except breaker.CircuitOpenError as e:
+                # leave the remaining messages stale rather than stall the caller
+                print(f"[EXPIRE] Slack updates stopped: {e}")
+                slack_token = None
+            except Exception as e:
+                print(f"[WARN] chat.update failed ({row['social_id']}): {repr(e)}")
+        if len(rows) < batch_size:
+            break
+
+    if expired:
+        print(f"[EXPIRE] expired {expired} pending reviews older than {max_age_hours:g}h ({updated} Slack messages updated)")
+    return expired
+
+
+def count_expirable(max_age_hours: float) -> int:
+    with get_db() as (conn, cur):
+        cur.execute(
+            "SELECT COUNT(*) AS n FROM pending_reviews WHERE created_at < NOW() - make_interval(secs => %s)",
+            (max_age_hours * 3600,),
+        )
+        return cur.fetchone()["n"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expire stale pending reviews")
+    parser.add_argument("--hours", type=float, help="max age (default PENDING_REVIEW_TTL_HOURS)")
+    parser.add_argument("--batch-size", type=int, help="rows per transaction (default EXPIRY_BATCH_SIZE)")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would expire")
+    args = parser.parse_args(argv)
+
+    hours = ttl_hours_from_env() if args.hours is None else args.hours
+    if args.dry_run:
+        print(f"[EXPIRE] {count_expirable(hours)} pending reviews older than {hours:g}h")
+        return
+    expire_pending_reviews(os.getenv("SLACK_BOT_TOKEN"), hours, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import time
+import threading
+
+import requests
+
+import breaker
+import journal
+import metrics
+import timing
+import tracing
+
+# One pooled session per service so keep-alive connections are reused across calls.
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(service: str) -> requests.Session:
+    s = _sessions.get(service)
+    if s is None:
+        with _sessions_lock:
+            s = _sessions.get(service)
+            if s is None:
+                s = requests.Session()
+                _sessions[service] = s
+    return s
+
+
+def warm(service: str, url: str, timeout: float = 5) -> bool:
+    """
+    Opens a keep-alive connection (DNS + TCP + TLS) in `service`'s session so the
+    first real call doesn't pay for it. Not recorded in metrics; never raises.
+    """
+    try:
+        get_session(service).head(url, timeout=timeout, allow_redirects=False).close()
+        return True
+    except Exception as e:
+        print(f"[http] warmup of {service} failed: {e!r}")
+        return False
+
+
+def request(method: str, url: str, *, service: str, function: str, **kwargs) -> requests.Response:
+    """
+    Every outbound HTTP call goes through here so latency/status/errors are recorded
+    per service ("unipile", "slack") and calling function ("list_recent_posts", ...).
+    Behaves like requests.request: returns the response, raises on connection errors.
+
+    Calls are also guarded by the service's circuit breaker (breaker.py): while it's
+    open this raises breaker.CircuitOpenError without touching the network. Inside a
+    trace (tracing.py) each call is a span. Unipile reads can be journaled and replayed
+    offline (journal.py).
+    """
+    if journal.replaying(service, function):
+        return journal.replayed(method, url, function, kwargs)
+    b = breaker.get(service) if breaker.enabled() else None
+    probe = b.before_call(function) if b is not None else False
+    t0 = time.perf_counter()
+    try:
+        with tracing.child_span(
+            f"{service}.{function}", service=service, function=function, **{"http.method": method},
+        ) as span:
+            r = get_session(service).request(method, url, **kwargs)
+            if span is not None:
+                span.set("http.status_code", r.status_code)
+    except Exception as e:
+        elapsed = time.perf_counter() - t0
+        metrics.EXTERNAL_LATENCY.labels(service, function).observe(elapsed)
+        metrics.count_error(service, function, type(e).__name__)
+        timing.record_io(service, function, elapsed)
+        if b is not None:
+            b.record(False, elapsed, type(e).__name__, probe=probe)
+        raise
+    except BaseException:
+        if b is not None:
+            b.cancel_probe(probe)
+        raise
+    elapsed = time.perf_counter() - t0
+    metrics.observe_response(service, function, r.status_code, elapsed)
+    timing.record_io(service, function, elapsed)
+    if b is not None:
+        b.record(r.status_code < 500, elapsed, f"http_{r.status_code}", probe=probe)
+    if journal.recording(service, function):
+        journal.record(method, url, function, kwargs, r)
+    return r
+
+
+def get(url: str, *, service: str, function: str, **kwargs) -> requests.Response:
+    return request("GET", url, service=service, function=function, **kwargs)
+
+
+def post(url: str, *, service: str, function: str, **kwargs) -> requests.Response:
+    return request("POST", url, service=service, function=function, **kwargs)
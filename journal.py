@@ -0,0 +1,236 @@
+"""
+Optional journal of raw Unipile read responses (posts lists, Sales Nav search pages,
+user lookups), so ingestion can be re-run offline after a parsing change:
+
+UNIPILE_JOURNAL_DIR     record every journaled response here (off when unset)
+UNIPILE_REPLAY_DIR      answer journaled calls from this journal instead of the network;
+                        a call that isn't in it fails like a connection error
+
+Segments are append-only gzip files, one per UTC day (unipile-YYYY-MM-DD.jsonl.gz).
+Each record is its own gzip member written with a single O_APPEND write, so the
+refresh workers of several processes can share a segment; a record torn by a crash is
+skipped on read (zcat reads intact segments as-is). Recording reads the whole body before it is parsed, so
+journaled list responses aren't streamed.
+
+    python journal.py stats                 # records and bytes per segment
+    python journal.py replay [--days N]     # re-resolve + refresh post_pool from the journal
+
+Replay uses the newest response per request (read account ignored) from the last N
+days of segments (default: all), with pacing off, and parses with the current rules.
+Posts are still cut off by POST_LOOKBACK_DAYS from now.
+"""
+import argparse
+import glob
+import gzip
+import io
+import json
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import requests
+
+# Read calls worth replaying; writes (comment_on_post) are never journaled.
+JOURNALED = {
+    ("unipile", "list_recent_posts"),
+    ("unipile", "sync_salesnav_list"),
+    ("unipile", "resolve_salesnav_lead_to_profile_id"),
+    ("unipile", "resolve_profile_url_to_identifier"),
+}
+
+_replay_index: dict[str, dict] | None = None
+_replay_lock = threading.RLock()
+
+
+class ReplayMiss(requests.ConnectionError):
+    """The request isn't in the replay journal (there is no network to fall back on)."""
+
+
+def recording(service: str, function: str) -> bool:
+    return bool(os.getenv("UNIPILE_JOURNAL_DIR")) and (service, function) in JOURNALED
+
+
+def replaying(service: str, function: str) -> bool:
+    return bool(os.getenv("UNIPILE_REPLAY_DIR")) and (service, function) in JOURNALED
+
+
+def _key(function: str, method: str, url: str, params: dict | None, body) -> str:
+    """Identifies a request regardless of host and read account."""
+    params = {k: str(v) for k, v in (params or {}).items() if k != "account_id"}
+    return json.dumps([function, method.upper(), urlsplit(url).path, params, body], sort_keys=True, default=str)
+
+
+def segment_path(directory: str, day: datetime | None = None) -> str:
+    day = day or datetime.now(timezone.utc)
+    return os.path.join(directory, f"unipile-{day:%Y-%m-%d}.jsonl.gz")
+
+
+def record(method: str, url: str, function: str, kwargs: dict, r: requests.Response) -> None:
+    """Appends the response to today's segment. Never raises."""
+    try:
+        content = r.content
+        # the body was read for the journal; let streaming callers read it from memory
+        r.raw = io.BufferedReader(io.BytesIO(content))
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "key": _key(function, method, url, kwargs.get("params"), kwargs.get("json")),
+            "function": function,
+            "status": r.status_code,
+            "content_type": r.headers.get("Content-Type", "application/json"),
+            "body": content.decode("utf-8", errors="replace"),
+        }
+        directory = os.environ["UNIPILE_JOURNAL_DIR"]
+        os.makedirs(directory, exist_ok=True)
+        data = gzip.compress((json.dumps(entry) + "\n").encode("utf-8"))
+        fd = os.open(segment_path(directory), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+    except Exception as e:
+        print(f"[journal] failed to record {function}: {repr(e)}")
+
+
+_GZIP_MAGIC = b"\x1f\x8b\x08"
+
+
+def _members(data: bytes):
+    """Decompressed gzip members of `data`; None for a damaged one (skipped to the next)."""
+    view = memoryview(data)
+    pos = 0
+    while pos < len(data):
+        d = zlib.decompressobj(wbits=31)
+        out = []
+        fed = pos
+        try:
+            while not d.eof and fed < len(data):
+                out.append(d.decompress(view[fed:fed + 65536]))
+                fed = min(fed + 65536, len(data))
+        except zlib.error:
+            pass
+        if d.eof:
+            yield b"".join(out)
+            pos = fed - len(d.unused_data)
+            continue
+        yield None
+        nxt = data.find(_GZIP_MAGIC, pos + 1)
+        if nxt < 0:
+            return
+        pos = nxt
+
+
+def iter_records(path: str):
+    """Records of one segment. A torn record (crash mid-write) is skipped, not fatal."""
+    with open(path, "rb") as f:
+        data = f.read()
+    damaged = 0
+    for member in _members(data):
+        try:
+            lines = member.decode("utf-8").splitlines() if member is not None else None
+        except UnicodeDecodeError:
+            lines = None
+        if lines is None:
+            damaged += 1
+            continue
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if damaged:
+        print(f"[journal] {os.path.basename(path)}: skipped {damaged} damaged record(s)")
+
+
+def segments(directory: str, days: int | None = None) -> list[str]:
+    paths = sorted(glob.glob(os.path.join(directory, "unipile-*.jsonl.gz")))
+    if days is not None:
+        since = f"unipile-{datetime.now(timezone.utc) - timedelta(days=days - 1):%Y-%m-%d}"
+        paths = [p for p in paths if os.path.basename(p) >= since]
+    return paths
+
+
+def load_replay(directory: str | None = None, days: int | None = None) -> int:
+    """(Re)builds the replay index: the newest record per request. Returns its size."""
+    global _replay_index
+    index = {}
+    for path in segments(directory or os.environ["UNIPILE_REPLAY_DIR"], days):
+        for entry in iter_records(path):
+            index[entry["key"]] = entry
+    with _replay_lock:
+        _replay_index = index
+    return len(index)
+
+
+def replayed(method: str, url: str, function: str, kwargs: dict) -> requests.Response:
+    if _replay_index is None:
+        with _replay_lock:
+            if _replay_index is None:
+                load_replay()
+    entry = _replay_index.get(_key(function, method, url, kwargs.get("params"), kwargs.get("json")))
+    if entry is None:
+        raise ReplayMiss(f"{function} {urlsplit(url).path} not in the replay journal")
+    content = entry["body"].encode("utf-8")
+    r = requests.Response()
+    r.status_code = entry["status"]
+    r.reason = "REPLAY"
+    r.url = url
+    r.encoding = "utf-8"
+    r.headers["Content-Type"] = entry["content_type"]
+    r._content = content
+    r.raw = io.BufferedReader(io.BytesIO(content))
+    return r
+
+
+def replay(days: int | None = None) -> int:
+    """Re-resolves identifiers and refreshes post_pool for all targets from the journal."""
+    from daily_commenter import refresh_post_pool_for_all_targets, resolve_missing_identifiers
+
+    os.environ.setdefault("PACING_SCALE", "0")
+    n = load_replay(days=days)
+    print(f"[journal] replaying {n} recorded responses")
+    dsn = os.getenv("UNIPILE_DSN", "replay")
+    account_id = os.getenv("UNIPILE_ACCOUNT_ID", "replay")
+    api_key = os.getenv("UNIPILE_API_KEY", "")
+    debug = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+    resolve_missing_identifiers(
+        dsn, account_id, api_key, max_to_resolve=int(os.getenv("MAX_PEOPLE", "500")), debug=debug,
+    )
+    upserted = refresh_post_pool_for_all_targets(
+        dsn=dsn,
+        account_id=account_id,
+        api_key=api_key,
+        lookback_days=int(os.getenv("POST_LOOKBACK_DAYS", "30")),
+        limit_posts=int(os.getenv("POSTS_LIMIT", "10")),
+        debug=debug,
+        min_refresh_hours=0,
+    )
+    print(f"[journal] replay upserted {upserted} posts into post_pool")
+    return upserted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Unipile response journal")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_stats = sub.add_parser("stats", help="records and size per segment")
+    p_stats.add_argument("--dir", default=os.getenv("UNIPILE_JOURNAL_DIR") or os.getenv("UNIPILE_REPLAY_DIR"))
+    p_replay = sub.add_parser("replay", help="re-run resolve + refresh from the journal, without network calls")
+    p_replay.add_argument("--dir", default=os.getenv("UNIPILE_REPLAY_DIR") or os.getenv("UNIPILE_JOURNAL_DIR"))
+    p_replay.add_argument("--days", type=int, default=None, help="only the newest N daily segments")
+    args = parser.parse_args(argv)
+    if not args.dir:
+        parser.error("no journal directory (--dir, UNIPILE_JOURNAL_DIR or UNIPILE_REPLAY_DIR)")
+
+    if args.cmd == "stats":
+        for path in segments(args.dir):
+            n = sum(1 for _ in iter_records(path))
+            print(f"{os.path.basename(path)}  {n} records  {os.path.getsize(path) / 1024:.0f} KiB")
+        return
+
+    os.environ["UNIPILE_REPLAY_DIR"] = args.dir
+    # a replay must not add to the journal it reads
+    os.environ.pop("UNIPILE_JOURNAL_DIR", None)
+    replay(args.days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Lease-based partitioning of the refresh stage, so any number of processes (on any
+host) can refresh one run's targets at once:
+
+    python daily_commenter.py                  # the run; also refreshes chunks itself
+    python daily_commenter.py --refresh-worker # extra workers, as many as you like
+
+Targets are split into REFRESH_CHUNKS (default 16) chunks by a hash of their person
+key, so a person always lands in exactly one chunk. A worker leases one chunk at a
+time (FOR UPDATE SKIP LOCKED, so two workers never get the same one) for
+REFRESH_LEASE_S (default 300) and renews the lease right before every fetch (after
+pacing waits, which can outlast a lease when read accounts are benched). A crashed
+worker's lease simply expires and the chunk is leased again; targets it already
+refreshed are checkpointed in run_refreshed_targets and aren't fetched twice.
+A worker that finds its lease taken over stops working on that chunk.
+"""
+import os
+import socket
+
+import timing
+from db import get_db
+
+
+def chunks_from_env() -> int:
+    return int(os.getenv("REFRESH_CHUNKS", "16"))
+
+
+def lease_s_from_env() -> float:
+    return float(os.getenv("REFRESH_LEASE_S", "300"))
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def seed_chunks(run_id: int, chunk_count: int) -> None:
+    """Creates the run's chunks (once; a resumed run keeps its chunks and progress)."""
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            INSERT INTO refresh_leases(run_id, chunk, chunk_count)
+            SELECT %s, n, %s FROM generate_series(0, %s - 1) AS n
+            ON CONFLICT DO NOTHING
+            """,
+            (run_id, chunk_count, chunk_count),
+        )
+        conn.commit()
+
+
+def claim_chunk(run_id: int, worker: str, lease_s: float) -> tuple[int, int] | None:
+    """
+    Leases a free or expired chunk (or one this worker still holds from an attempt
+    that was interrupted); returns (chunk, chunk_count) or None.
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            UPDATE refresh_leases l
+            SET worker = %(worker)s,
+                leased_until = NOW() + make_interval(secs => %(lease_s)s),
+                attempts = l.attempts + 1
+            WHERE (l.run_id, l.chunk) = (
+                SELECT run_id, chunk FROM refresh_leases
+                WHERE run_id = %(run_id)s
+                  AND done_at IS NULL
+                  AND (leased_until IS NULL OR leased_until < NOW() OR worker = %(worker)s)
+                ORDER BY chunk
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING l.chunk, l.chunk_count, l.attempts
+            """,
+            {"run_id": run_id, "worker": worker, "lease_s": lease_s},
+        )
+        row = cur.fetchone()
+        conn.commit()
+    if not row:
+        return None
+    if row["attempts"] > 1:
+        print(f"[LEASE] {worker} took over chunk {row['chunk']} (attempt {row['attempts']})")
+    return row["chunk"], row["chunk_count"]
+
+
+def renew(run_id: int, chunk: int, worker: str, lease_s: float) -> bool:
+    """Extends our lease; False if it expired and another worker holds the chunk now."""
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            UPDATE refresh_leases
+            SET leased_until = NOW() + make_interval(secs => %s)
+            WHERE run_id = %s AND chunk = %s AND worker = %s AND done_at IS NULL
+            """,
+            (lease_s, run_id, chunk, worker),
+        )
+        ok = cur.rowcount == 1
+        conn.commit()
+    return ok
+
+
+def complete(run_id: int, chunk: int, worker: str) -> None:
+    with get_db() as (conn, cur):
+        cur.execute(
+            "UPDATE refresh_leases SET done_at = NOW(), leased_until = NULL WHERE run_id = %s AND chunk = %s AND worker = %s",
+            (run_id, chunk, worker),
+        )
+        conn.commit()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def release_dead_local_leases(run_id: int) -> int:
+    """
+    Frees leases held by processes on this host that no longer exist (e.g. the
+    crashed run being resumed), instead of waiting for their leases to expire.
+    """
+    host = socket.gethostname()
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            SELECT chunk, worker FROM refresh_leases
+            WHERE run_id = %s AND done_at IS NULL AND leased_until >= NOW() AND worker LIKE %s
+            """,
+            (run_id, f"{host}:%"),
+        )
+        dead = [r for r in cur.fetchall() if not _pid_alive(int(r["worker"].rsplit(":", 1)[1]))]
+        for r in dead:
+            cur.execute(
+                "UPDATE refresh_leases SET leased_until = NULL WHERE run_id = %s AND chunk = %s AND worker = %s",
+                (run_id, r["chunk"], r["worker"]),
+            )
+        conn.commit()
+    return len(dead)
+
+
+def progress(run_id: int) -> dict:
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            SELECT COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE done_at IS NOT NULL) AS done,
+                   COUNT(*) FILTER (WHERE done_at IS NULL AND leased_until >= NOW()) AS leased
+            FROM refresh_leases
+            WHERE run_id = %s
+            """,
+            (run_id,),
+        )
+        return cur.fetchone()
+
+
+def refresh_in_chunks(run_id: int, refresh, wait_for_all: bool = True, on_wait=None) -> int:
+    """
+    Leases chunks of `run_id` one after another and calls
+    `refresh(chunk=(index, count), on_target=...)` for each; on_target renews the lease
+    and returns False once it's lost. With `wait_for_all`, waits for chunks leased by
+    other workers to finish (taking over any whose lease expires) before returning,
+    calling `on_wait()` every poll. Returns the posts upserted by this process.
+    """
+    worker = worker_id()
+    lease_s = lease_s_from_env()
+    upserted = 0
+    released = release_dead_local_leases(run_id)
+    if released:
+        print(f"[LEASE] released {released} chunk(s) held by dead local workers")
+    while True:
+        claimed = claim_chunk(run_id, worker, lease_s)
+        if claimed is None:
+            p = progress(run_id)
+            if p["done"] >= p["total"] or not wait_for_all:
+                break
+            if on_wait:
+                on_wait()
+            # the other workers' chunks are still leased; poll for completion/expiry
+            timing.sleep(min(lease_s / 10, 10))
+            continue
+
+        chunk, count = claimed
+        lost = []
+
+        def on_target(chunk=chunk):
+            if renew(run_id, chunk, worker, lease_s):
+                return True
+            lost.append(chunk)
+            return False
+
+        upserted += refresh(chunk=(chunk, count), on_target=on_target)
+        if lost:
+            print(f"[LEASE] {worker} lost its lease on chunk {chunk}; left it to the new holder")
+            continue
+        complete(run_id, chunk, worker)
+        print(f"[LEASE] {worker} finished chunk {chunk + 1}/{count}")
+    return upserted
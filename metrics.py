@@ -0,0 +1,175 @@
+import os
+import time
+from contextlib import contextmanager
+
+import timing
+import tracing
+
+from prometheus_client import (
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    CONTENT_TYPE_LATEST,
+    push_to_gateway,
+    write_to_textfile,
+)
+
+# Outbound calls are slow (LinkedIn via Unipile, LLM), so the buckets go up to our 60s timeouts.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60)
+
+EXTERNAL_LATENCY = Histogram(
+    "li_external_call_seconds",
+    "Latency of calls to external services (Unipile, Slack, Anthropic)",
+    ["service", "function"],
+    buckets=LATENCY_BUCKETS,
+)
+EXTERNAL_STATUS = Counter(
+    "li_external_call_status_total",
+    "Responses from external services by status code",
+    ["service", "function", "status"],
+)
+EXTERNAL_ERRORS = Counter(
+    "li_external_call_errors_total",
+    "Failed calls to external services (exceptions, HTTP errors, Slack ok=false)",
+    ["service", "function", "kind"],
+)
+
+DB_LATENCY = Histogram(
+    "li_db_query_seconds",
+    "Latency of DB statements, labeled by the calling function",
+    ["function"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_ERRORS = Counter(
+    "li_db_query_errors_total",
+    "Failed DB statements, labeled by the calling function",
+    ["function", "kind"],
+)
+
+READ_ACCOUNT_HEALTHY = Gauge(
+    "li_unipile_read_account_healthy",
+    "1 if the Unipile read account is usable, 0 while it's benched after throttling/errors",
+    ["account"],
+)
+
+WORKER_INFLIGHT = Gauge(
+    "li_slack_worker_inflight",
+    "Background Slack workers currently running (worker queue depth)",
+    ["worker"],
+)
+CLICK_TO_COMMENT = Histogram(
+    "li_click_to_comment_seconds",
+    "Time from the Slack click to the LinkedIn comment being posted",
+    ["action"],
+    buckets=(0.5, 1, 2, 3, 5, 10, 20, 30, 60, 120),
+)
+
+CIRCUIT_STATE = Gauge(
+    "li_circuit_state",
+    "Circuit breaker state per dependency: 0 closed, 1 half-open, 2 open",
+    ["service"],
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "li_circuit_transitions_total",
+    "Circuit breaker state changes per dependency",
+    ["service", "state"],
+)
+CIRCUIT_REJECTED = Counter(
+    "li_circuit_rejected_total",
+    "Calls short-circuited because the dependency's breaker was open",
+    ["service", "function"],
+)
+
+PREFILTER_DROPPED = Counter(
+    "li_prefilter_dropped_total",
+    "Picks dropped by the local skip-prediction pre-filter (= LLM calls saved)",
+)
+
+POST_TEXT_WRITES = Counter(
+    "li_post_text_writes_total",
+    "Post texts upserted during refresh, by whether the text was written or unchanged (skipped)",
+    ["result"],
+)
+
+PENDING_EXPIRED = Counter(
+    "li_pending_reviews_expired_total",
+    "Pending reviews expired by the sweeper without a reviewer decision",
+)
+
+LLM_TIER_LATENCY = Histogram(
+    "li_llm_tier_seconds",
+    "Comment generation latency per model tier (single, or fast/strong in cascade mode)",
+    ["tier"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_ESCALATIONS = Counter(
+    "li_llm_escalations_total",
+    "Cascade drafts escalated to the larger model, by the first failed check",
+    ["reason"],
+)
+LLM_CASCADE_RESULT = Counter(
+    "li_llm_cascade_comments_total",
+    "Cascade-mode comments by the tier whose output was used",
+    ["tier"],
+)
+
+
+def observe_response(service: str, function: str, status_code: int, seconds: float) -> None:
+    EXTERNAL_LATENCY.labels(service, function).observe(seconds)
+    EXTERNAL_STATUS.labels(service, function, str(status_code)).inc()
+    if status_code >= 400:
+        EXTERNAL_ERRORS.labels(service, function, f"http_{status_code}").inc()
+
+
+def count_error(service: str, function: str, kind: str) -> None:
+    EXTERNAL_ERRORS.labels(service, function, kind).inc()
+
+
+@contextmanager
+def track(service: str, function: str):
+    """
+    Times a non-HTTP external call (e.g. the Anthropic SDK). Exceptions are counted
+    (with the SDK's status_code when it has one) and re-raised.
+    """
+    t0 = time.perf_counter()
+    try:
+        with tracing.child_span(f"{service}.{function}", service=service, function=function):
+            yield
+    except Exception as e:
+        status = getattr(e, "status_code", None)
+        elapsed = time.perf_counter() - t0
+        EXTERNAL_LATENCY.labels(service, function).observe(elapsed)
+        timing.record_io(service, function, elapsed)
+        EXTERNAL_STATUS.labels(service, function, str(status or "exception")).inc()
+        EXTERNAL_ERRORS.labels(service, function, type(e).__name__).inc()
+        raise
+    elapsed = time.perf_counter() - t0
+    EXTERNAL_LATENCY.labels(service, function).observe(elapsed)
+    timing.record_io(service, function, elapsed)
+    EXTERNAL_STATUS.labels(service, function, "200").inc()
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Body + content type for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def export_batch(job: str = "daily_commenter") -> None:
+    """
+    Batch jobs exit before anything could scrape them, so at the end of a run we either
+    write a node_exporter textfile (METRICS_TEXTFILE) or push to a Pushgateway
+    (PROMETHEUS_PUSHGATEWAY). Never raises: metrics must not fail a run.
+    """
+    textfile = os.getenv("METRICS_TEXTFILE")
+    gateway = os.getenv("PROMETHEUS_PUSHGATEWAY")
+    try:
+        if textfile:
+            write_to_textfile(textfile, REGISTRY)
+            print(f"[metrics] wrote {textfile}")
+        if gateway:
+            push_to_gateway(gateway, job=job, registry=REGISTRY)
+            print(f"[metrics] pushed to {gateway}")
+    except Exception as e:
+        print("[metrics] export failed:", repr(e))
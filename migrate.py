@@ -1,42 +1,277 @@
-from db import init_db, get_db
-
-def migrate():
-    init_db()
-
-    # Ensure column exists even if table was created earlier
-    with get_db() as (conn, cur):
-        cur.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS person_identifier TEXT;")
-        cur.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS public_identifier TEXT;")
-        cur.execute("ALTER TABLE pending_reviews ADD COLUMN IF NOT EXISTS slack_channel TEXT;")
-        cur.execute("ALTER TABLE pending_reviews ADD COLUMN IF NOT EXISTS slack_ts TEXT;")
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS handled_posts (
-            social_id TEXT PRIMARY KEY,
-            status TEXT NOT NULL,
-            handled_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-        );
-        """)
-        # NEW: pool of candidate posts to comment on
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS post_pool (
-            social_id TEXT PRIMARY KEY,
-            person_identifier TEXT,
-            profile_url TEXT,
-            profile_name TEXT,
-            post_text TEXT,
-            post_created_at TIMESTAMPTZ NULL,
-            last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-        );
-        """)
-
-        # helpful indexes
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_post_pool_person ON post_pool(person_identifier);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_post_pool_last_seen ON post_pool(last_seen_at);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_handled_posts_status ON handled_posts(status);")
-        cur.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS salesnav_lead_id TEXT;")
-
-        conn.commit()
+"""
+Versioned schema migrations. Each file in migrations/ (NNNN_name.sql) is applied once,
+in order, and recorded in `schema_version`.
+
+    python migrate.py             # apply pending migrations
+    python migrate.py --dry-run   # list pending migrations/steps and the locks they take
+    python migrate.py --status    # applied vs pending (and files edited after applying)
+
+Online rules, so a deploy never blocks the Slack workers or the daily ingest:
+- every statement ends with ';' at end of line and is idempotent (IF NOT EXISTS), so a
+  migration interrupted halfway can simply be re-run;
+- indexes are built with CREATE INDEX CONCURRENTLY. Those steps run outside a
+  transaction; an INVALID index left by an interrupted build is dropped and rebuilt;
+- columns are dropped (or renamed) only in a later release than the one that stops
+  using them: mid-deploy, workers on the previous release still read and write them;
+- every step runs under lock_timeout (MIGRATION_LOCK_TIMEOUT, default 5s). A step that
+  can't get its lock gives up instead of queueing every writer behind it, and is retried
+  (MIGRATION_RETRIES, default 5) with backoff.
+
+A pg advisory lock keeps two deploys from migrating at the same time.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+
+import psycopg
+from psycopg import errors
+
+from db import database_url
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_ADVISORY_LOCK_ID = 0x6C69636D  # arbitrary, shared by every migrate.py process
+
+_CONCURRENT_INDEX_RE = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I
+)
+_LOCKING_RE = re.compile(
+    r"^(?:ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(\w+)|CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?!CONCURRENTLY)\S+.*?\bON\s+(\w+)|DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?(\w+))",
+    re.I | re.S,
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def steps(self) -> list[str]:
+        return split_statements(self.sql)
+
+
+def split_statements(sql: str) -> list[str]:
+    """Statements end with ';' at end of line; '--' comment lines are dropped."""
+    statements, buf = [], []
+    for line in sql.splitlines():
+        if line.strip().startswith("--"):
+            continue
+        buf.append(line)
+        if line.rstrip().endswith(";"):
+            stmt = "\n".join(buf).strip()
+            if stmt != ";":
+                statements.append(stmt)
+            buf = []
+    tail = "\n".join(buf).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def is_concurrent(stmt: str) -> bool:
+    return bool(re.search(r"\bCONCURRENTLY\b", stmt, re.I))
+
+
+def locked_table(stmt: str) -> str | None:
+    """Table a step takes a write-blocking lock on (ALTER TABLE, plain CREATE INDEX, DROP TABLE)."""
+    m = _LOCKING_RE.match(stmt.strip())
+    if not m:
+        return None
+    return next(g for g in m.groups() if g)
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    found = []
+    for fname in sorted(os.listdir(directory)):
+        m = _FILE_RE.match(fname)
+        if not m:
+            continue
+        path = os.path.join(directory, fname)
+        with open(path, "r", encoding="utf-8") as f:
+            found.append(Migration(int(m.group(1)), m.group(2), path, f.read()))
+    versions = [m.version for m in found]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"duplicate migration versions in {directory}")
+    return found
+
+
+def _lock_timeout() -> str:
+    return os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+
+
+def _connect() -> psycopg.Connection:
+    conn = psycopg.connect(database_url(), autocommit=True)
+    conn.execute(f"SET lock_timeout = '{_lock_timeout()}'")
+    return conn
+
+
+def _ensure_version_table(conn) -> None:
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """)
+
+
+def _applied(conn) -> dict[int, str]:
+    rows = conn.execute("SELECT version, checksum FROM schema_version").fetchall()
+    return {v: c for v, c in rows}
+
+
+def _with_retries(fn, what: str):
+    retries = int(os.getenv("MIGRATION_RETRIES", "5"))
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except errors.LockNotAvailable:
+            if attempt == retries:
+                raise
+            wait = min(2 ** attempt, 30)
+            print(f"[migrate] {what}: lock not available within {_lock_timeout()}; retrying in {wait}s")
+            time.sleep(wait)
+
+
+def _drop_invalid_index(conn, name: str) -> None:
+    row = conn.execute(
+        """
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+        """,
+        (name,),
+    ).fetchone()
+    if row:
+        print(f"[migrate] dropping invalid index {name} left by an interrupted build")
+        conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def _run_transaction(conn, statements: list[str]) -> None:
+    with conn.transaction():
+        for stmt in statements:
+            conn.execute(stmt)
+
+
+def _apply(conn, mig: Migration) -> None:
+    label = f"{mig.version:04d}_{mig.name}"
+    group: list[str] = []
+
+    def flush():
+        if group:
+            batch = list(group)
+            _with_retries(lambda: _run_transaction(conn, batch), label)
+            group.clear()
+
+    for stmt in mig.steps():
+        if not is_concurrent(stmt):
+            group.append(stmt)
+            continue
+        flush()
+        m = _CONCURRENT_INDEX_RE.search(stmt)
+        if m:
+            _drop_invalid_index(conn, m.group(1))
+        _with_retries(lambda: conn.execute(stmt), label)
+    flush()
+
+    conn.execute(
+        """
+        INSERT INTO schema_version(version, name, checksum) VALUES (%s, %s, %s)
+        ON CONFLICT (version) DO UPDATE SET checksum = EXCLUDED.checksum, applied_at = NOW()
+        """,
+        (mig.version, mig.name, mig.checksum),
+    )
+
+
+def pending(conn=None) -> list[Migration]:
+    own = conn is None
+    conn = conn or _connect()
+    try:
+        _ensure_version_table(conn)
+        applied = _applied(conn)
+    finally:
+        if own:
+            conn.close()
+    return [m for m in discover() if m.version not in applied]
+
+
+def migrate() -> list[int]:
+    """Applies every pending migration in order; returns the versions applied."""
+    done = []
+    with _connect() as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (_ADVISORY_LOCK_ID,))
+        try:
+            for mig in pending(conn):
+                t0 = time.perf_counter()
+                _apply(conn, mig)
+                done.append(mig.version)
+                print(f"[migrate] applied {mig.version:04d}_{mig.name} in {time.perf_counter() - t0:.2f}s")
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK_ID,))
+    return done
+
+
+def dry_run() -> list[Migration]:
+    todo = pending()
+    if not todo:
+        print("[migrate] up to date")
+    for mig in todo:
+        print(f"{mig.version:04d}_{mig.name}")
+        for stmt in mig.steps():
+            first = " ".join(stmt.split())[:90]
+            if is_concurrent(stmt):
+                note = "concurrent, no write lock"
+            elif (table := locked_table(stmt)):
+                note = f"locks {table} (lock_timeout {_lock_timeout()})"
+            else:
+                note = "transactional"
+            print(f"    [{note}] {first}")
+    return todo
+
+
+def status() -> None:
+    with _connect() as conn:
+        _ensure_version_table(conn)
+        applied = _applied(conn)
+    for mig in discover():
+        if mig.version not in applied:
+            state = "pending"
+        elif applied[mig.version] != mig.checksum:
+            state = "applied (file changed since)"
+        else:
+            state = "applied"
+        print(f"{mig.version:04d}_{mig.name}: {state}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--dry-run", action="store_true", help="report pending migrations without applying them")
+    group.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        dry_run()
+    elif args.status:
+        status()
+    else:
+        try:
+            migrate()
+        except errors.LockNotAvailable as e:
+            print(f"[migrate] gave up waiting for a lock: {e}", file=sys.stderr)
+            sys.exit(1)
+        print("OK: migrations applied")
+
 
 if __name__ == "__main__":
-    migrate()
-    print("OK: migrations applied")
+    main()
@@ -0,0 +1,54 @@
+-- Original schema (db.init_db + the first migrate.py ALTERs).
+
+CREATE TABLE IF NOT EXISTS targets (
+    profile_url TEXT PRIMARY KEY,
+    linkedin_urn TEXT,
+    person_identifier TEXT,
+    name TEXT,
+    public_identifier TEXT,
+    salesnav_lead_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS comments (
+    social_id TEXT PRIMARY KEY,
+    comment_text TEXT,
+    commented_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS pending_reviews (
+    social_id TEXT PRIMARY KEY,
+    profile_name TEXT,
+    post_text TEXT,
+    generated_comment TEXT,
+    status TEXT,
+    created_at TIMESTAMPTZ,
+    slack_channel TEXT,
+    slack_ts TEXT
+);
+
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS person_identifier TEXT;
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS public_identifier TEXT;
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS salesnav_lead_id TEXT;
+ALTER TABLE pending_reviews ADD COLUMN IF NOT EXISTS slack_channel TEXT;
+ALTER TABLE pending_reviews ADD COLUMN IF NOT EXISTS slack_ts TEXT;
+
+CREATE TABLE IF NOT EXISTS handled_posts (
+    social_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    handled_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- pool of candidate posts to comment on
+CREATE TABLE IF NOT EXISTS post_pool (
+    social_id TEXT PRIMARY KEY,
+    person_identifier TEXT,
+    profile_url TEXT,
+    profile_name TEXT,
+    post_text TEXT,
+    post_created_at TIMESTAMPTZ NULL,
+    last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_post_pool_person ON post_pool(person_identifier);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_post_pool_last_seen ON post_pool(last_seen_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_handled_posts_status ON handled_posts(status);
@@ -0,0 +1,19 @@
+-- daily runs + per-stage checkpoints (for `daily_commenter --resume`)
+
+CREATE TABLE IF NOT EXISTS runs (
+    id BIGSERIAL PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running',
+    stage TEXT NOT NULL,
+    salesnav_cursor TEXT,
+    salesnav_upserted INT NOT NULL DEFAULT 0,
+    delivered INT NOT NULL DEFAULT 0,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ NULL
+);
+
+CREATE TABLE IF NOT EXISTS run_refreshed_targets (
+    run_id BIGINT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    profile_url TEXT NOT NULL,
+    PRIMARY KEY (run_id, profile_url)
+);
@@ -0,0 +1,19 @@
+-- conditional Sales Nav sync: per-page fingerprints + removed-lead flags
+
+CREATE TABLE IF NOT EXISTS salesnav_lists (
+    salesnav_url TEXT PRIMARY KEY,
+    last_full_sync_at TIMESTAMPTZ,
+    page_count INT
+);
+
+CREATE TABLE IF NOT EXISTS salesnav_pages (
+    salesnav_url TEXT NOT NULL,
+    page_index INT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    item_count INT NOT NULL,
+    fetched_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (salesnav_url, page_index)
+);
+
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS last_synced_at TIMESTAMPTZ;
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
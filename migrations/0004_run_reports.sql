@@ -0,0 +1,10 @@
+-- per-run timing reports (JSON) for trending run durations over time
+
+CREATE TABLE IF NOT EXISTS run_reports (
+    id BIGSERIAL PRIMARY KEY,
+    run_id BIGINT REFERENCES runs(id) ON DELETE SET NULL,
+    report JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_run_reports_created ON run_reports(created_at);
@@ -0,0 +1,38 @@
+-- campaigns: one run serves several Sales Nav lists / reviewers / prompts
+
+CREATE TABLE IF NOT EXISTS campaigns (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    salesnav_url TEXT NOT NULL,
+    slack_user_id TEXT NOT NULL,
+    prompt_file TEXT,
+    max_per_day INT NOT NULL DEFAULT 20,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- which targets are on which campaign's list (targets itself stays global, so a
+-- lead on several lists is stored and polled once)
+CREATE TABLE IF NOT EXISTS campaign_targets (
+    campaign_id INT NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    profile_url TEXT NOT NULL,
+    last_synced_at TIMESTAMPTZ NOT NULL,
+    removed_at TIMESTAMPTZ,
+    PRIMARY KEY (campaign_id, profile_url)
+);
+
+-- per-campaign run checkpoints (Sales Nav cursor, reviews delivered)
+CREATE TABLE IF NOT EXISTS run_campaigns (
+    run_id BIGINT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    campaign_id INT NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    salesnav_cursor TEXT,
+    salesnav_upserted INT NOT NULL DEFAULT 0,
+    sync_done BOOLEAN NOT NULL DEFAULT FALSE,
+    delivered INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, campaign_id)
+);
+
+ALTER TABLE pending_reviews ADD COLUMN IF NOT EXISTS campaign_id INT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_campaign_targets_profile ON campaign_targets(profile_url);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_targets_person ON targets(person_identifier);
@@ -0,0 +1,13 @@
+-- warm buffer: eligible posts with comments already generated, per campaign
+
+CREATE TABLE IF NOT EXISTS candidate_buffer (
+    social_id TEXT PRIMARY KEY,
+    campaign_id INT NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    person_identifier TEXT,
+    profile_name TEXT,
+    post_text TEXT,
+    generated_comment TEXT NOT NULL,
+    buffered_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_candidate_buffer_campaign ON candidate_buffer(campaign_id, buffered_at);
@@ -0,0 +1,12 @@
+-- relevance scores for eligible posts (rewritten by scoring.score_eligible_posts)
+
+CREATE TABLE IF NOT EXISTS post_scores (
+    social_id TEXT PRIMARY KEY,
+    score DOUBLE PRECISION NOT NULL,
+    recency DOUBLE PRECISION NOT NULL,
+    topic DOUBLE PRECISION NOT NULL,
+    author DOUBLE PRECISION NOT NULL,
+    scored_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_post_scores_score ON post_scores(score DESC);
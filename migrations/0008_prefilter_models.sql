@@ -0,0 +1,9 @@
+-- local skip-prediction models (prefilter.py train); the latest row is used
+
+CREATE TABLE IF NOT EXISTS prefilter_models (
+    id SERIAL PRIMARY KEY,
+    n_features INT NOT NULL,
+    weights BYTEA NOT NULL,
+    evaluation JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,3 @@
+-- expiry sweep (expiry.py) scans pending reviews oldest-first
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pending_reviews_created ON pending_reviews(created_at);
@@ -0,0 +1,6 @@
+-- rolling per-campaign daily cap (daemon mode): comments remember their campaign
+
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS campaign_id INT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_campaign_commented ON comments(campaign_id, commented_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pending_reviews_campaign ON pending_reviews(campaign_id);
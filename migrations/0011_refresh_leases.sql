@@ -0,0 +1,13 @@
+-- refresh sharding: a run's targets are split into hash chunks that worker processes
+-- lease (with expiry, so a crashed worker's chunk is picked up again)
+
+CREATE TABLE IF NOT EXISTS refresh_leases (
+    run_id BIGINT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    chunk INT NOT NULL,
+    chunk_count INT NOT NULL,
+    worker TEXT,
+    leased_until TIMESTAMPTZ,
+    attempts INT NOT NULL DEFAULT 0,
+    done_at TIMESTAMPTZ,
+    PRIMARY KEY (run_id, chunk)
+);
@@ -0,0 +1,27 @@
+-- post text stored once per post instead of copied into post_pool, candidate_buffer and
+-- pending_reviews; text_hash (md5) lets the refresh skip rewriting text that hasn't changed
+
+CREATE TABLE IF NOT EXISTS post_texts (
+    social_id TEXT PRIMARY KEY,
+    text_hash BYTEA NOT NULL,
+    post_text TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- long posts (rows past ~2 KB) are compressed by TOAST: with lz4 where the server was
+-- built with it (faster to read and write), pglz otherwise
+DO $$ BEGIN ALTER TABLE post_texts ALTER COLUMN post_text SET COMPRESSION lz4; EXCEPTION WHEN feature_not_supported THEN NULL; END $$;
+
+INSERT INTO post_texts(social_id, text_hash, post_text)
+SELECT social_id, decode(md5(COALESCE(post_text, '')), 'hex'), post_text FROM post_pool
+ON CONFLICT DO NOTHING;
+INSERT INTO post_texts(social_id, text_hash, post_text)
+SELECT social_id, decode(md5(COALESCE(post_text, '')), 'hex'), post_text FROM candidate_buffer
+ON CONFLICT DO NOTHING;
+INSERT INTO post_texts(social_id, text_hash, post_text)
+SELECT social_id, decode(md5(COALESCE(post_text, '')), 'hex'), post_text FROM pending_reviews
+ON CONFLICT DO NOTHING;
+
+-- The old post_text columns stay until every reader and writer runs this release: workers
+-- still on the previous one keep using them mid-deploy. A later migration re-runs the
+-- backfill above (for rows those workers wrote) and then drops them.
@@ -0,0 +1,12 @@
+-- incremental scoring: corpus stats (topic IDF + scale) of the last full scoring pass,
+-- so new posts are scored against the whole pool without re-reading it
+
+CREATE TABLE IF NOT EXISTS scoring_stats (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    config TEXT NOT NULL,
+    terms TEXT[] NOT NULL,
+    df INT[] NOT NULL,
+    docs INT NOT NULL,
+    top_raw DOUBLE PRECISION NOT NULL,
+    computed_at TIMESTAMPTZ NOT NULL
+);
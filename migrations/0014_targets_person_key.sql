@@ -0,0 +1,3 @@
+-- the refresh pages through targets by person key (db.stream_rows keyset pagination)
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_targets_person_key ON targets((COALESCE(person_identifier, profile_url)), profile_url);
@@ -0,0 +1,3 @@
+-- per-target refresh time, so repeated passes (daemon cycles) only fetch targets that are due
+
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS last_refreshed_at TIMESTAMPTZ;
@@ -0,0 +1,8 @@
+-- read-account pacing shared by every process (accounts.AccountPool.acquire): the time
+-- each account's next read may start, and until when it's benched
+
+CREATE TABLE IF NOT EXISTS read_account_budget (
+    account_id TEXT PRIMARY KEY,
+    next_at TIMESTAMPTZ NOT NULL,
+    benched_until TIMESTAMPTZ
+);
@@ -0,0 +1,5 @@
+-- when a review was claimed for posting (status 'posting'), so a claim abandoned by a
+-- process that died mid-post times out (bulk_actions.CLAIMABLE) instead of sticking;
+-- rows already 'posting' have no claimed_at and are claimable again right away
+
+ALTER TABLE pending_reviews ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
@@ -0,0 +1,19 @@
+-- one row per review sent to a campaign's reviewer, so the rolling daily cap
+-- (campaigns.remaining_today) counts every delivery, whatever the reviewer then did
+
+CREATE TABLE IF NOT EXISTS review_deliveries (
+    social_id TEXT PRIMARY KEY,
+    campaign_id INT,
+    delivered_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_review_deliveries_campaign ON review_deliveries(campaign_id, delivered_at);
+
+-- what the old cap counted: reviews still waiting, and comments posted in the last 24h
+INSERT INTO review_deliveries(social_id, campaign_id, delivered_at)
+SELECT social_id, campaign_id, COALESCE(created_at, NOW()) FROM pending_reviews
+ON CONFLICT DO NOTHING;
+INSERT INTO review_deliveries(social_id, campaign_id, delivered_at)
+SELECT social_id, campaign_id, commented_at FROM comments
+WHERE commented_at >= NOW() - INTERVAL '24 hours'
+ON CONFLICT DO NOTHING;
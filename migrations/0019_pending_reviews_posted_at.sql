@@ -0,0 +1,6 @@
+-- when a claimed review was posted, written right after the post and before it's
+-- recorded: a posted review is never claimed, skipped or expired again, so a poster
+-- that dies (or gives up recording) between the two can't get it posted twice;
+-- bulk_actions.record_orphaned_posts records it once its claim times out
+
+ALTER TABLE pending_reviews ADD COLUMN IF NOT EXISTS posted_at TIMESTAMPTZ;
@@ -0,0 +1,248 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+# Compiled once; these run on every item we ingest.
+_SALES_LEAD_RE = re.compile(r"/sales/lead/([^,/?#]+)")
+_SALES_ID_RE = re.compile(r"^[A-Za-z0-9_-]{10,}$")
+_ACW_TOKEN_RE = re.compile(r"(ACw[A-Za-z0-9_-]{6,})")
+_REL_DATE_RE = re.compile(r"^(\d+)\s*([a-z]+)$")
+
+_REL_UNIT_DAYS = {
+    "d": 1, "day": 1, "days": 1,
+    "w": 7, "wk": 7, "week": 7, "weeks": 7,
+    "mo": 30, "mon": 30, "month": 30, "months": 30,
+    "y": 365, "yr": 365, "year": 365, "years": 365,
+}
+
+_LIST_KEYS = ("items", "data", "results")
+_LEAD_ID_KEYS = ("salesnav_id", "lead_id", "leadId", "id", "urn", "profile_urn", "profileUrn")
+_LEAD_URL_KEYS = ("profile_url", "profileUrl", "url", "lead_url", "leadUrl")
+_SOCIAL_ID_KEYS = ("social_id", "socialId", "urn", "entity_urn")
+_TEXT_KEYS = ("text", "content", "caption")
+_CREATED_AT_KEYS = ("created_at", "createdAt", "created_time", "createdTime")
+
+
+class PostRecord(NamedTuple):
+    social_id: str
+    text: str
+    created_at: datetime | None  # exact timestamp when Unipile gives one (ISO), else None
+    posted_at: datetime | None  # best estimate incl. relative dates ("2w"); used for lookback
+
+
+class LeadRecord(NamedTuple):
+    profile_url: str
+    name: str | None
+    public_identifier: str | None
+    salesnav_lead_id: str | None
+    urn: str | None
+
+
+def items_from_response(data) -> list:
+    """
+    Unipile sometimes returns:
+      - {"items":[...]}
+      - {"data":[...]}
+      - or a raw list
+    """
+    if type(data) is list:
+        return data
+    if isinstance(data, dict):
+        for k in _LIST_KEYS:
+            v = data.get(k)
+            if type(v) is list:
+                return v
+    return []
+
+
+def _lead_id_from_str(s: str) -> str | None:
+    m = _SALES_LEAD_RE.search(s)
+    if m:
+        return m.group(1)
+    # Sometimes it's directly an id like ACwAAB...
+    if s.startswith("ACw") and _SALES_ID_RE.match(s):
+        return s
+    # Could be urn-ish; just attempt to capture ACw token
+    if "ACw" in s:
+        m = _ACW_TOKEN_RE.search(s)
+        if m:
+            return m.group(1)
+    return None
+
+
+def extract_salesnav_lead_id(obj) -> str | None:
+    """
+    Sales Navigator lead id (often starts with ACw...) from a /linkedin/search result
+    dict (id-ish keys first, then URL keys) or from a string (url/urn).
+    """
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        for keys in (_LEAD_ID_KEYS, _LEAD_URL_KEYS):
+            for k in keys:
+                v = obj.get(k)
+                if type(v) is str:
+                    v = v.strip()
+                    if v:
+                        cand = _lead_id_from_str(v)
+                        if cand:
+                            return cand
+        return None
+    return _lead_id_from_str(str(obj).strip())
+
+
+def _parse_iso(v) -> datetime | None:
+    # naive timestamps are local time, as datetime.astimezone() takes them
+    if type(v) is not str or not v.strip():
+        return None
+    try:
+        return datetime.fromisoformat(v.replace("Z", "+00:00")).astimezone(timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def parse_unipile_datetime(post: dict, now: datetime | None = None) -> datetime | None:
+    """
+    Best field: parsed_datetime (ISO string)
+    fallback: date like "1d", "2w"
+    """
+    dt = _parse_iso(post.get("parsed_datetime"))
+    if dt is not None:
+        return dt
+
+    rel = post.get("date")
+    if type(rel) is str:
+        m = _REL_DATE_RE.match(rel.strip().lower())
+        if m:
+            days = _REL_UNIT_DAYS.get(m.group(2))
+            if days is not None:
+                return (now or datetime.now(timezone.utc)) - timedelta(days=days * int(m.group(1)))
+    return None
+
+
+def get_social_id(p: dict) -> str | None:
+    for k in _SOCIAL_ID_KEYS:
+        v = p.get(k)
+        if v:
+            return v
+    return None
+
+
+def get_post_text(p: dict) -> str:
+    for k in _TEXT_KEYS:
+        v = p.get(k)
+        if v:
+            return v.strip()
+    return ""
+
+
+def parse_post_created_at(p: dict) -> datetime | None:
+    # exact timestamps only; relative "1d" style fields aren't stored
+    for k in _CREATED_AT_KEYS:
+        v = p.get(k)
+        if v:
+            dt = _parse_iso(v)
+            if dt is not None:
+                return dt
+    return _parse_iso(p.get("parsed_datetime"))
+
+
+def parse_post(p, cutoff: datetime | None = None, now: datetime | None = None) -> PostRecord | None:
+    """
+    Raw Unipile post -> PostRecord. None if it isn't usable (no id/text, undated,
+    or older than `cutoff`).
+    """
+    if type(p) is not dict:
+        return None
+    social_id = get_social_id(p)
+    if not social_id:
+        return None
+    posted_at = parse_unipile_datetime(p, now)
+    if posted_at is None or (cutoff is not None and posted_at < cutoff):
+        return None
+    text = get_post_text(p)
+    if not text:
+        return None
+    return PostRecord(social_id, text, parse_post_created_at(p), posted_at)
+
+
+def parse_lead(it) -> LeadRecord | None:
+    """Raw /linkedin/search result -> LeadRecord. None without a profile URL."""
+    if type(it) is not dict:
+        return None
+    # Unipile sometimes returns these with different keys
+    profile_url = it.get("profile_url") or it.get("profileUrl") or it.get("url")
+    if not profile_url:
+        return None
+    name = (it.get("name") or it.get("full_name") or it.get("fullName") or "").strip() or None
+    public_identifier = it.get("public_identifier") or it.get("publicIdentifier") or None
+    # Extract Sales Nav lead id (ACw...) from the item or URL
+    salesnav_lead_id = extract_salesnav_lead_id(it) or _lead_id_from_str(profile_url)
+    urn = str(it.get("urn") or it.get("linkedin_urn") or it.get("id") or "") or None
+    return LeadRecord(profile_url, name, public_identifier, salesnav_lead_id, urn)
+
+
+# Fields the ingestion path actually reads; stream_items() drops everything else
+# (attachments, author blocks, counters...) before an item dict is even built.
+POST_FIELDS = frozenset(_SOCIAL_ID_KEYS + _TEXT_KEYS + _CREATED_AT_KEYS + ("parsed_datetime", "date"))
+LEAD_FIELDS = frozenset(
+    _LEAD_ID_KEYS + _LEAD_URL_KEYS
+    + ("name", "full_name", "fullName", "public_identifier", "publicIdentifier", "linkedin_urn")
+)
+
+_ITEM_PREFIXES = ("item",) + tuple(f"{k}.item" for k in _LIST_KEYS)
+_SCALAR_EVENTS = frozenset(("string", "number", "boolean", "null"))
+
+
+def stream_items(fp, keep=None, envelope: dict | None = None):
+    """
+    Incrementally decodes a Unipile list response from a binary file object and yields
+    its items one at a time (same shapes as items_from_response; the first list found
+    wins). With `keep`, only those top-level item fields are materialized. Top-level
+    scalars (e.g. cursor) and `paging` are collected into `envelope`.
+    """
+    import ijson
+
+    item_prefix = None  # fixed by the first list we see
+    builder = None
+    skip = None
+    paging = None
+
+    for prefix, event, value in ijson.parse(fp, use_float=True):
+        if builder is not None:
+            if skip is not None:
+                if prefix == skip or prefix.startswith(skip + "."):
+                    continue
+                skip = None
+            if prefix == item_prefix:
+                if event == "end_map":
+                    builder.event(event, value)
+                    yield builder.value
+                    builder = None
+                    continue
+                if event == "map_key" and keep is not None and value not in keep:
+                    skip = f"{item_prefix}.{value}"
+                    continue
+            builder.event(event, value)
+            continue
+
+        if event == "start_map" and prefix in _ITEM_PREFIXES and (item_prefix is None or prefix == item_prefix):
+            item_prefix = prefix
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            continue
+
+        if envelope is None:
+            continue
+        if paging is not None:
+            if prefix == "paging" and event == "end_map":
+                paging.event(event, value)
+                envelope["paging"] = paging.value
+                paging = None
+            else:
+                paging.event(event, value)
+        elif prefix == "paging" and event == "start_map":
+            paging = ijson.ObjectBuilder()
+            paging.event(event, value)
+        elif event in _SCALAR_EVENTS and prefix and "." not in prefix:
+            envelope[prefix] = value
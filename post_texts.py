@@ -0,0 +1,34 @@
+"""
+Post text lives once per post in post_texts (migrations/0012_post_texts.sql); post_pool,
+candidate_buffer and pending_reviews join it by social_id.
+"""
+import hashlib
+
+import metrics
+
+
+def text_hash(text: str | None) -> bytes:
+    """md5 of the text, same as decode(md5(post_text), 'hex') in Postgres."""
+    return hashlib.md5((text or "").encode("utf-8"), usedforsecurity=False).digest()
+
+
+def store_text(cur, social_id: str, text: str | None) -> bool:
+    """
+    Upserts a post's text; unchanged text (same hash) isn't rewritten, so re-seeing a
+    post costs no new row version or WAL. Returns whether anything was written.
+    """
+    cur.execute(
+        """
+        INSERT INTO post_texts(social_id, text_hash, post_text)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (social_id) DO UPDATE SET
+            text_hash=EXCLUDED.text_hash,
+            post_text=EXCLUDED.post_text,
+            updated_at=NOW()
+        WHERE post_texts.text_hash <> EXCLUDED.text_hash
+        """,
+        (social_id, text_hash(text), text),
+    )
+    written = cur.rowcount == 1
+    metrics.POST_TEXT_WRITES.labels("written" if written else "unchanged").inc()
+    return written
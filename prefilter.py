@@ -0,0 +1,227 @@
+"""
+Local pre-filter: a hashed bag-of-words logistic regression trained on past review
+decisions (posted vs skipped). Picks it's confident the reviewer would skip are dropped
+before a comment is generated for them.
+
+    python prefilter.py train            # retrain from handled_posts/comments, store the model
+    python prefilter.py report --days 30 # model quality + LLM calls saved
+
+PREFILTER_THRESHOLD     drop picks whose predicted approval probability is below this
+                        (default 0.2; 0 disables the filter)
+PREFILTER_MIN_EXAMPLES  don't train on fewer labeled posts than this (default 50)
+"""
+import argparse
+import json
+import os
+import zlib
+
+import numpy as np
+
+import metrics
+from db import get_db
+from scoring import tokenize
+
+N_FEATURES = 1 << 16
+_BIAS = 0  # feature 0 is the intercept; every post has it, so no document is empty
+
+
+def _features(text: str) -> np.ndarray:
+    """Hashed unigrams + bigrams (crc32, so indices are stable across processes)."""
+    toks = tokenize(text)
+    grams = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+    idx = {_BIAS}
+    for g in grams:
+        idx.add(1 + zlib.crc32(g.encode("utf-8")) % (N_FEATURES - 1))
+    return np.fromiter(idx, dtype=np.int64, count=len(idx))
+
+
+def _design(texts: list[str]):
+    """Sparse rows as (cols, vals, indptr); binary features, L2-normalized per post."""
+    rows = [_features(t) for t in texts]
+    lens = np.array([len(r) for r in rows], dtype=np.int64)
+    cols = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    vals = np.repeat(1.0 / np.sqrt(lens), lens)
+    indptr = np.concatenate(([0], np.cumsum(lens)))
+    return cols, vals, indptr, lens
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def _predict(w: np.ndarray, texts: list[str]) -> np.ndarray:
+    if not texts:
+        return np.zeros(0)
+    cols, vals, indptr, _ = _design(texts)
+    return _sigmoid(np.add.reduceat(w[cols] * vals, indptr[:-1]))
+
+
+def fit(texts: list[str], labels: np.ndarray, epochs: int = 300, lr: float = 2.0, l2: float = 1e-4) -> np.ndarray:
+    """
+    Full-batch gradient descent on the logistic loss. Positive and negative examples are
+    weighted equally, so a mostly-skipped history doesn't just learn "always skip".
+    """
+    cols, vals, indptr, lens = _design(texts)
+    y = labels.astype(float)
+    n_pos = max(y.sum(), 1.0)
+    n_neg = max(len(y) - y.sum(), 1.0)
+    sample_w = np.where(y == 1, len(y) / (2 * n_pos), len(y) / (2 * n_neg))
+
+    w = np.zeros(N_FEATURES)
+    for _ in range(epochs):
+        p = _sigmoid(np.add.reduceat(w[cols] * vals, indptr[:-1]))
+        g = (p - y) * sample_w
+        grad = np.bincount(cols, weights=vals * np.repeat(g, lens), minlength=N_FEATURES) / len(y)
+        grad += l2 * w
+        w -= lr * grad
+    return w
+
+
+def _labeled_posts() -> tuple[list[str], np.ndarray]:
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            SELECT pt.post_text,
+                   (h.status = 'posted' OR EXISTS (SELECT 1 FROM comments c WHERE c.social_id = p.social_id)) AS approved
+            FROM post_pool p
+            JOIN post_texts pt ON pt.social_id = p.social_id
+            LEFT JOIN handled_posts h ON h.social_id = p.social_id
+            WHERE pt.post_text IS NOT NULL
+              AND (h.status IN ('posted', 'skipped')
+                   OR EXISTS (SELECT 1 FROM comments c WHERE c.social_id = p.social_id))
+            """
+        )
+        rows = cur.fetchall()
+    return [r["post_text"] for r in rows], np.array([bool(r["approved"]) for r in rows])
+
+
+def train(threshold: float | None = None, seed: int = 0) -> dict | None:
+    """
+    Trains on 80% of the labeled history, evaluates on the rest, then refits on
+    everything and stores the model. Returns the evaluation (None if too little data).
+    """
+    threshold = threshold_from_env() if threshold is None else threshold
+    texts, y = _labeled_posts()
+    min_examples = int(os.getenv("PREFILTER_MIN_EXAMPLES", "50"))
+    if len(texts) < min_examples or y.all() or not y.any():
+        print(f"[prefilter] not enough labeled history to train ({len(texts)} posts, {int(y.sum())} posted)")
+        return None
+
+    order = np.random.default_rng(seed).permutation(len(texts))
+    cut = int(len(order) * 0.8)
+    train_idx, test_idx = order[:cut], order[cut:]
+    w = fit([texts[i] for i in train_idx], y[train_idx])
+    p = _predict(w, [texts[i] for i in test_idx])
+    y_test = y[test_idx]
+    dropped = p < threshold
+    evaluation = {
+        "examples": len(texts),
+        "posted": int(y.sum()),
+        "skipped": int(len(y) - y.sum()),
+        "threshold": threshold,
+        "holdout": len(test_idx),
+        "holdout_accuracy": round(float(((p >= 0.5) == y_test).mean()), 4) if len(test_idx) else None,
+        # at `threshold`: share of skips we'd have caught / approvals we'd have lost
+        "skips_dropped": round(float(dropped[~y_test].mean()), 4) if (~y_test).any() else None,
+        "approvals_dropped": round(float(dropped[y_test].mean()), 4) if y_test.any() else None,
+    }
+
+    w = fit(texts, y).astype(np.float32)
+    with get_db() as (conn, cur):
+        cur.execute(
+            "INSERT INTO prefilter_models(n_features, weights, evaluation) VALUES (%s, %s, %s::jsonb)",
+            (N_FEATURES, w.tobytes(), json.dumps(evaluation)),
+        )
+        conn.commit()
+    _cache.clear()
+    return evaluation
+
+
+_cache: dict = {}
+
+
+def load_model() -> np.ndarray | None:
+    """Latest stored weights (cached per process), or None if never trained."""
+    if "w" not in _cache:
+        with get_db() as (conn, cur):
+            cur.execute("SELECT n_features, weights FROM prefilter_models ORDER BY id DESC LIMIT 1")
+            row = cur.fetchone()
+        w = None
+        if row and row["n_features"] == N_FEATURES:
+            w = np.frombuffer(bytes(row["weights"]), dtype=np.float32).astype(float)
+        _cache["w"] = w
+    return _cache["w"]
+
+
+def threshold_from_env() -> float:
+    return float(os.getenv("PREFILTER_THRESHOLD", "0.2"))
+
+
+def filter_picks(picks: list[dict]) -> list[dict]:
+    """
+    Drops picks the model says will likely be skipped (approval probability below
+    PREFILTER_THRESHOLD) and records them in handled_posts as 'prefiltered', so they
+    aren't picked again. Returns the picks to generate comments for.
+    """
+    threshold = threshold_from_env()
+    w = load_model() if threshold > 0 else None
+    if w is None or not picks:
+        return picks
+
+    probs = _predict(w, [row.get("post_text") or "" for row in picks])
+    keep, dropped = [], []
+    for row, p in zip(picks, probs):
+        (keep if p >= threshold else dropped).append(row)
+    if dropped:
+        with get_db() as (conn, cur):
+            cur.executemany(
+                "INSERT INTO handled_posts(social_id, status) VALUES (%s, 'prefiltered') ON CONFLICT (social_id) DO NOTHING",
+                [(row["social_id"],) for row in dropped],
+            )
+            conn.commit()
+        metrics.PREFILTER_DROPPED.inc(len(dropped))
+        print(f"[prefilter] dropped {len(dropped)}/{len(picks)} likely skips (saved {len(dropped)} LLM calls)")
+    return keep
+
+
+def report(days: int = 30) -> dict:
+    with get_db() as (conn, cur):
+        cur.execute("SELECT id, created_at, evaluation FROM prefilter_models ORDER BY id DESC LIMIT 1")
+        model = cur.fetchone()
+        cur.execute(
+            """
+            SELECT handled_at::date AS day, COUNT(*) AS n
+            FROM handled_posts
+            WHERE status = 'prefiltered' AND handled_at >= NOW() - make_interval(days => %s)
+            GROUP BY 1 ORDER BY 1
+            """,
+            (days,),
+        )
+        per_day = {str(r["day"]): r["n"] for r in cur.fetchall()}
+    return {
+        "model_id": model["id"] if model else None,
+        "trained_at": model["created_at"].isoformat() if model else None,
+        "evaluation": model["evaluation"] if model else None,
+        "threshold": threshold_from_env(),
+        "llm_calls_saved": sum(per_day.values()),
+        "llm_calls_saved_per_day": per_day,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local skip-prediction pre-filter")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_train = sub.add_parser("train", help="retrain from review history and store the model")
+    p_train.add_argument("--threshold", type=float, help="threshold to evaluate at (default PREFILTER_THRESHOLD)")
+    p_report = sub.add_parser("report", help="model quality and LLM calls saved")
+    p_report.add_argument("--days", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "train":
+        print(json.dumps(train(threshold=args.threshold), indent=2))
+    else:
+        print(json.dumps(report(args.days), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
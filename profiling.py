@@ -0,0 +1,217 @@
+"""
+Opt-in profiling, off unless these are set:
+
+PROFILE                 "cprofile" or "pyinstrument": profile each daily_commenter run /
+                        daemon cycle (pyinstrument is optional; falls back to cProfile)
+PROFILE_WEB_SAMPLE      fraction of /slack/actions requests to profile, together with
+                        the background worker they start (e.g. 0.05; default 0)
+PROFILE_DIR             where artifacts go (default ./profiles)
+PROFILE_KEEP            newest artifacts kept, older ones deleted (default 50)
+
+cProfile writes .pstats (`python -m pstats`, snakeviz, flameprof); pyinstrument writes
+an .html flame/call tree. Both only see the thread they run in: worker threads started
+inside a profiled block (the refresh lanes) wrap their work in thread_profiled(), and
+their profiles are merged into the block's artifact.
+"""
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Set for a sampled web request; threads started for it (see slack_server) profile too.
+request_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar("profile_request_sampled", default=False)
+
+# The profiled() block this context runs in; threads started under a copy of the
+# context add their own profiles to it (thread_profiled()).
+_block: contextvars.ContextVar["_Block | None"] = contextvars.ContextVar("profile_block", default=None)
+
+_rotate_lock = threading.Lock()
+# Web requests share the event-loop thread, which can only run one profiler at a time.
+_web_lock = threading.Lock()
+
+
+def mode() -> str | None:
+    m = (os.getenv("PROFILE") or "").strip().lower()
+    return m if m in ("cprofile", "pyinstrument") else None
+
+
+def web_sample_rate() -> float:
+    return float(os.getenv("PROFILE_WEB_SAMPLE", "0"))
+
+
+def sample_request() -> bool:
+    rate = web_sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+@contextmanager
+def web_slot():
+    """
+    Yields True if this request may be profiled: sampled (PROFILE_WEB_SAMPLE) and no
+    other sampled request is being profiled right now. Never waits.
+    """
+    if not sample_request() or not _web_lock.acquire(blocking=False):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        _web_lock.release()
+
+
+def _dir() -> str:
+    path = os.getenv("PROFILE_DIR", "profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _artifact_path(name: str, ext: str) -> str:
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")
+    return os.path.join(_dir(), f"{stamp}-{safe}-{os.getpid()}-{threading.get_ident() % 100000}.{ext}")
+
+
+def rotate(keep: int | None = None) -> int:
+    """Deletes all but the newest `keep` (PROFILE_KEEP) artifacts; returns how many went."""
+    keep = int(os.getenv("PROFILE_KEEP", "50")) if keep is None else keep
+    path = _dir()
+    with _rotate_lock:
+        files = [os.path.join(path, f) for f in os.listdir(path) if f.endswith((".pstats", ".html"))]
+        files.sort(key=os.path.getmtime, reverse=True)
+        removed = 0
+        for f in files[keep:]:
+            try:
+                os.remove(f)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _start(kind: str):
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[profile] pyinstrument not installed; using cProfile")
+        else:
+            profiler = Profiler(async_mode="disabled")
+            profiler.start()
+            return "pyinstrument", profiler
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return "cprofile", profiler
+
+
+class _Block:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.lock = threading.Lock()
+        self.threads: list = []  # stopped profilers of worker threads
+
+
+def _stop(kind: str, profiler) -> None:
+    if kind == "pyinstrument":
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+def _finish(kind: str, profiler, name: str, threads: list = ()) -> str:
+    _stop(kind, profiler)
+    if kind == "pyinstrument":
+        session = profiler.last_session
+        if threads:
+            from pyinstrument.renderers import HTMLRenderer
+            from pyinstrument.session import Session
+
+            for t in threads:
+                session = Session.combine(session, t.last_session)
+            html = HTMLRenderer().render(session)
+        else:
+            html = profiler.output_html()
+        path = _artifact_path(name, "html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+    else:
+        import pstats
+
+        stats = pstats.Stats(profiler)
+        for t in threads:
+            stats.add(t)
+        path = _artifact_path(name, "pstats")
+        stats.dump_stats(path)
+    rotate()
+    return path
+
+
+@contextmanager
+def profiled(name: str, kind: str | None = None):
+    """
+    Profiles the block (the calling thread, plus worker threads that use
+    thread_profiled()) if `kind` or PROFILE is set and writes one artifact named after
+    `name`, even if the block raises. No-op otherwise, and if the profiler can't be
+    started.
+    """
+    kind = kind or mode()
+    if not kind:
+        yield
+        return
+    try:
+        kind, profiler = _start(kind)
+    except Exception as e:
+        # profiling is best-effort: the block runs unprofiled
+        print(f"[profile] failed to start {name} profile: {repr(e)}")
+        yield
+        return
+    block = _Block(kind)
+    token = _block.set(block)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _block.reset(token)
+        try:
+            with block.lock:
+                threads = list(block.threads)
+            path = _finish(kind, profiler, name, threads)
+            extra = f" (+{len(threads)} threads)" if threads else ""
+            print(f"[profile] {name}: {time.perf_counter() - t0:.2f}s{extra} -> {path}")
+        except Exception as e:
+            print(f"[profile] failed to write {name} profile: {repr(e)}")
+
+
+@contextmanager
+def thread_profiled():
+    """
+    For a worker thread started (under contextvars.copy_context()) inside a profiled()
+    block: profiles this thread for the duration of the with-block and adds the profile
+    to the block's artifact. No-op outside a profiled block. Join the thread before the
+    profiled block ends, or its profile is left out.
+    """
+    block = _block.get()
+    if block is None:
+        yield
+        return
+    try:
+        kind, profiler = _start(block.kind)
+    except Exception as e:
+        print(f"[profile] failed to start a thread profile: {repr(e)}")
+        yield
+        return
+    try:
+        yield
+    finally:
+        _stop(kind, profiler)
+        with block.lock:
+            block.threads.append(profiler)
+
+
+def web_kind() -> str:
+    """Profiler for sampled web requests: PROFILE if set, else cProfile."""
+    return mode() or "cprofile"
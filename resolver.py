@@ -1,4 +1,4 @@
-import requests
+import http_client
 
 def normalize_dsn(dsn: str) -> str:
     dsn = dsn.strip().rstrip("/")
@@ -21,7 +21,10 @@ def resolve_profile_url_to_identifier(dsn, account_id, api_key, profile_url):
     # search URL is the profile itself
     payload = {"url": profile_url}
 
-    r = requests.post(url, headers=headers, params=params, json=payload, timeout=60)
+    r = http_client.post(
+        url, service="unipile", function="resolve_profile_url_to_identifier",
+        headers=headers, params=params, json=payload, timeout=60,
+    )
     r.raise_for_status()
 
     data = r.json()
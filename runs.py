@@ -0,0 +1,165 @@
+from db import get_db
+
+# Stages of a daily run, in the order main() executes them.
+STAGES = ("sync", "resolve", "refresh", "deliver")
+
+
+def start_run() -> dict:
+    """
+    Starts a fresh run. Any older unfinished run is marked 'abandoned' so
+    `--resume` never picks it up later.
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            "UPDATE runs SET status='abandoned', updated_at=NOW() WHERE status IN ('running', 'failed')"
+        )
+        cur.execute(
+            """
+            INSERT INTO runs(status, stage)
+            VALUES ('running', %s)
+            RETURNING *
+            """,
+            (STAGES[0],),
+        )
+        run = cur.fetchone()
+        conn.commit()
+    return run
+
+
+def latest_unfinished_run() -> dict | None:
+    """
+    The most recent run that didn't reach 'done' (crashed, killed, or failed).
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            SELECT *
+            FROM runs
+            WHERE status IN ('running', 'failed')
+            ORDER BY id DESC
+            LIMIT 1
+            """
+        )
+        return cur.fetchone()
+
+
+def refreshing_run() -> dict | None:
+    """The most recent running run whose refresh stage workers can join."""
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            SELECT *
+            FROM runs
+            WHERE status = 'running' AND stage = 'refresh'
+              AND EXISTS (SELECT 1 FROM refresh_leases l WHERE l.run_id = runs.id)
+            ORDER BY id DESC
+            LIMIT 1
+            """
+        )
+        return cur.fetchone()
+
+
+def stage_done(run: dict, stage: str) -> bool:
+    """True if `run` already moved past `stage`."""
+    return STAGES.index(run["stage"]) > STAGES.index(stage)
+
+
+def set_stage(run_id: int, stage: str) -> None:
+    with get_db() as (conn, cur):
+        cur.execute(
+            "UPDATE runs SET stage=%s, updated_at=NOW() WHERE id=%s",
+            (stage, run_id),
+        )
+        conn.commit()
+
+
+def campaign_checkpoint(run_id: int, campaign_id: int) -> dict:
+    """
+    This run's progress for one campaign (Sales Nav cursor, reviews delivered).
+    Created on first use.
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            INSERT INTO run_campaigns(run_id, campaign_id)
+            VALUES (%s, %s)
+            ON CONFLICT DO NOTHING
+            """,
+            (run_id, campaign_id),
+        )
+        cur.execute(
+            "SELECT * FROM run_campaigns WHERE run_id=%s AND campaign_id=%s",
+            (run_id, campaign_id),
+        )
+        row = cur.fetchone()
+        conn.commit()
+    return row
+
+
+def save_salesnav_checkpoint(run_id: int, campaign_id: int, cursor: str | None, upserted: int) -> None:
+    """
+    Called after each Sales Nav page is committed. `cursor` is the cursor of the
+    NEXT page to fetch (None once the list is exhausted, which also marks the
+    campaign's sync as done).
+    """
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            UPDATE run_campaigns
+            SET salesnav_cursor=%s, salesnav_upserted=%s, sync_done=%s
+            WHERE run_id=%s AND campaign_id=%s
+            """,
+            (cursor, upserted, cursor is None, run_id, campaign_id),
+        )
+        cur.execute("UPDATE runs SET updated_at=NOW() WHERE id=%s", (run_id,))
+        conn.commit()
+
+
+def mark_campaign_synced(run_id: int, campaign_id: int) -> None:
+    with get_db() as (conn, cur):
+        cur.execute(
+            "UPDATE run_campaigns SET sync_done=TRUE WHERE run_id=%s AND campaign_id=%s",
+            (run_id, campaign_id),
+        )
+        conn.commit()
+
+
+def mark_target_refreshed(cur, run_id: int, profile_url: str) -> None:
+    """
+    Runs on the caller's cursor so the checkpoint commits together with the
+    target's post_pool upserts.
+    """
+    cur.execute(
+        """
+        INSERT INTO run_refreshed_targets(run_id, profile_url)
+        VALUES (%s, %s)
+        ON CONFLICT DO NOTHING
+        """,
+        (run_id, profile_url),
+    )
+
+
+def add_delivered(run_id: int, campaign_id: int, n: int = 1) -> None:
+    with get_db() as (conn, cur):
+        cur.execute(
+            "UPDATE run_campaigns SET delivered=delivered + %s WHERE run_id=%s AND campaign_id=%s",
+            (n, run_id, campaign_id),
+        )
+        cur.execute(
+            "UPDATE runs SET delivered=delivered + %s, updated_at=NOW() WHERE id=%s",
+            (n, run_id),
+        )
+        conn.commit()
+
+
+def finish_run(run_id: int, status: str) -> None:
+    with get_db() as (conn, cur):
+        cur.execute(
+            """
+            UPDATE runs
+            SET status=%s, updated_at=NOW(), finished_at=NOW()
+            WHERE id=%s
+            """,
+            (status, run_id),
+        )
+        conn.commit()
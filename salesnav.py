@@ -1,16 +1,16 @@
-import time
 import random
-import requests
+import hashlib
+from datetime import datetime, timezone, timedelta
 
-from unipile import (
-    normalize_dsn,
-    _items_from_unipile_response,
-    extract_salesnav_lead_id,
-    resolve_salesnav_lead_to_profile_id,
-)
+import breaker
+import http_client
+import timing
+
+from unipile import normalize_dsn, resolve_salesnav_lead_to_profile_id, iter_response_items
+from parsing import parse_lead, LEAD_FIELDS
 
 def _sleep(a=0.8, b=1.8):
-    time.sleep(random.uniform(a, b))
+    timing.sleep(random.uniform(a, b))
 
 def _extract_next_cursor(data: dict):
     paging = data.get("paging") or {}
@@ -21,6 +21,140 @@ def _extract_next_cursor(data: dict):
             return data.get(k)
     return None
 
+def _page_fingerprint(leads: list, data: dict) -> str:
+    """
+    Fingerprint of one search page: the lead ids on it plus the item count and the
+    list's total count (when Unipile reports it, so adds/removals anywhere in the list
+    change the first page's fingerprint too).
+    """
+    ids = []
+    for lead in leads:
+        ids.append(lead.salesnav_lead_id or lead.profile_url)
+    paging = data.get("paging") or {}
+    total = paging.get("total_count") or paging.get("total") or ""
+    raw = "\n".join(sorted(ids)) + f"|{len(leads)}|{total}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _load_list_state(salesnav_url: str):
+    from db import get_db
+
+    with get_db() as (conn, cur):
+        cur.execute(
+            "SELECT last_full_sync_at FROM salesnav_lists WHERE salesnav_url=%s",
+            (salesnav_url,),
+        )
+        row = cur.fetchone()
+        cur.execute(
+            "SELECT page_index, fingerprint FROM salesnav_pages WHERE salesnav_url=%s",
+            (salesnav_url,),
+        )
+        fingerprints = {r["page_index"]: r["fingerprint"] for r in cur.fetchall()}
+    return (row["last_full_sync_at"] if row else None), fingerprints
+
+def _upsert_membership(cur, campaign_id: int, profile_urls: list, synced_at: datetime) -> None:
+    cur.execute(
+        """
+        INSERT INTO campaign_targets(campaign_id, profile_url, last_synced_at, removed_at)
+        SELECT %s, u, %s, NULL FROM unnest(%s::text[]) AS u
+        ON CONFLICT (campaign_id, profile_url) DO UPDATE SET
+            last_synced_at=EXCLUDED.last_synced_at,
+            removed_at=NULL
+        """,
+        (campaign_id, synced_at, profile_urls),
+    )
+
+def _campaign_has_members(campaign_id: int) -> bool:
+    from db import get_db
+
+    with get_db() as (conn, cur):
+        cur.execute("SELECT 1 FROM campaign_targets WHERE campaign_id=%s LIMIT 1", (campaign_id,))
+        return cur.fetchone() is not None
+
+def _touch_targets(profile_urls: list, synced_at: datetime, campaign_id: int | None = None) -> None:
+    from db import get_db
+
+    with get_db() as (conn, cur):
+        cur.execute(
+            "UPDATE targets SET last_synced_at=%s, removed_at=NULL WHERE profile_url = ANY(%s)",
+            (synced_at, profile_urls),
+        )
+        if campaign_id is not None:
+            _upsert_membership(cur, campaign_id, profile_urls, synced_at)
+        conn.commit()
+
+def _finish_full_sync(
+    salesnav_url: str,
+    synced_at: datetime,
+    page_count: int,
+    campaign_id: int | None = None,
+    complete: bool = True,
+) -> int:
+    """
+    Called once a full sync is done: records the sync time, so the next runs can skip
+    on fingerprints. If it walked the whole list (`complete`), also flags targets that
+    weren't seen as removed and drops fingerprints of pages past the end; a pass capped
+    by max_people can't tell either.
+
+    With `campaign_id`, only that campaign's membership is flagged; a target is
+    removed globally once it's no longer on any campaign's list.
+    """
+    from db import get_db
+
+    removed = 0
+    with get_db() as (conn, cur):
+        if complete and campaign_id is None:
+            cur.execute(
+                """
+                UPDATE targets
+                SET removed_at=%s
+                WHERE removed_at IS NULL
+                  AND (last_synced_at IS NULL OR last_synced_at < %s)
+                """,
+                (synced_at, synced_at),
+            )
+            removed = cur.rowcount
+        elif complete:
+            cur.execute(
+                """
+                UPDATE campaign_targets
+                SET removed_at=%s
+                WHERE campaign_id=%s
+                  AND removed_at IS NULL
+                  AND last_synced_at < %s
+                """,
+                (synced_at, campaign_id, synced_at),
+            )
+            removed = cur.rowcount
+            cur.execute(
+                """
+                UPDATE targets t
+                SET removed_at=%s
+                WHERE t.removed_at IS NULL
+                  AND NOT EXISTS (
+                    SELECT 1 FROM campaign_targets ct
+                    WHERE ct.profile_url = t.profile_url AND ct.removed_at IS NULL
+                )
+                """,
+                (synced_at,),
+            )
+        if complete:
+            cur.execute(
+                "DELETE FROM salesnav_pages WHERE salesnav_url=%s AND page_index >= %s",
+                (salesnav_url, page_count),
+            )
+        cur.execute(
+            """
+            INSERT INTO salesnav_lists(salesnav_url, last_full_sync_at, page_count)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (salesnav_url) DO UPDATE SET
+                last_full_sync_at=EXCLUDED.last_full_sync_at,
+                page_count=EXCLUDED.page_count
+            """,
+            (salesnav_url, synced_at, page_count),
+        )
+        conn.commit()
+    return removed
+
 def sync_salesnav_list(
     dsn: str,
     account_id: str,
@@ -30,6 +164,14 @@ def sync_salesnav_list(
     page_limit: int = 50,
     debug: bool = False,
     resolve_identifiers: bool = True,
+    start_cursor: str | None = None,
+    start_upserted: int = 0,
+    on_page=None,
+    fingerprint_pages: int = 2,
+    full_sync_every_hours: float = 168,
+    force_full: bool = False,
+    read_pool=None,
+    campaign_id: int | None = None,
 ):
     """
     Pulls *all* people from a Sales Nav lead list URL and upserts into `targets`.
@@ -38,6 +180,23 @@ def sync_salesnav_list(
     - We store a SalesNav lead id (ACw...) as `salesnav_lead_id` (new column recommended).
     - We resolve that ACw... to provider internal id (usually ACo...) and store into `person_identifier`.
       This is the identifier that tends to work for GET /api/v1/users/{id}/posts.
+
+    Conditional sync: every page's fingerprint is stored in `salesnav_pages`. If the first
+    `fingerprint_pages` pages match what we stored last time, the list is considered
+    unchanged and we stop there. A full sync runs when a page differs, when the last full
+    sync is older than `full_sync_every_hours`, or with `force_full`. A full sync that walks
+    the whole list flags targets that are no longer on it (`targets.removed_at`).
+
+    With `read_pool` (accounts.AccountPool), lead -> profile-id lookups are spread over
+    the read accounts with per-account pacing; the search itself stays on `account_id`.
+
+    With `campaign_id`, leads are also recorded as members of that campaign
+    (`campaign_targets`) and removal flags are scoped to it.
+
+    Resuming: pass `start_cursor`/`start_upserted` from a previous checkpoint to continue
+    paging where it stopped (always a plain full pass; no fingerprints or removal flags
+    since we don't see the whole list). `on_page(next_cursor, upserted)` is called after
+    each page is committed so the caller can persist a checkpoint.
     """
     from db import get_db  # local import to avoid cycles
 
@@ -50,66 +209,138 @@ def sync_salesnav_list(
     }
     params = {"account_id": account_id}
 
-    upserted = 0
-    cursor = None
+    upserted = start_upserted
+    cursor = start_cursor
     seen_profile_urls = set()
 
+    # fingerprints are keyed by page index, which we only know when starting from the top
+    track_pages = start_cursor is None
+    synced_at = datetime.now(timezone.utc)
+    checking = False
+    fingerprints = {}
+    if track_pages:
+        last_full_sync_at, fingerprints = _load_list_state(salesnav_url)
+        full_sync_due = (
+            last_full_sync_at is None
+            or synced_at - last_full_sync_at >= timedelta(hours=full_sync_every_hours)
+            # a new campaign on an already-fingerprinted list still needs its membership
+            or (campaign_id is not None and not _campaign_has_members(campaign_id))
+        )
+        checking = not force_full and not full_sync_due and fingerprint_pages > 0
+        if debug:
+            print(f"[salesnav] last_full_sync_at={last_full_sync_at} checking={checking}")
+    unchanged_urls = []  # leads on pages we skipped while checking
+    page_index = 0
+    reached_end = False
+    capped = False
+
     while upserted < max_people:
         payload = {"url": salesnav_url, "limit": page_limit}
         if cursor:
             payload["cursor"] = cursor
 
         _sleep(0.8, 1.8)
-        r = requests.post(url, headers=headers, params=params, json=payload, timeout=60)
+        r = http_client.post(
+            url, service="unipile", function="sync_salesnav_list",
+            headers=headers, params=params, json=payload, timeout=60, stream=True,
+        )
         if debug:
             print("[salesnav] status:", r.status_code)
         r.raise_for_status()
-        data = r.json() if r.text else {}
 
-        items = _items_from_unipile_response(data)
+        # Items are decoded one at a time and reduced to LeadRecords; `data` only
+        # keeps the response envelope (cursor, paging).
+        data = {}
+        n_items = 0
+        leads = []
+        for it in iter_response_items(r, keep=LEAD_FIELDS, envelope=data):
+            n_items += 1
+            lead = parse_lead(it)
+            if lead is not None:
+                leads.append(lead)
 
         if debug:
-            keys = list(data.keys()) if isinstance(data, dict) else [type(data)]
-            print(f"[salesnav] keys={keys}")
-            print(f"[salesnav] got items={len(items)} cursor={cursor!r}")
-            if isinstance(data, dict) and "paging" in data:
+            print(f"[salesnav] envelope keys={list(data.keys())}")
+            print(f"[salesnav] got items={n_items} cursor={cursor!r}")
+            if "paging" in data:
                 print("[salesnav] paging:", data.get("paging"))
 
-        if not items:
+        if not n_items:
+            reached_end = True
             break
 
+        next_cursor = _extract_next_cursor(data)
+        fingerprint = _page_fingerprint(leads, data) if track_pages else None
+
+        if checking:
+            if fingerprints.get(page_index) == fingerprint:
+                for lead in leads:
+                    if lead.profile_url not in seen_profile_urls:
+                        seen_profile_urls.add(lead.profile_url)
+                        unchanged_urls.append(lead.profile_url)
+                if page_index + 1 >= fingerprint_pages or not next_cursor:
+                    print(f"[salesnav] list unchanged ({page_index + 1} page(s) match); skipping full sync")
+                    return upserted
+                cursor = next_cursor
+                page_index += 1
+                continue
+
+            # Changed: fall through to a full sync. Pages we already skipped were
+            # unchanged, so just mark their leads as seen instead of refetching them.
+            print(f"[salesnav] page {page_index} changed; running full sync")
+            checking = False
+            if unchanged_urls:
+                _touch_targets(unchanged_urls, synced_at, campaign_id)
+                upserted += len(unchanged_urls)
+
         with get_db() as (conn, cur):
-            for it in items:
+            # Leads we already resolved don't need another /users lookup.
+            cur.execute(
+                """
+                SELECT profile_url FROM targets
+                WHERE profile_url = ANY(%s) AND person_identifier IS NOT NULL
+                """,
+                ([lead.profile_url for lead in leads],),
+            )
+            already_resolved = {row["profile_url"] for row in cur.fetchall()}
+
+            page_urls = []
+            for lead in leads:
                 if upserted >= max_people:
+                    capped = True
                     break
-                if not isinstance(it, dict):
-                    continue
-
-                # Unipile sometimes returns these with different keys
-                profile_url = it.get("profile_url") or it.get("profileUrl") or it.get("url")
-                name = (it.get("name") or it.get("full_name") or it.get("fullName") or "").strip() or None
-                public_identifier = it.get("public_identifier") or it.get("publicIdentifier") or None
 
-                if not profile_url or profile_url in seen_profile_urls:
+                profile_url = lead.profile_url
+                salesnav_lead_id = lead.salesnav_lead_id
+                if profile_url in seen_profile_urls:
                     continue
                 seen_profile_urls.add(profile_url)
-
-                # Extract Sales Nav lead id (ACw...) from the item or URL
-                salesnav_lead_id = extract_salesnav_lead_id(it) or extract_salesnav_lead_id(profile_url)
+                page_urls.append(profile_url)
 
                 # Resolve to provider id (often ACo...) — this is what posts endpoint tends to accept.
                 person_identifier = None
-                if resolve_identifiers and salesnav_lead_id:
-                    try:
+                if resolve_identifiers and salesnav_lead_id and profile_url not in already_resolved:
+                    read_account = account_id
+                    if read_pool is not None:
+                        read_account = read_pool.for_key(salesnav_lead_id)
+                        read_pool.acquire(read_account)
+                    else:
                         _sleep(0.6, 1.4)
+                    try:
                         person_identifier = resolve_salesnav_lead_to_profile_id(
                             dsn=dsn,
                             api_key=api_key,
-                            account_id=account_id,
+                            account_id=read_account,
                             salesnav_lead_id=salesnav_lead_id,
                             debug=debug,
                         )
+                        if read_pool is not None:
+                            read_pool.report_success(read_account)
+                    except breaker.CircuitOpenError:
+                        raise
                     except Exception as e:
+                        if read_pool is not None:
+                            read_pool.report_failure(read_account, getattr(getattr(e, "response", None), "status_code", None))
                         if debug:
                             print("[salesnav] resolve failed:", salesnav_lead_id, repr(e))
 
@@ -117,31 +348,62 @@ def sync_salesnav_list(
                 # NOTE: this assumes you add salesnav_lead_id column (recommended).
                 cur.execute(
                     """
-                    INSERT INTO targets(profile_url, linkedin_urn, salesnav_lead_id, person_identifier, name, public_identifier)
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                    INSERT INTO targets(profile_url, linkedin_urn, salesnav_lead_id, person_identifier, name, public_identifier, last_synced_at, removed_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, NULL)
                     ON CONFLICT (profile_url) DO UPDATE SET
                         linkedin_urn=COALESCE(EXCLUDED.linkedin_urn, targets.linkedin_urn),
                         salesnav_lead_id=COALESCE(EXCLUDED.salesnav_lead_id, targets.salesnav_lead_id),
                         person_identifier=COALESCE(EXCLUDED.person_identifier, targets.person_identifier),
                         name=COALESCE(EXCLUDED.name, targets.name),
-                        public_identifier=COALESCE(EXCLUDED.public_identifier, targets.public_identifier)
+                        public_identifier=COALESCE(EXCLUDED.public_identifier, targets.public_identifier),
+                        last_synced_at=EXCLUDED.last_synced_at,
+                        removed_at=NULL
                     """,
                     (
                         profile_url,
-                        str(it.get("urn") or it.get("linkedin_urn") or it.get("id") or "") or None,
+                        lead.urn,
                         salesnav_lead_id,
                         person_identifier,
-                        name,
-                        public_identifier,
+                        lead.name,
+                        lead.public_identifier,
+                        synced_at,
                     ),
                 )
 
                 upserted += 1
 
+            if campaign_id is not None and page_urls:
+                _upsert_membership(cur, campaign_id, page_urls, synced_at)
+
+            if track_pages:
+                cur.execute(
+                    """
+                    INSERT INTO salesnav_pages(salesnav_url, page_index, fingerprint, item_count, fetched_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (salesnav_url, page_index) DO UPDATE SET
+                        fingerprint=EXCLUDED.fingerprint,
+                        item_count=EXCLUDED.item_count,
+                        fetched_at=EXCLUDED.fetched_at
+                    """,
+                    (salesnav_url, page_index, fingerprint, n_items, synced_at),
+                )
+
             conn.commit()
 
-        cursor = _extract_next_cursor(data) if isinstance(data, dict) else None
+        cursor = next_cursor
+        page_index += 1
+        if on_page:
+            on_page(cursor, upserted)
         if not cursor:
+            reached_end = True
             break
 
-    return upserted
\ No newline at end of file
+    # Only a pass that saw the whole list can tell which leads were removed from it; one
+    # capped by max_people still counts as the full sync (its pages are fingerprinted).
+    if track_pages:
+        complete = reached_end and not capped
+        removed = _finish_full_sync(salesnav_url, synced_at, page_index, campaign_id, complete=complete)
+        if removed:
+            print(f"[salesnav] flagged {removed} targets no longer on the list as removed")
+
+    return upserted
@@ -0,0 +1,248 @@
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import numpy as np
+
+from db import get_db
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#'-]*")
+
+
+def _env_floats(name: str, default: str) -> list[float]:
+    return [float(x) for x in os.getenv(name, default).split(",")]
+
+
+def topics_from_env() -> list[str]:
+    """SCORING_TOPICS: comma-separated keywords/phrases the reviewers care about."""
+    return [t.strip().lower() for t in os.getenv("SCORING_TOPICS", "").split(",") if t.strip()]
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def recency_scores(posted_at: np.ndarray, now: float, half_life_days: float) -> np.ndarray:
+    """exp decay on post age; undated posts (NaN) score as if they were one half-life old."""
+    age_days = (now - posted_at) / 86400.0
+    age_days = np.where(np.isnan(age_days), half_life_days, np.clip(age_days, 0, None))
+    return np.exp2(-age_days / half_life_days)
+
+
+class TopicCorpus(NamedTuple):
+    """Pool-wide statistics topic scores are computed against (see score_eligible_posts)."""
+    terms: list[str]
+    df: list[int]
+    docs: int
+    top: float
+
+
+def _topic(texts: list[str], topics: list[str], corpus: TopicCorpus | None = None) -> tuple[np.ndarray, TopicCorpus | None]:
+    n = len(texts)
+    terms = {}
+    for topic in topics:
+        for tok in tokenize(topic):
+            terms.setdefault(tok, len(terms))
+    if not terms:
+        return np.zeros(n), None
+
+    rows, cols = [], []
+    lengths = np.empty(n)
+    for i, text in enumerate(texts):
+        toks = tokenize(text)
+        lengths[i] = len(toks)
+        for tok in toks:
+            j = terms.get(tok)
+            if j is not None:
+                rows.append(i)
+                cols.append(j)
+
+    tf = np.zeros((n, len(terms)))
+    np.add.at(tf, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    if corpus is None:
+        df = np.count_nonzero(tf, axis=0)
+        docs = n
+    else:
+        df = np.asarray(corpus.df, dtype=float)
+        docs = corpus.docs
+    idf = np.log((1 + docs) / (1 + df)) + 1.0
+    raw = (tf * idf).sum(axis=1) / np.sqrt(np.maximum(lengths, 1.0))
+    if corpus is None:
+        corpus = TopicCorpus(list(terms), [int(x) for x in df], n, float(raw.max()) if n else 0.0)
+    if corpus.top <= 0:
+        return raw, corpus
+    return np.minimum(raw / corpus.top, 1.0), corpus
+
+
+def topic_scores(texts: list[str], topics: list[str], corpus: TopicCorpus | None = None) -> np.ndarray:
+    """
+    TF-IDF match of every post against the topic terms, in one pass: term counts go into
+    a (posts x terms) matrix, IDF comes from the same corpus, rows are length-normalized
+    and the result is scaled to [0, 1]. With `corpus` (from a full pass over the pool),
+    IDF and scale come from it instead, so a few new posts score like the rest.
+    """
+    if not texts or not topics:
+        return np.zeros(len(texts))
+    return _topic(texts, topics, corpus)[0]
+
+
+def author_scores(person_ids: list, history: dict) -> np.ndarray:
+    """
+    Smoothed approval rate of each author's past reviews ((posted + 1) / (handled + 2)),
+    so authors without history sit at 0.5.
+    """
+    posted = np.array([history.get(p, (0, 0))[0] for p in person_ids], dtype=float)
+    handled = np.array([history.get(p, (0, 0))[1] for p in person_ids], dtype=float)
+    return (posted + 1.0) / (handled + 2.0)
+
+
+_ELIGIBLE = """
+    NOT EXISTS (SELECT 1 FROM comments c WHERE c.social_id = p.social_id)
+    AND NOT EXISTS (SELECT 1 FROM pending_reviews pr WHERE pr.social_id = p.social_id)
+    AND NOT EXISTS (SELECT 1 FROM handled_posts h WHERE h.social_id = p.social_id)
+"""
+
+
+def _load_corpus(cur, config: str) -> TopicCorpus | None:
+    """Corpus stats of the last full pass, if it was made with the same `config` and is recent enough."""
+    cur.execute(
+        """
+        SELECT terms, df, docs, top_raw FROM scoring_stats
+        WHERE config = %s AND computed_at >= NOW() - make_interval(secs => %s)
+        """,
+        (config, float(os.getenv("SCORING_FULL_EVERY_HOURS", "24")) * 3600),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return TopicCorpus(row["terms"], row["df"], row["docs"], row["top_raw"])
+
+
+def _save_corpus(cur, config: str, corpus: TopicCorpus | None) -> None:
+    corpus = corpus or TopicCorpus([], [], 0, 0.0)
+    cur.execute(
+        """
+        INSERT INTO scoring_stats(id, config, terms, df, docs, top_raw, computed_at)
+        VALUES (TRUE, %s, %s, %s, %s, %s, NOW())
+        ON CONFLICT (id) DO UPDATE SET
+            config=EXCLUDED.config, terms=EXCLUDED.terms, df=EXCLUDED.df,
+            docs=EXCLUDED.docs, top_raw=EXCLUDED.top_raw, computed_at=EXCLUDED.computed_at
+        """,
+        (config, corpus.terms, corpus.df, corpus.docs, corpus.top),
+    )
+
+
+def score_eligible_posts(
+    topics: list[str] | None = None,
+    weights: list[float] | None = None,
+    half_life_days: float | None = None,
+    full: bool = False,
+) -> int:
+    """
+    Scores eligible post_pool rows in bulk into `post_scores`, which the picker orders
+    by. score = w_recency * recency + w_topic * topic + w_author * author.
+
+    Only posts that are new or whose text changed since they were scored (post_texts
+    rewrites a post's text only when its hash changes) are scored, against the corpus
+    stats (topic IDF and scale) of the last full pass, so a refresh that re-sees
+    unchanged posts rewrites nothing. A full pass -- `full`, no stats yet, changed
+    topics/weights, stats older than SCORING_FULL_EVERY_HOURS (default 24), or new posts
+    matching topics when the last full pass matched none (no scale to put them on) --
+    rescores everything (recency and author history move for old posts too) and drops
+    scores of posts no longer eligible. Returns how many posts were scored.
+
+    SCORING_TOPICS          topic keywords (comma-separated); no topics -> topic term is 0
+    SCORING_WEIGHTS         recency,topic,author weights (default 0.3,0.5,0.2)
+    SCORING_HALF_LIFE_DAYS  recency half-life (default 7)
+    """
+    topics = topics_from_env() if topics is None else topics
+    w_recency, w_topic, w_author = weights or _env_floats("SCORING_WEIGHTS", "0.3,0.5,0.2")
+    half_life_days = half_life_days or float(os.getenv("SCORING_HALF_LIFE_DAYS", "7"))
+    config = json.dumps([topics, [w_recency, w_topic, w_author], half_life_days])
+
+    rescore = False
+    with get_db() as (conn, cur):
+        corpus = None if full else _load_corpus(cur, config)
+        if corpus is not None and topics and not corpus.terms:
+            corpus = None  # saved by a pass over an empty pool: no stats to score against
+        full = corpus is None
+        cur.execute(
+            f"""
+            SELECT p.social_id, p.person_identifier, pt.post_text,
+                   EXTRACT(EPOCH FROM p.post_created_at) AS posted_ts
+            FROM post_pool p
+            LEFT JOIN post_texts pt ON pt.social_id = p.social_id
+            WHERE {_ELIGIBLE}
+              AND (%(full)s OR NOT EXISTS (
+                SELECT 1 FROM post_scores s
+                WHERE s.social_id = p.social_id AND (pt.updated_at IS NULL OR s.scored_at >= pt.updated_at)
+              ))
+            """,
+            {"full": full},
+        )
+        rows = cur.fetchall()
+        if full:
+            # scores of posts that were commented/queued/handled or left the pool
+            cur.execute(
+                f"""
+                DELETE FROM post_scores s
+                WHERE NOT EXISTS (SELECT 1 FROM post_pool p WHERE p.social_id = s.social_id AND {_ELIGIBLE})
+                """
+            )
+        if not rows:
+            if full:
+                _save_corpus(cur, config, None)
+            conn.commit()
+            return 0
+
+        cur.execute(
+            """
+            SELECT p.person_identifier,
+                   COUNT(*) FILTER (WHERE h.status = 'posted') AS posted,
+                   COUNT(*) FILTER (WHERE h.status IN ('posted', 'skipped')) AS handled
+            FROM handled_posts h
+            JOIN post_pool p ON p.social_id = h.social_id
+            WHERE p.person_identifier = ANY(%s)
+            GROUP BY p.person_identifier
+            """,
+            (list({r["person_identifier"] for r in rows if r["person_identifier"]}),),
+        )
+        history = {r["person_identifier"]: (r["posted"], r["handled"]) for r in cur.fetchall()}
+
+        posted_at = np.array(
+            [float(r["posted_ts"]) if r["posted_ts"] is not None else np.nan for r in rows]
+        )
+        recency = recency_scores(posted_at, datetime.now(timezone.utc).timestamp(), half_life_days)
+        texts = [r["post_text"] or "" for r in rows]
+        if topics:
+            topic, new_corpus = _topic(texts, topics, corpus)
+            if not full and corpus.top <= 0 and topic.max() > 0:
+                # the last full pass matched no topic at all, so these scores have no
+                # scale to go on: rescore everything instead of storing them unscaled
+                conn.rollback()
+                rescore = True
+        else:
+            topic, new_corpus = np.zeros(len(rows)), None
+        if not rescore:
+            author = author_scores([r["person_identifier"] for r in rows], history)
+            score = w_recency * recency + w_topic * topic + w_author * author
+
+            cur.execute(
+                """
+                INSERT INTO post_scores(social_id, score, recency, topic, author, scored_at)
+                SELECT s, sc, r, t, a, NOW()
+                FROM unnest(%s::text[], %s::float8[], %s::float8[], %s::float8[], %s::float8[]) AS u(s, sc, r, t, a)
+                ON CONFLICT (social_id) DO UPDATE SET
+                    score=EXCLUDED.score, recency=EXCLUDED.recency, topic=EXCLUDED.topic,
+                    author=EXCLUDED.author, scored_at=EXCLUDED.scored_at
+                """,
+                ([r["social_id"] for r in rows], score.tolist(), recency.tolist(), topic.tolist(), author.tolist()),
+            )
+            if full:
+                _save_corpus(cur, config, new_corpus)
+            conn.commit()
+    if rescore:
+        return score_eligible_posts(topics, [w_recency, w_topic, w_author], half_life_days, full=True)
+    return len(rows)
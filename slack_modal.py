@@ -1,13 +1,18 @@
-import requests
+import os
 import json
 
+import http_client
+import metrics
+
+SLACK_API = os.getenv("SLACK_API_URL", "https://slack.com/api").rstrip("/")
+
 def open_edit_modal(
     slack_token: str,
     trigger_id: str,
     social_id: str,
     original_comment: str
 ) -> None:
-    url = "https://slack.com/api/views.open"
+    url = f"{SLACK_API}/views.open"
     headers = {
         "Authorization": f"Bearer {slack_token}",
         "Content-Type": "application/json; charset=utf-8",
@@ -38,9 +43,10 @@ def open_edit_modal(
         },
     }
 
-    r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
+    r = http_client.post(url, service="slack", function="views.open", headers=headers, data=json.dumps(payload), timeout=30)
     r.raise_for_status()
     data = r.json()
     if not data.get("ok"):
+        metrics.count_error("slack", "views.open", "api_error")
         print("[slack/modal] views.open response:", data)
         raise RuntimeError(f"Slack views.open failed: {data}")
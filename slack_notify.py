@@ -1,6 +1,19 @@
-import requests
+import os
 import json
 
+import http_client
+import metrics
+
+SLACK_API = os.getenv("SLACK_API_URL", "https://slack.com/api").rstrip("/")
+
+def _confirm(text: str, confirm: str) -> dict:
+    return {
+        "title": {"type": "plain_text", "text": "Are you sure?"},
+        "text": {"type": "plain_text", "text": text},
+        "confirm": {"type": "plain_text", "text": confirm},
+        "deny": {"type": "plain_text", "text": "Cancel"},
+    }
+
 def send_for_review(
     token: str,
     user_id: str,
@@ -10,10 +23,11 @@ def send_for_review(
     comment: str
 ) -> tuple[str | None, str | None]:
     """
-    Sends a Slack DM with Approve / Edit / Skip buttons.
+    Sends a Slack DM with Approve / Edit / Skip buttons, plus Approve all remaining /
+    Skip all remaining (bulk_actions.py) behind a confirmation.
     Returns (channel_id, message_ts) if successful.
     """
-    url = "https://slack.com/api/chat.postMessage"
+    url = f"{SLACK_API}/chat.postMessage"
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json; charset=utf-8",
@@ -43,14 +57,48 @@ def send_for_review(
                 {"type": "button","text": {"type": "plain_text","text": "Skip"},"style": "danger","value": social_id,"action_id": "skip_comment"},
             ],
         },
+        {
+            "type": "actions",
+            "block_id": f"bulk_{social_id}",
+            "elements": [
+                {"type": "button","text": {"type": "plain_text","text": "Approve all remaining"},"value": social_id,"action_id": "approve_all",
+                 "confirm": _confirm("Post every comment still waiting for review here?", "Approve all")},
+                {"type": "button","text": {"type": "plain_text","text": "Skip all remaining"},"value": social_id,"action_id": "skip_all",
+                 "confirm": _confirm("Skip every post still waiting for review here?", "Skip all")},
+            ],
+        },
     ]
 
     payload = {"channel": user_id, "text": "Review LinkedIn comment", "blocks": blocks}
 
-    r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
+    r = http_client.post(url, service="slack", function="chat.postMessage", headers=headers, data=json.dumps(payload), timeout=30)
     r.raise_for_status()
     data = r.json()
     if not data.get("ok"):
+        metrics.count_error("slack", "chat.postMessage", "api_error")
         raise RuntimeError(f"Slack chat.postMessage failed: {data}")
 
-    return data.get("channel"), data.get("ts")
\ No newline at end of file
+    return data.get("channel"), data.get("ts")
+
+def update_message(token: str, channel: str, ts: str, text: str) -> bool:
+    """Replaces a review message (and its buttons) with `text`. Returns False on failure."""
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json; charset=utf-8",
+    }
+    payload = {
+        "channel": channel,
+        "ts": ts,
+        "text": text,
+        "blocks": [{"type": "section", "text": {"type": "mrkdwn", "text": text}}],
+    }
+    r = http_client.post(f"{SLACK_API}/chat.update", service="slack", function="chat.update", headers=headers, data=json.dumps(payload), timeout=20)
+    if not r.ok:
+        print("[slack] chat.update HTTP error:", r.status_code, r.text[:800])
+        return False
+    data = r.json()
+    if not data.get("ok"):
+        metrics.count_error("slack", "chat.update", "api_error")
+        print("[slack] chat.update failed:", data)
+        return False
+    return True
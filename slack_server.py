@@ -1,72 +1,177 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager, nullcontext
+import contextvars
 import json
 import os
+import sys
+import time
 from datetime import datetime, timezone
 import threading
 import traceback
-import requests
 
-from db import get_db
-from unipile import comment_on_post
-from slack_modal import open_edit_modal
+import metrics
+import profiling
+import tracing
 
-app = FastAPI()
+# Cold start: db (psycopg), http_client (requests), unipile and slack_modal are imported
+# inside the handlers that need them, and preloaded by _warmup() in the background once
+# the server is up. check_import_time.py keeps this import cheap.
 
-SLACK_API = "https://slack.com/api"
+SLACK_API = os.getenv("SLACK_API_URL", "https://slack.com/api").rstrip("/")
 
-import threading
-import traceback
+_ready = threading.Event()
+_warmup_s: float | None = None
 
-def _run_in_thread(fn, *args, **kwargs):
-    t = threading.Thread(target=fn, args=args, kwargs=kwargs, daemon=True)
-    t.start()
 
-def _edit_submit_worker(social_id: str, edited_comment: str):
+def _warmup():
+    """
+    Imports the heavy modules, opens the DB pool and pre-connects the Slack/Unipile
+    sessions. Retries until the DB is reachable; /healthz reports ready afterwards.
+    """
+    global _warmup_s
+    t0 = time.perf_counter()
+    delay = 1.0
+    while True:
+        try:
+            import db
+            import http_client
+            import unipile
+            import slack_modal  # noqa: F401
+            import slack_notify  # noqa: F401
+
+            db.init_pool()
+            with db.get_db() as (conn, cur):
+                cur.execute("SELECT 1")
+            http_client.warm("slack", f"{SLACK_API}/api.test")
+            if os.getenv("UNIPILE_DSN"):
+                http_client.warm("unipile", unipile.normalize_dsn(os.environ["UNIPILE_DSN"]))
+            break
+        except Exception as e:
+            print(f"[warmup] failed, retrying in {delay:.0f}s:", repr(e))
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+    _warmup_s = time.perf_counter() - t0
+    _ready.set()
+    print(f"[warmup] ready in {_warmup_s:.2f}s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In a thread so the port opens right away; Slack clicks arriving before warmup
+    # finishes still work, they just pay the imports/connects themselves.
+    threading.Thread(target=_warmup, name="warmup", daemon=True).start()
+    yield
+    if "db" in sys.modules:
+        sys.modules["db"].close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+if profiling.web_sample_rate() > 0:
+    @app.middleware("http")
+    async def profile_sampled_actions(request: Request, call_next):
+        """
+        Profiles PROFILE_WEB_SAMPLE of /slack/actions requests; the worker thread a
+        sampled request starts is profiled too (see _run_in_thread). Other requests
+        handled on the event loop meanwhile show up in the request's profile; one
+        request is profiled at a time (a sampled request arriving meanwhile isn't).
+        """
+        if request.url.path != "/slack/actions":
+            return await call_next(request)
+        with profiling.web_slot() as sampled:
+            if not sampled:
+                return await call_next(request)
+            token = profiling.request_sampled.set(True)
+            try:
+                with profiling.profiled("slack_actions", profiling.web_kind()):
+                    return await call_next(request)
+            finally:
+                profiling.request_sampled.reset(token)
+
+if tracing.enabled():
+    @app.middleware("http")
+    async def trace_actions(request: Request, call_next):
+        """
+        Root span of a Slack interaction. The handler tags it with the action and
+        social_id; the worker thread it starts continues the trace (_run_in_thread).
+        """
+        if request.url.path != "/slack/actions":
+            return await call_next(request)
+        with tracing.span("slack.actions", **{"http.route": request.url.path}) as span:
+            response = await call_next(request)
+            span.set("http.status_code", response.status_code)
+            return response
+
+
+def _trace_action(action: str, social_id: str | None) -> None:
+    span = tracing.current()
+    if span is not None:
+        span.set("slack.action", action)
+        span.set("social_id", social_id)
+
+
+def _edit_submit_worker(social_id: str, edited_comment: str, submitted_at: float | None = None):
+    import bulk_actions
+    from db import get_db
+    from unipile import comment_on_post
+
+    row, posted = None, False
     try:
-        with get_db() as (conn, cur):
-            cur.execute(
-                "SELECT slack_channel, slack_ts FROM pending_reviews WHERE social_id=%s",
-                (social_id,),
+        # claimed first, so a review that's being posted (Approve, Approve all) isn't posted twice
+        row = bulk_actions.claim_review(social_id)
+        if not row:
+            print(tracing.log_tag("edit_submit"), "already handled or being posted:", social_id)
+            return
+        slack_channel = row["slack_channel"]
+        slack_ts = row["slack_ts"]
+
+        if os.getenv("DRY_RUN") == "1":
+            print(f"[DRY_RUN] Would comment on {social_id}: {edited_comment[:200]}")
+        else:
+            comment_on_post(
+                os.environ["UNIPILE_DSN"],
+                os.environ["UNIPILE_ACCOUNT_ID"],
+                os.environ["UNIPILE_API_KEY"],
+                social_id,
+                edited_comment,
+                debug=True,
             )
-            row = cur.fetchone()
-            slack_channel = row.get("slack_channel") if row else None
-            slack_ts = row.get("slack_ts") if row else None
-
-            if os.getenv("DRY_RUN") == "1":
-                print(f"[DRY_RUN] Would comment on {social_id}: {edited_comment[:200]}")
-            else:
-                comment_on_post(
-                    os.environ["UNIPILE_DSN"],
-                    os.environ["UNIPILE_ACCOUNT_ID"],
-                    os.environ["UNIPILE_API_KEY"],
-                    social_id,
-                    edited_comment,
-                    debug=True,
+            if submitted_at:
+                metrics.CLICK_TO_COMMENT.labels("edit_submit").observe(time.time() - submitted_at)
+        posted = True
+        bulk_actions.mark_posted(row, edited_comment)
+
+        def record():
+            with get_db() as (conn, cur):
+                cur.execute(
+                    """
+                    INSERT INTO comments(social_id, comment_text, commented_at, campaign_id)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (social_id) DO UPDATE
+                    SET comment_text = EXCLUDED.comment_text,
+                        commented_at = EXCLUDED.commented_at,
+                        campaign_id = COALESCE(EXCLUDED.campaign_id, comments.campaign_id)
+                    """,
+                    (social_id, edited_comment, _utc_now(), row["campaign_id"]),
                 )
+                cur.execute("DELETE FROM pending_reviews WHERE social_id=%s", (social_id,))
+                conn.commit()
 
-            cur.execute(
-                """
-                INSERT INTO comments(social_id, comment_text, commented_at)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (social_id) DO UPDATE
-                SET comment_text = EXCLUDED.comment_text,
-                    commented_at = EXCLUDED.commented_at
-                """,
-                (social_id, edited_comment, _utc_now()),
-            )
-            cur.execute("DELETE FROM pending_reviews WHERE social_id=%s", (social_id,))
-            conn.commit()
+        bulk_actions.retrying("recording edit_submit", record)
 
         # ✅ Update Slack message to remove buttons
         if slack_channel and slack_ts:
             slack_update_message(slack_channel, slack_ts, "✅ Posted (edited). (removed from queue)")
         else:
-            print("[edit_submit] missing slack_channel/ts for", social_id)
+            print(tracing.log_tag("edit_submit"), "missing slack_channel/ts for", social_id)
 
     except Exception as e:
-        print("[edit_submit] ERROR:", repr(e))
+        print(tracing.log_tag("edit_submit"), "ERROR:", repr(e))
         print(traceback.format_exc())
+        if row and not posted:
+            _release_after_error(row)
 
 
 def _utc_now():
@@ -77,137 +182,209 @@ def _ack_ok():
     return JSONResponse({"ok": True})
 
 
-def slack_headers():
-    return {
-        "Authorization": f"Bearer {os.environ['SLACK_BOT_TOKEN']}",
-        "Content-Type": "application/json; charset=utf-8",
-    }
-
-
-def slack_update_message(channel: str, ts: str, text: str):
-    payload = {
-        "channel": channel,
-        "ts": ts,
-        "text": text,
-        "blocks": [{"type": "section", "text": {"type": "mrkdwn", "text": text}}],
-    }
-    r = requests.post(
-        f"{SLACK_API}/chat.update",
-        headers=slack_headers(),
-        data=json.dumps(payload),
-        timeout=20,
-    )
-    if not r.ok:
-        print("[slack] chat.update HTTP error:", r.status_code, r.text[:800])
-        return
-    data = r.json()
-    if not data.get("ok"):
-        print("[slack] chat.update failed:", data)
+def slack_update_message(channel: str, ts: str, text: str) -> bool:
+    """slack_notify.update_message with the bot token (imported here: it pulls in http_client)."""
+    from slack_notify import update_message
+
+    return update_message(os.environ["SLACK_BOT_TOKEN"], channel, ts, text)
+
+
+def _update_after_error(channel: str, ts: str, text: str):
+    """slack_update_message for except handlers: Slack being down (circuit open) must not escape them."""
+    try:
+        slack_update_message(channel, ts, text)
+    except Exception as e:
+        print("[slack] chat.update after error failed:", repr(e))
 
 
 def _run_in_thread(fn, *args, **kwargs):
-    t = threading.Thread(target=fn, args=args, kwargs=kwargs, daemon=True)
+    gauge = metrics.WORKER_INFLIGHT.labels(fn.__name__)
+    gauge.inc()
+    sampled = profiling.request_sampled.get()
+    # the thread runs in a copy of the request's context, so it continues its trace
+    ctx = contextvars.copy_context()
+
+    def _target():
+        try:
+            with profiling.profiled(fn.__name__.strip("_"), profiling.web_kind()) if sampled else nullcontext():
+                with tracing.span(f"worker.{fn.__name__.strip('_')}"):
+                    fn(*args, **kwargs)
+        finally:
+            gauge.dec()
+
+    t = threading.Thread(target=ctx.run, args=(_target,), daemon=True)
     t.start()
 
 
+def _clicked_at(payload: dict) -> float | None:
+    """Slack's action_ts (epoch seconds) of the button click, if present."""
+    try:
+        return float((payload.get("actions") or [{}])[0].get("action_ts"))
+    except (TypeError, ValueError):
+        return None
+
+
 def _get_channel_and_ts(payload: dict):
     channel_id = (payload.get("channel") or {}).get("id")
     message_ts = (payload.get("message") or {}).get("ts")
     return channel_id, message_ts
 
 
+def _release_after_error(row: dict):
+    """Puts a claimed review back to pending after its post failed; a lost claim times out anyway."""
+    import bulk_actions
+
+    try:
+        bulk_actions.release_review(row)
+    except Exception as e:
+        print("[release] failed for", row["social_id"], repr(e))
+
+
 def _approve_worker(payload: dict, social_id: str):
     """Runs after Slack ACK to avoid 3-second timeout."""
+    import bulk_actions
+    from db import get_db
+    from unipile import comment_on_post
+
     channel_id, message_ts = _get_channel_and_ts(payload)
 
+    row, posted = None, False
     try:
-        with get_db() as (conn, cur):
-            cur.execute(
-                "SELECT generated_comment FROM pending_reviews WHERE social_id=%s",
-                (social_id,),
-            )
-            row = cur.fetchone()
-            if not row:
-                print("[approve] No pending review found for", social_id)
-                if channel_id and message_ts:
-                    slack_update_message(channel_id, message_ts, f"⚠️ Already handled (no pending row).")
+        # claim it (status 'posting'): a second click, Edit, Skip or "Approve all remaining"
+        # arriving meanwhile finds it taken
+        row = bulk_actions.claim_review(social_id)
+        if not row:
+            if bulk_actions.review_exists(social_id):
+                # being posted (Approve all, another click): that poster updates the card
+                print(tracing.log_tag("approve"), "already being posted:", social_id)
                 return
+            print(tracing.log_tag("approve"), "No pending review found for", social_id)
+            if channel_id and message_ts:
+                slack_update_message(channel_id, message_ts, f"⚠️ Already handled (no pending row).")
+            return
 
-            comment_text = row["generated_comment"] or ""
-            print(f"[approve] social_id={social_id!r} dry_run={os.getenv('DRY_RUN')} preview={comment_text[:160]!r}")
-
-            if os.getenv("DRY_RUN") == "1":
-                print(f"[DRY_RUN] Would comment on {social_id}: {comment_text[:200]}")
-            else:
-                comment_on_post(
-                    os.environ["UNIPILE_DSN"],
-                    os.environ["UNIPILE_ACCOUNT_ID"],
-                    os.environ["UNIPILE_API_KEY"],
-                    social_id,
-                    comment_text,
-                    debug=True,
-                )
+        comment_text = row["generated_comment"] or ""
+        print(tracing.log_tag("approve"), f"social_id={social_id!r} dry_run={os.getenv('DRY_RUN')} preview={comment_text[:160]!r}")
 
-            # record comment + remove pending
-            cur.execute(
-                """
-                INSERT INTO comments(social_id, comment_text, commented_at)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (social_id) DO UPDATE
-                SET comment_text = EXCLUDED.comment_text,
-                    commented_at = EXCLUDED.commented_at
-                """,
-                (social_id, comment_text, _utc_now()),
-            )
-            cur.execute(
-                "INSERT INTO handled_posts(social_id, status) VALUES (%s, %s) "
-                "ON CONFLICT (social_id) DO UPDATE SET status=EXCLUDED.status, handled_at=NOW()",
-                (social_id, "posted"),
+        if os.getenv("DRY_RUN") == "1":
+            print(f"[DRY_RUN] Would comment on {social_id}: {comment_text[:200]}")
+        else:
+            comment_on_post(
+                os.environ["UNIPILE_DSN"],
+                os.environ["UNIPILE_ACCOUNT_ID"],
+                os.environ["UNIPILE_API_KEY"],
+                social_id,
+                comment_text,
+                debug=True,
             )
-            cur.execute("DELETE FROM pending_reviews WHERE social_id=%s", (social_id,))
-            conn.commit()
+            clicked_at = _clicked_at(payload)
+            if clicked_at:
+                metrics.CLICK_TO_COMMENT.labels("approve").observe(time.time() - clicked_at)
+        posted = True
+        bulk_actions.mark_posted(row, comment_text)
+
+        # record comment + remove pending
+        def record():
+            with get_db() as (conn, cur):
+                cur.execute(
+                    """
+                    INSERT INTO comments(social_id, comment_text, commented_at, campaign_id)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (social_id) DO UPDATE
+                    SET comment_text = EXCLUDED.comment_text,
+                        commented_at = EXCLUDED.commented_at,
+                        campaign_id = COALESCE(EXCLUDED.campaign_id, comments.campaign_id)
+                    """,
+                    (social_id, comment_text, _utc_now(), row["campaign_id"]),
+                )
+                cur.execute(
+                    "INSERT INTO handled_posts(social_id, status) VALUES (%s, %s) "
+                    "ON CONFLICT (social_id) DO UPDATE SET status=EXCLUDED.status, handled_at=NOW()",
+                    (social_id, "posted"),
+                )
+                cur.execute("DELETE FROM pending_reviews WHERE social_id=%s", (social_id,))
+                conn.commit()
+
+        bulk_actions.retrying("recording approve", record)
 
         # UX: remove buttons / mark done
         if channel_id and message_ts:
             slack_update_message(channel_id, message_ts, "✅ Posted. (removed from queue)")
 
     except Exception as e:
-        print("[approve] ERROR:", repr(e))
+        print(tracing.log_tag("approve"), "ERROR:", repr(e))
         print(traceback.format_exc())
-        if channel_id and message_ts:
-            slack_update_message(channel_id, message_ts, f"❌ Failed to post (server error). Try again.")
+        if row and not posted:
+            _release_after_error(row)
+        if channel_id and message_ts and not posted:
+            _update_after_error(channel_id, message_ts, f"❌ Failed to post (server error). Try again.")
 
 
 def _skip_worker(payload: dict, social_id: str):
     """Skip should update DB + update Slack message."""
+    import bulk_actions
+
     channel_id, message_ts = _get_channel_and_ts(payload)
 
     try:
-        with get_db() as (conn, cur):
-            cur.execute(
-                "INSERT INTO handled_posts(social_id, status) VALUES (%s, %s) "
-                "ON CONFLICT (social_id) DO UPDATE SET status=EXCLUDED.status, handled_at=NOW()",
-                (social_id, "skipped"),
-            )
-            # Instead of delete, you *can* keep a status. If your schema has no status, delete is fine.
-            cur.execute("DELETE FROM pending_reviews WHERE social_id=%s", (social_id,))
-            conn.commit()
+        # deletes the review only if nobody is posting it
+        if not bulk_actions.skip_review(social_id):
+            if bulk_actions.review_exists(social_id):
+                # being posted: that poster updates the card
+                print(tracing.log_tag("skip"), "already being posted:", social_id)
+                return
+            print(tracing.log_tag("skip"), "No pending review found for", social_id)
+            if channel_id and message_ts:
+                slack_update_message(channel_id, message_ts, "⚠️ Already handled (no pending row).")
+            return
 
         if channel_id and message_ts:
             slack_update_message(channel_id, message_ts, "⏭️ Skipped. (removed from queue)")
 
     except Exception as e:
-        print("[skip] ERROR:", repr(e))
+        print(tracing.log_tag("skip"), "ERROR:", repr(e))
         print(traceback.format_exc())
         if channel_id and message_ts:
-            slack_update_message(channel_id, message_ts, "❌ Failed to skip. Try again.")
+            _update_after_error(channel_id, message_ts, "❌ Failed to skip. Try again.")
+
+
+def _bulk_worker(payload: dict, action_id: str):
+    """Approve all remaining / Skip all remaining for the reviewer's DM channel."""
+    import bulk_actions
+
+    channel_id, _ = _get_channel_and_ts(payload)
+    if not channel_id:
+        print(tracing.log_tag(action_id), "missing channel")
+        return
+    try:
+        if action_id == "approve_all":
+            bulk_actions.approve_all(channel_id, os.environ["SLACK_BOT_TOKEN"])
+        else:
+            bulk_actions.skip_all(channel_id, os.environ["SLACK_BOT_TOKEN"])
+    except Exception as e:
+        print(tracing.log_tag(action_id), "ERROR:", repr(e))
+        print(traceback.format_exc())
+
+
+@app.get("/healthz")
+def healthz():
+    """Readiness: 200 once the DB pool and HTTP sessions are warm, 503 before."""
+    if _ready.is_set():
+        return {"ready": True, "warmup_s": round(_warmup_s, 3)}
+    return JSONResponse({"ready": False}, status_code=503)
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
 
 
 @app.post("/slack/actions")
 async def slack_actions(req: Request):
     """
     Handles:
-      - button clicks: approve_comment, edit_comment, skip_comment
+      - button clicks: approve_comment, edit_comment, skip_comment, approve_all, skip_all
       - modal submit: callback_id=edit_comment_submit
     """
     try:
@@ -242,8 +419,9 @@ async def slack_actions(req: Request):
                 print("[slack/actions] Modal submit missing edited comment value")
                 return {"response_action": "clear"}
 
+            _trace_action("edit_comment_submit", social_id)
             # ✅ ACK immediately so Slack never times out
-            _run_in_thread(_edit_submit_worker, social_id, edited_comment)
+            _run_in_thread(_edit_submit_worker, social_id, edited_comment, time.time())
             return {"response_action": "clear"}
 
         # -----------------------
@@ -263,6 +441,7 @@ async def slack_actions(req: Request):
 
         if not action_id or not social_id:
             return _ack_ok()
+        _trace_action(action_id, social_id)
 
         # Approve/Skip should be async to avoid Slack timeout
         if action_id == "approve_comment":
@@ -273,6 +452,10 @@ async def slack_actions(req: Request):
             _run_in_thread(_skip_worker, payload, social_id)
             return _ack_ok()
 
+        if action_id in ("approve_all", "skip_all"):
+            _run_in_thread(_bulk_worker, payload, action_id)
+            return _ack_ok()
+
         if action_id == "edit_comment":
             # Open modal FAST (avoid DB before views.open).
             original_comment = ""
@@ -292,6 +475,8 @@ async def slack_actions(req: Request):
 
             # Fallback to DB only if needed (still might be slow, but rare)
             if not original_comment:
+                from db import get_db
+
                 with get_db() as (conn, cur):
                     cur.execute(
                         "SELECT generated_comment FROM pending_reviews WHERE social_id=%s",
@@ -300,6 +485,8 @@ async def slack_actions(req: Request):
                     row = cur.fetchone()
                 original_comment = (row["generated_comment"] if row else "") or ""
 
+            from slack_modal import open_edit_modal
+
             ok = open_edit_modal(
                 slack_token=os.environ["SLACK_BOT_TOKEN"],
                 trigger_id=trigger_id,
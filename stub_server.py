@@ -0,0 +1,203 @@
+"""
+Local stand-in for Unipile, Slack and Anthropic, for offline benchmarks and dry runs.
+
+    uvicorn stub_server:app --port 8900
+
+Point the app at it with:
+    UNIPILE_DSN=http://127.0.0.1:8900
+    SLACK_API_URL=http://127.0.0.1:8900/api
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8900
+
+Knobs (env):
+    STUB_LATENCY_MS       mean added latency per request (default 50)
+    STUB_JITTER_MS        +/- uniform jitter around the mean (default 25)
+    STUB_ERROR_RATE       fraction of requests answered with a 500 (default 0)
+    STUB_429_RATE         fraction answered with a 429 + Retry-After (default 0)
+    STUB_LEADS            size of the fake Sales Nav list (default 500)
+    STUB_POSTS_PER_USER   posts returned per profile (default 5)
+    STUB_SEED             RNG seed so runs are reproducible (default 1)
+"""
+import asyncio
+import hashlib
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+JITTER_MS = float(os.getenv("STUB_JITTER_MS", "25"))
+ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+RATE_429 = float(os.getenv("STUB_429_RATE", "0"))
+LEADS = int(os.getenv("STUB_LEADS", "500"))
+POSTS_PER_USER = int(os.getenv("STUB_POSTS_PER_USER", "5"))
+
+_rng = random.Random(int(os.getenv("STUB_SEED", "1")))
+_stats = Counter()
+
+app = FastAPI()
+
+
+def _lead_id(i: int) -> str:
+    return f"ACwAAStub{i:08d}"
+
+
+def _stable_int(s: str) -> int:
+    return int(hashlib.sha1(s.encode("utf-8")).hexdigest()[:12], 16)
+
+
+async def _simulate(endpoint: str):
+    """Adds latency and maybe an injected failure. Returns a response to short-circuit with."""
+    _stats[endpoint] += 1
+    delay = max(LATENCY_MS + _rng.uniform(-JITTER_MS, JITTER_MS), 0) / 1000
+    await asyncio.sleep(delay)
+    roll = _rng.random()
+    if roll < RATE_429:
+        _stats[f"{endpoint}:429"] += 1
+        return JSONResponse({"status": 429, "type": "errors/too_many_requests"}, status_code=429, headers={"Retry-After": "1"})
+    if roll < RATE_429 + ERROR_RATE:
+        _stats[f"{endpoint}:500"] += 1
+        return JSONResponse({"status": 500, "type": "errors/unexpected_error"}, status_code=500)
+    return None
+
+
+# -----------------------
+# Unipile
+# -----------------------
+
+@app.post("/api/v1/linkedin/search")
+async def linkedin_search(req: Request):
+    body = await req.json()
+    if (err := await _simulate("unipile.search")):
+        return err
+
+    url = body.get("url") or ""
+    if "/sales/search" not in url:
+        # profile URL lookup (resolver.resolve_profile_url_to_identifier)
+        return {"object": "LinkedinSearch", "items": [{"id": f"ACoAAStub{_stable_int(url) % 10**8:08d}"}]}
+
+    start = int(body.get("cursor") or 0)
+    limit = int(body.get("limit") or 50)
+    end = min(start + limit, LEADS)
+    items = [
+        {
+            "object": "SearchResult",
+            "type": "PEOPLE",
+            "id": _lead_id(i),
+            "name": f"Stub Lead {i}",
+            "public_identifier": f"stub-lead-{i}",
+            "profile_url": f"https://www.linkedin.com/sales/lead/{_lead_id(i)},NAME_SEARCH,abcd",
+        }
+        for i in range(start, end)
+    ]
+    return {
+        "object": "LinkedinSearch",
+        "items": items,
+        "paging": {"start": start, "page_count": len(items), "total_count": LEADS},
+        "cursor": str(end) if end < LEADS else None,
+    }
+
+
+@app.get("/api/v1/users/{identifier}/posts")
+async def user_posts(identifier: str, limit: int = 20):
+    if (err := await _simulate("unipile.posts")):
+        return err
+    base = _stable_int(identifier) % 10**12
+    now = datetime.now(timezone.utc)
+    items = []
+    for j in range(min(POSTS_PER_USER, limit)):
+        items.append({
+            "object": "Post",
+            "social_id": f"urn:li:activity:{7400000000000000000 + base * 100 + j}",
+            "text": f"Post {j} from {identifier}: what we learned scaling outbound to 10k emails a week. " * 4,
+            "parsed_datetime": (now - timedelta(days=j * 3)).isoformat().replace("+00:00", "Z"),
+            "date": f"{j * 3}d",
+        })
+    return {"object": "PostList", "items": items, "cursor": None}
+
+
+@app.get("/api/v1/users/{identifier}")
+async def user_profile(identifier: str):
+    if (err := await _simulate("unipile.users")):
+        return err
+    return {
+        "object": "UserProfile",
+        "provider_id": identifier.replace("ACw", "ACo", 1),
+        "provider_internal_id": identifier.replace("ACw", "ACo", 1),
+    }
+
+
+@app.post("/api/v1/posts/{social_id}/comments")
+async def post_comment(social_id: str, req: Request):
+    await req.body()
+    if (err := await _simulate("unipile.comments")):
+        return err
+    return {"object": "CommentSent"}
+
+
+# -----------------------
+# Slack
+# -----------------------
+
+@app.post("/api/chat.postMessage")
+async def chat_post_message(req: Request):
+    body = await req.json()
+    if (err := await _simulate("slack.chat.postMessage")):
+        return err
+    return {"ok": True, "channel": body.get("channel") or "D0STUB", "ts": f"{time.time():.6f}"}
+
+
+@app.post("/api/chat.update")
+async def chat_update(req: Request):
+    body = await req.json()
+    if (err := await _simulate("slack.chat.update")):
+        return err
+    return {"ok": True, "channel": body.get("channel"), "ts": body.get("ts")}
+
+
+@app.post("/api/views.open")
+async def views_open(req: Request):
+    await req.body()
+    if (err := await _simulate("slack.views.open")):
+        return err
+    return {"ok": True, "view": {"id": "V0STUB"}}
+
+
+# -----------------------
+# Anthropic
+# -----------------------
+
+@app.post("/v1/messages")
+async def anthropic_messages(req: Request):
+    body = await req.json()
+    if (err := await _simulate("anthropic.messages")):
+        return err
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model") or "stub",
+        "content": [{"type": "text", "text": "Curious how the reply rates held up once volume went past the first few thousand."}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 900, "output_tokens": 30},
+    }
+
+
+# -----------------------
+# Stub introspection
+# -----------------------
+
+@app.get("/_stub/stats")
+def stats():
+    return dict(_stats)
+
+
+@app.post("/_stub/reset")
+def reset():
+    _stats.clear()
+    return {"ok": True}
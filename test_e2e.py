@@ -9,7 +9,7 @@ from unipile import list_recent_posts
 from claude import generate_comment
 from slack_notify import send_for_review
 
-SALESNAV_URL = "https://www.linkedin.com/sales/search/people?query=(filters%3AList((type%3ALEAD_LIST%2Cvalues%3AList((id%3A7373374312965111808%2Ctext%3APodcast%2520guests%2CselectionType%3AINCLUDED)))))&viewAllFilters=true"
+SALESNAV_URL = os.environ.get("SALESNAV_URL") or "https://www.linkedin.com/sales/search/people?query=(filters%3AList((type%3ALEAD_LIST%2Cvalues%3AList((id%3A7373374312965111808%2Ctext%3APodcast%2520guests%2CselectionType%3AINCLUDED)))))&viewAllFilters=true"
 
 def human_sleep(a, b):
     time.sleep(random.uniform(a, b))
@@ -59,8 +59,8 @@ def main():
             continue
 
         p = posts[0]
-        social_id = p.get("social_id")
-        post_text = (p.get("text") or "").strip()
+        social_id = p.social_id
+        post_text = p.text
 
         if not social_id:
             print(f"[WARN] No social_id for {name}'s recent post; skipping.")
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import tracing
+
+# The timer of the run in progress (None outside daily_commenter). The record_* hooks
+# below are called from http_client/db/sleep helpers and are no-ops without one.
+_current = None
+
+# Set in worker threads that run side by side (the refresh lanes, see lane()).
+_in_lane: contextvars.ContextVar[bool] = contextvars.ContextVar("timing_in_lane", default=False)
+
+
+def _new_lanes() -> dict:
+    return {"count": 0, "wall_s": 0.0, "sleep_s": 0.0, "io_s": {}, "db_s": 0.0}
+
+
+def _new_stage() -> dict:
+    return {
+        "wall_s": 0.0, "sleep_s": 0.0, "io_s": {}, "db_s": 0.0, "db_statements": 0, "calls": {},
+        "lanes": _new_lanes(),
+    }
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    xs = sorted(values)
+
+    def pct(p):
+        # nearest-rank
+        return xs[min(len(xs) - 1, max(0, int(round(p / 100 * len(xs))) - 1))]
+
+    return {
+        "count": len(xs),
+        "p50_s": round(pct(50), 3),
+        "p90_s": round(pct(90), 3),
+        "p95_s": round(pct(95), 3),
+        "p99_s": round(pct(99), 3),
+        "max_s": round(xs[-1], 3),
+    }
+
+
+class RunTimer:
+    """
+    Collects where a daily run spends its time: wall time per stage, and within each
+    stage the time spent deliberately sleeping vs waiting on external I/O (per service)
+    vs the DB, plus call counts per service.function and per-target fetch latencies.
+
+    Time spent in lane threads (lane()) runs concurrently, so it isn't added to the
+    stage's own (wall-clock) numbers: it's reported under the stage's "lanes" in
+    lane-seconds (summed over lanes), next to the lanes' own total wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.stage_name = "setup"
+        self._stage_t0 = self._t0
+        self.stages = {"setup": _new_stage()}
+        self.fetch_latencies = []
+
+    def _close_stage(self, now: float) -> None:
+        self.stages[self.stage_name]["wall_s"] += now - self._stage_t0
+        self._stage_t0 = now
+
+    def begin_stage(self, name: str) -> None:
+        """Ends the current stage and attributes everything from now on to `name`."""
+        with self._lock:
+            self._close_stage(time.perf_counter())
+            self.stages.setdefault(name, _new_stage())
+            self.stage_name = name
+
+    def _cur(self) -> dict:
+        return self.stages[self.stage_name]
+
+    def _bucket(self, st: dict, lane: bool) -> dict:
+        return st["lanes"] if lane else st
+
+    def record_io(self, service: str, function: str, seconds: float, lane: bool = False) -> None:
+        with self._lock:
+            st = self._cur()
+            b = self._bucket(st, lane)
+            b["io_s"][service] = b["io_s"].get(service, 0.0) + seconds
+            key = f"{service}.{function}"
+            st["calls"][key] = st["calls"].get(key, 0) + 1
+
+    def record_db(self, seconds: float, lane: bool = False) -> None:
+        with self._lock:
+            st = self._cur()
+            self._bucket(st, lane)["db_s"] += seconds
+            st["db_statements"] += 1
+
+    def record_sleep(self, seconds: float, lane: bool = False) -> None:
+        with self._lock:
+            self._bucket(self._cur(), lane)["sleep_s"] += seconds
+
+    def record_lane(self, seconds: float) -> None:
+        with self._lock:
+            lanes = self._cur()["lanes"]
+            lanes["count"] += 1
+            lanes["wall_s"] += seconds
+
+    def record_fetch(self, seconds: float) -> None:
+        with self._lock:
+            self.fetch_latencies.append(seconds)
+
+    def report(self) -> dict:
+        now = time.perf_counter()
+        wall = now - self._t0
+        with self._lock:
+            self._close_stage(now)
+            stages = {}
+            for name, st in self.stages.items():
+                io_total = sum(st["io_s"].values())
+                stages[name] = {
+                    "wall_s": round(st["wall_s"], 3),
+                    "sleep_s": round(st["sleep_s"], 3),
+                    "io_s": {k: round(v, 3) for k, v in st["io_s"].items()},
+                    "db_s": round(st["db_s"], 3),
+                    "db_statements": st["db_statements"],
+                    # what's left is our own CPU (parsing, SQL building, ...)
+                    "other_s": round(max(st["wall_s"] - st["sleep_s"] - io_total - st["db_s"], 0.0), 3),
+                    "calls": dict(st["calls"]),
+                }
+                lanes = st["lanes"]
+                if lanes["count"]:
+                    lane_io = sum(lanes["io_s"].values())
+                    stages[name]["lanes"] = {
+                        "count": lanes["count"],
+                        "wall_lane_s": round(lanes["wall_s"], 3),
+                        "sleep_lane_s": round(lanes["sleep_s"], 3),
+                        "io_lane_s": {k: round(v, 3) for k, v in lanes["io_s"].items()},
+                        "db_lane_s": round(lanes["db_s"], 3),
+                        "other_lane_s": round(max(lanes["wall_s"] - lanes["sleep_s"] - lane_io - lanes["db_s"], 0.0), 3),
+                    }
+            return {
+                "started_at": self.started_at.isoformat(),
+                "wall_s": round(wall, 3),
+                "sleep_s": round(sum(s["sleep_s"] for s in self.stages.values()), 3),
+                "io_s": round(sum(sum(s["io_s"].values()) for s in self.stages.values()), 3),
+                "db_s": round(sum(s["db_s"] for s in self.stages.values()), 3),
+                "sleep_lane_s": round(sum(s["lanes"]["sleep_s"] for s in self.stages.values()), 3),
+                "stages": stages,
+                "target_fetch_latency": percentiles(self.fetch_latencies),
+            }
+
+
+def start_timer() -> RunTimer:
+    global _current
+    _current = RunTimer()
+    return _current
+
+
+def stop_timer() -> None:
+    global _current
+    _current = None
+
+# Set in worker threads that run side by side (the refresh lanes, see lane()).
+_in_lane: contextvars.ContextVar[bool] = contextvars.ContextVar("timing_in_lane", default=False)
+
+
+def begin_stage(name: str) -> None:
+    t = _current
+    if t is not None:
+        t.begin_stage(name)
+    tracing.begin_stage(name)
+
+
+@contextmanager
+def lane():
+    """
+    Wraps the work of a worker thread that runs side by side with others (a refresh
+    lane; start it under contextvars.copy_context()): its time is reported as
+    lane-seconds, apart from the stage's wall-clock numbers (see RunTimer).
+    """
+    token = _in_lane.set(True)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _in_lane.reset(token)
+        t = _current
+        if t is not None:
+            t.record_lane(time.perf_counter() - t0)
+
+
+def record_io(service: str, function: str, seconds: float) -> None:
+    t = _current
+    if t is not None:
+        t.record_io(service, function, seconds, _in_lane.get())
+
+
+def record_db(seconds: float) -> None:
+    t = _current
+    if t is not None:
+        t.record_db(seconds, _in_lane.get())
+
+
+def record_sleep(seconds: float) -> None:
+    t = _current
+    if t is not None:
+        t.record_sleep(seconds, _in_lane.get())
+
+
+def record_fetch(seconds: float) -> None:
+    t = _current
+    if t is not None:
+        t.record_fetch(seconds)
+
+
+def sleep(seconds: float) -> None:
+    """
+    time.sleep that counts as deliberate pacing in the run report.
+    PACING_SCALE scales every pacing sleep (0 disables them, e.g. against stub_server).
+    """
+    pause(seconds * float(os.getenv("PACING_SCALE", "1")))
+
+
+def pause(seconds: float) -> None:
+    """Like sleep(), for a wait that is already scaled (e.g. until a reserved slot)."""
+    if seconds <= 0:
+        return
+    t0 = time.perf_counter()
+    with tracing.child_span("sleep", seconds=seconds):
+        time.sleep(seconds)
+    record_sleep(time.perf_counter() - t0)
+
+
+def save_report(run_id: int | None, report: dict) -> None:
+    from db import get_db  # local import: timing is imported by db
+
+    with get_db() as (conn, cur):
+        cur.execute(
+            "INSERT INTO run_reports(run_id, report) VALUES (%s, %s::jsonb)",
+            (run_id, json.dumps(report)),
+        )
+        conn.commit()
@@ -0,0 +1,281 @@
+"""
+OpenTelemetry-style tracing, off unless TRACING is set:
+
+TRACING                 "json": append finished spans to TRACE_FILE (default traces.jsonl)
+                        "otlp": batch them to an OTLP/HTTP collector (JSON encoding)
+TRACE_FILE              JSON-lines output for TRACING=json
+TRACE_OTLP_ENDPOINT     collector traces URL (default http://localhost:4318/v1/traces)
+TRACE_SERVICE_NAME      resource service.name (default li-commenter)
+
+A trace id is the correlation id of one unit of work: a Slack action (route -> worker
+thread -> DB statements -> Unipile/Slack calls) or a daily_commenter run (stages ->
+everything inside them). Spans nest through a contextvar; to carry a trace across a
+thread hop, run the thread's target under contextvars.copy_context() (see
+slack_server._run_in_thread).
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("trace_span", default=None)
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def mode() -> str | None:
+    m = (os.getenv("TRACING") or "").strip().lower()
+    return m if m in ("json", "otlp") else None
+
+
+def enabled() -> bool:
+    return mode() is not None
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: "Span | None" = None, attributes: dict | None = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            _export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def correlation_id() -> str | None:
+    """Trace id of the work in progress (for log lines)."""
+    s = _current.get()
+    return s.trace_id if s else None
+
+
+def log_tag(tag: str) -> str:
+    """Log line prefix: "[tag]", or "[tag trace=<correlation id>]" inside a trace."""
+    cid = correlation_id()
+    return f"[{tag} trace={cid}]" if cid else f"[{tag}]"
+
+
+@contextmanager
+def span(name: str, parent: Span | None = None, **attributes):
+    """
+    Child of `parent` or the current span (or a new trace's root); ended even if the
+    block raises. Yields the span, or None while tracing is off.
+    """
+    if not enabled():
+        yield None
+        return
+    s = Span(name, parent or _current.get(), attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+
+@contextmanager
+def child_span(name: str, **attributes):
+    """
+    Like span(), but only inside a trace: DB statements and outbound calls made outside
+    any traced work don't each start a trace of their own.
+    """
+    if not enabled() or _current.get() is None:
+        yield None
+        return
+    with span(name, **attributes) as s:
+        yield s
+
+
+# Stage spans (daily_commenter's timing.begin_stage) are sequential rather than nested,
+# so they're switched instead of entered: each one ends the previous stage of its run.
+_stage_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("trace_stage", default=None)
+_run_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("trace_run", default=None)
+
+
+@contextmanager
+def run_span(name: str, **attributes):
+    """Root span for a batch run whose stages are marked with begin_stage()."""
+    with span(name, **attributes) as s:
+        run_token = _run_span.set(s)
+        try:
+            yield s
+        finally:
+            stage = _stage_span.get()
+            if stage is not None:
+                stage.end()
+            _stage_span.set(None)
+            _run_span.reset(run_token)
+
+
+def begin_stage(name: str) -> None:
+    run = _run_span.get()
+    if run is None:
+        return
+    prev = _stage_span.get()
+    if prev is not None:
+        prev.end()
+    stage = Span(f"stage.{name}", run, {"stage": name})
+    _stage_span.set(stage)
+    _current.set(stage)
+
+
+# ---- export ----
+
+def _otlp_value(v) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_span(s: Span) -> dict:
+    out = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+class _Exporter(threading.Thread):
+    """
+    Batches finished spans off the hot path; flushed at exit. Only this thread writes:
+    flush() queues a marker and waits for the thread to reach it.
+    """
+
+    def __init__(self, kind: str):
+        super().__init__(name="trace-exporter", daemon=True)
+        self.kind = kind
+        self.q: queue.Queue = queue.Queue(maxsize=10000)
+        self.dropped = 0
+
+    def submit(self, s: Span) -> None:
+        try:
+            self.q.put_nowait(s)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, first) -> list:
+        batch = [first]
+        while len(batch) < 512:
+            try:
+                batch.append(self.q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list[Span]) -> None:
+        if not batch:
+            return
+        try:
+            if self.kind == "json":
+                with open(os.getenv("TRACE_FILE", "traces.jsonl"), "a", encoding="utf-8") as f:
+                    for s in batch:
+                        f.write(json.dumps(s.to_dict(), default=str) + "\n")
+            else:
+                self._post_otlp(batch)
+        except Exception as e:
+            print(f"[trace] export of {len(batch)} spans failed: {repr(e)}")
+
+    def _post_otlp(self, batch: list[Span]) -> None:
+        # urllib, not http_client: the exporter must not trace (or circuit-break) itself
+        import urllib.request
+
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": os.getenv("TRACE_SERVICE_NAME", "li-commenter")}},
+                ]},
+                "scopeSpans": [{"scope": {"name": "li_commenter.tracing"}, "spans": [_otlp_span(s) for s in batch]}],
+            }]
+        }
+        req = urllib.request.Request(
+            os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"),
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        urllib.request.urlopen(req, timeout=5).close()
+
+    def run(self) -> None:
+        while True:
+            batch = self._drain(self.q.get())
+            self._write([s for s in batch if isinstance(s, Span)])
+            for marker in batch:
+                if isinstance(marker, threading.Event):
+                    marker.set()
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Returns once the spans submitted so far are written (or after `timeout`)."""
+        if not self.is_alive():
+            return
+        done = threading.Event()
+        try:
+            self.q.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+
+def _export(s: Span) -> None:
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                exporter = _Exporter(mode() or "json")
+                exporter.start()
+                atexit.register(exporter.flush)
+                _exporter = exporter
+    _exporter.submit(s)
+
+
+def flush() -> None:
+    if _exporter is not None:
+        _exporter.flush()